@@ -8,11 +8,49 @@ LiquidCrystal_I2C lcd(0x27, 16, 2);
 #define BUZZER_PIN 11
 #define HUMIDITY_ALERT 60
 
+// Protocolo serie: 0 = texto "Raw: X  |  H2O%: Y%" a 9600 baudios (por defecto)
+//                  1 = tramas binarias de 6 bytes a BINARY_BAUD:
+//                      0xA5 | seq | raw (uint16 LE) | pct | CRC8 (poli 0x07 sobre seq..pct)
+#define BINARY_PROTOCOL 0
+#define BINARY_BAUD 115200
+#define FRAME_SYNC 0xA5
+#define BINARY_INTERVAL_MS 20   // 50 Hz en modo binario
+#define LCD_INTERVAL_MS 500
+
+uint8_t frameSeq = 0;
+unsigned long lastDisplay = 0;
+
+uint8_t crc8(const uint8_t *data, uint8_t len) {
+    uint8_t crc = 0;
+    for (uint8_t i = 0; i < len; i++) {
+        crc ^= data[i];
+        for (uint8_t bit = 0; bit < 8; bit++) {
+            crc = (crc & 0x80) ? (uint8_t)((crc << 1) ^ 0x07) : (uint8_t)(crc << 1);
+        }
+    }
+    return crc;
+}
+
+void sendFrame(int value, int pct) {
+    uint8_t frame[6];
+    frame[0] = FRAME_SYNC;
+    frame[1] = frameSeq++;
+    frame[2] = value & 0xFF;
+    frame[3] = (value >> 8) & 0xFF;
+    frame[4] = pct;
+    frame[5] = crc8(frame + 1, 4);
+    Serial.write(frame, sizeof(frame));
+}
+
 void setup() {
     pinMode(BUZZER_PIN, OUTPUT);
     digitalWrite(BUZZER_PIN, LOW);
 
+#if BINARY_PROTOCOL
+    Serial.begin(BINARY_BAUD);
+#else
     Serial.begin(9600);
+#endif
     lcd.init();
     lcd.backlight();
 
@@ -30,23 +68,30 @@ void loop() {
     int pct = map(value, WET_THRESHOLD, DRY_THRESHOLD, 100, 0);
     pct = constrain(pct, 0, 100);
 
-    // Mostrar en LCD
-    lcd.setCursor(0, 0);
-    lcd.print("Moisture: ");
-    lcd.print(pct);
-    lcd.print("%   ");
+    // Mostrar en LCD (limitado: el I2C es lento para el modo binario)
+    if (millis() - lastDisplay >= LCD_INTERVAL_MS) {
+        lastDisplay = millis();
+        lcd.setCursor(0, 0);
+        lcd.print("Moisture: ");
+        lcd.print(pct);
+        lcd.print("%   ");
 
-    lcd.setCursor(0, 1);
-    lcd.print("Raw: ");
-    lcd.print(value);
-    lcd.print("    ");
+        lcd.setCursor(0, 1);
+        lcd.print("Raw: ");
+        lcd.print(value);
+        lcd.print("    ");
+    }
 
+#if BINARY_PROTOCOL
+    sendFrame(value, pct);
+#else
     // Enviar por Serial (formato compatible con Python)
     Serial.print("Raw: ");
     Serial.print(value);
     Serial.print("  |  H2O%: ");
     Serial.print(pct);
     Serial.println("%");
+#endif
 
     // Alarma
     if (pct >= HUMIDITY_ALERT) {
@@ -55,5 +100,9 @@ void loop() {
         noTone(BUZZER_PIN);
     }
 
+#if BINARY_PROTOCOL
+    delay(BINARY_INTERVAL_MS);
+#else
     delay(500); // Enviar datos cada segundo
+#endif
 }
\ No newline at end of file
@@ -31,6 +31,7 @@ app = FastAPI(
 
 UPLOAD_ROOT = Path("/upload")
 UPLOAD_ROOT.mkdir(exist_ok=True)
+HASH_INDEX_PATH = Path("upload_hashes.json")  # Escrito por sftp_server.py
 
 @app.get("/")
 async def root():
@@ -131,6 +132,56 @@ async def get_file_info(filename: str):
         logger.error(f"Error getting file info for {filename}: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting file info: {str(e)}")
 
+@app.get("/files/{filename}/checksum")
+async def get_file_checksum(filename: str):
+    """SHA-256 calculado por el servidor SFTP al recibir el archivo"""
+    try:
+        index = {}
+        if HASH_INDEX_PATH.exists():
+            index = json.loads(HASH_INDEX_PATH.read_text(encoding='utf-8'))
+        
+        canonical = index.get('aliases', {}).get(filename, filename)
+        entry = index.get('files', {}).get(canonical)
+        file_path = UPLOAD_ROOT / canonical
+        if not entry or not file_path.exists() or file_path.stat().st_size != entry['size']:
+            raise HTTPException(status_code=404, detail=f"Checksum not available: {filename}")
+        
+        return {
+            'filename': filename,
+            'canonical_filename': canonical,
+            'sha256': entry['sha256']
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting checksum for {filename}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error getting checksum: {str(e)}")
+
+@app.get("/hashes/{sha256}")
+async def lookup_hash(sha256: str):
+    """Indica si un contenido (SHA-256) ya fue recibido por SFTP"""
+    try:
+        hashes = {}
+        if HASH_INDEX_PATH.exists():
+            hashes = json.loads(HASH_INDEX_PATH.read_text(encoding='utf-8')).get('hashes', {})
+        
+        filename = hashes.get(sha256.lower())
+        if not filename or not (UPLOAD_ROOT / filename).exists():
+            raise HTTPException(status_code=404, detail=f"Hash not found: {sha256}")
+        
+        return {
+            'sha256': sha256.lower(),
+            'filename': filename,
+            'size': (UPLOAD_ROOT / filename).stat().st_size
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error looking up hash {sha256}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error looking up hash: {str(e)}")
+
 @app.delete("/files/{filename}")
 async def delete_file(filename: str):
     """Eliminar un archivo"""
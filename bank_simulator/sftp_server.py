@@ -10,12 +10,15 @@ import threading
 import logging
 import json
 import time
+import hashlib
 from pathlib import Path
 from datetime import datetime
 import paramiko
 from paramiko import ServerInterface, SFTPServerInterface, SFTPServer, SFTPHandle, SFTPAttributes
 from paramiko import AUTH_SUCCESSFUL, AUTH_FAILED, OPEN_SUCCEEDED, OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
 from paramiko import SFTP_OK, SFTP_FAILURE
+from paramiko.message import Message
+from paramiko.sftp import CMD_EXTENDED_REPLY
 
 # Configuración de logging
 logging.basicConfig(
@@ -33,8 +36,133 @@ HOST_KEY = paramiko.RSAKey.generate(2048)
 UPLOAD_ROOT = Path("/upload")
 UPLOAD_ROOT.mkdir(exist_ok=True)
 AUTHORIZED_KEYS_PATH = Path("authorized_keys/client.pub")
+HASH_INDEX_PATH = Path("upload_hashes.json")  # Fuera de UPLOAD_ROOT para no listarlo
+
+class UploadHashIndex:
+    """
+    Índice SHA-256 de archivos recibidos: detecta contenidos duplicados
+    
+    Duplicada en project/backend/bank_backend.py: este servicio se construye como
+    imagen Docker independiente, así que un cambio en el formato del índice
+    (también leído por rest_api.py) debe hacerse en ambos.
+    """
+
+    def __init__(self, index_path, root):
+        self.index_path = Path(index_path)
+        self.root = Path(root)
+        self.lock = threading.Lock()
+        self.hashes = {}   # sha256 -> nombre canónico
+        self.files = {}    # nombre -> {'sha256', 'size', 'mtime'}
+        self.aliases = {}  # nombre duplicado -> nombre canónico
+
+        if self.index_path.exists():
+            data = json.loads(self.index_path.read_text(encoding='utf-8'))
+            self.hashes = data.get('hashes', {})
+            self.files = data.get('files', {})
+            self.aliases = data.get('aliases', {})
+
+    @staticmethod
+    def hash_file(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _save(self):
+        tmp_path = self.index_path.with_suffix('.json.tmp')
+        tmp_path.write_text(json.dumps({
+            'hashes': self.hashes,
+            'files': self.files,
+            'aliases': self.aliases
+        }, indent=2), encoding='utf-8')
+        os.replace(tmp_path, self.index_path)
+
+    def resolve(self, name):
+        """Nombre canónico de un archivo (los duplicados apuntan al original)"""
+        with self.lock:
+            return self.aliases.get(name, name)
+
+    def lookup(self, sha256):
+        with self.lock:
+            return self.hashes.get(sha256)
+
+    def sha256_for(self, name):
+        """SHA-256 registrado de un archivo si sigue vigente (mismo tamaño y mtime)"""
+        name = self.resolve(name)
+        try:
+            st = (self.root / name).stat()
+        except OSError:
+            return None
+        with self.lock:
+            known = self.files.get(name)
+            if known and known['size'] == st.st_size and known['mtime'] == st.st_mtime:
+                return known['sha256']
+        return None
+
+    def register(self, path, sha256=None):
+        """
+        Registra un archivo recibido y devuelve su nombre canónico.
+        Si su contenido ya existe en otro archivo, el nuevo se elimina y queda como alias.
+        """
+        path = Path(path)
+        st = path.stat()
+        with self.lock:
+            known = self.files.get(path.name)
+            if known:
+                if sha256 is None and known['size'] == st.st_size and known['mtime'] == st.st_mtime:
+                    return self.hashes.get(known['sha256'], path.name)
+                # El archivo cambió: su hash anterior deja de apuntar a él
+                if self.hashes.get(known['sha256']) == path.name:
+                    del self.hashes[known['sha256']]
+
+            if sha256 is None:
+                sha256 = self.hash_file(path)
+
+            canonical = self.hashes.get(sha256)
+            if canonical and canonical != path.name and (self.root / canonical).exists():
+                path.unlink()
+                self.files.pop(path.name, None)
+                self.aliases[path.name] = canonical
+                self._save()
+                logger.info(f"[DEDUP] Duplicate of {canonical} discarded: {path.name}")
+                return canonical
+
+            self.hashes[sha256] = path.name
+            self.aliases.pop(path.name, None)
+            self.files[path.name] = {'sha256': sha256, 'size': st.st_size, 'mtime': st.st_mtime}
+            self._save()
+            return path.name
+
+HASH_INDEX = UploadHashIndex(HASH_INDEX_PATH, UPLOAD_ROOT)
 
 class BankSFTPHandle(SFTPHandle):
+    def __init__(self, flags=0):
+        super().__init__(flags)
+        # Hash calculado en streaming mientras se escribe la subida
+        self.digest = hashlib.sha256()
+        self.hashed_bytes = 0
+        self.hash_valid = True
+
+    def write(self, offset, data):
+        # Solo escrituras secuenciales permiten hashear sin releer el archivo
+        if self.hash_valid and offset == self.hashed_bytes:
+            self.digest.update(data)
+            self.hashed_bytes += len(data)
+        else:
+            self.hash_valid = False
+        return super().write(offset, data)
+
+    def close(self):
+        super().close()
+        # Al cerrar una subida se indexa su contenido (los duplicados quedan como alias)
+        if getattr(self, 'is_upload', False):
+            sha256 = self.digest.hexdigest() if self.hash_valid else None
+            try:
+                HASH_INDEX.register(self.filename, sha256=sha256)
+            except OSError as e:
+                logger.error(f"[DEDUP] Error indexing {self.filename}: {e}")
+
     def stat(self):
         try:
             return SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
@@ -44,11 +172,41 @@ class BankSFTPHandle(SFTPHandle):
     def chattr(self, attr):
         return SFTP_OK
 
+class BankSFTPSubsystem(SFTPServer):
+    """Subsistema SFTP que responde check-file sha256 con el hash calculado al subir"""
+
+    def _check_file(self, request_number, msg):
+        start_pos = msg.packet.tell()
+        handle = msg.get_binary()
+        alg_list = msg.get_list()
+        start = msg.get_int64()
+        length = msg.get_int64()
+        block_size = msg.get_int()
+
+        f = self.file_table.get(handle)
+        if isinstance(f, BankSFTPHandle) and 'sha256' in alg_list and start == 0 and block_size == 0:
+            sha256 = HASH_INDEX.sha256_for(f.filename.name)
+            if sha256 and (length == 0 or length == f.filename.stat().st_size):
+                reply = Message()
+                reply.add_int(request_number)
+                reply.add_string('check-file')
+                reply.add_string('sha256')
+                reply.add_bytes(bytes.fromhex(sha256))
+                self._send_packet(CMD_EXTENDED_REPLY, reply)
+                return
+
+        # Otros algoritmos o rangos parciales: implementación estándar (relee el archivo)
+        msg.packet.seek(start_pos)
+        super()._check_file(request_number, msg)
+
 class BankSFTPServer(SFTPServerInterface):
     ROOT = UPLOAD_ROOT
 
-    def _realpath(self, path):
-        return self.ROOT / os.path.basename(path)
+    def _realpath(self, path, follow_alias=True):
+        name = os.path.basename(path)
+        if follow_alias and not (self.ROOT / name).exists():
+            name = HASH_INDEX.resolve(name)
+        return self.ROOT / name
 
     def list_folder(self, path):
         path = self._realpath(path)
@@ -78,7 +236,9 @@ class BankSFTPServer(SFTPServerInterface):
             return SFTP_FAILURE
 
     def open(self, path, flags, attr):
-        path = self._realpath(path)
+        # Una escritura crea un archivo nuevo aunque el nombre sea un alias
+        is_upload = bool(flags & (os.O_WRONLY | os.O_RDWR))
+        path = self._realpath(path, follow_alias=not is_upload)
         try:
             binary_flag = getattr(os, 'O_BINARY', 0)
             flags |= binary_flag
@@ -117,12 +277,13 @@ class BankSFTPServer(SFTPServerInterface):
         fobj.filename = path
         fobj.readfile = f
         fobj.writefile = f
+        fobj.is_upload = is_upload
         
         logger.info(f"[BANK] File uploaded: {path.name}")
         return fobj
 
     def remove(self, path):
-        path = self._realpath(path)
+        path = self._realpath(path, follow_alias=False)
         try:
             path.unlink()
             logger.info(f"[BANK] File deleted: {path.name}")
@@ -131,8 +292,8 @@ class BankSFTPServer(SFTPServerInterface):
         return SFTP_OK
 
     def rename(self, oldpath, newpath):
-        oldpath = self._realpath(oldpath)
-        newpath = self._realpath(newpath)
+        oldpath = self._realpath(oldpath, follow_alias=False)
+        newpath = self._realpath(newpath, follow_alias=False)
         try:
             oldpath.rename(newpath)
         except OSError:
@@ -194,7 +355,7 @@ def handle_client(client_socket, address):
         
         transport = paramiko.Transport(client_socket)
         transport.add_server_key(HOST_KEY)
-        transport.set_subsystem_handler('sftp', SFTPServer)
+        transport.set_subsystem_handler('sftp', BankSFTPSubsystem, sftp_si=BankSFTPServer)
         
         server = BankSSHServer()
         transport.start_server(server=server)
@@ -205,9 +366,6 @@ def handle_client(client_socket, address):
             logger.error("[CONNECTION] No channel established")
             return
         
-        # Crear servidor SFTP
-        sftp_server = SFTPServer(channel, 'sftp', server=server, sftp_si=BankSFTPServer)
-        
         # Mantener conexión activa
         while transport.is_active():
             time.sleep(1)
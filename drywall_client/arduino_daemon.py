@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+DryWall Client - Servicio persistente de lectura del Arduino
+Mantiene el puerto serie abierto, guarda las últimas lecturas en un buffer
+circular en memoria y las expone a consumidores del proceso y por socket Unix
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+import socketserver
+from collections import deque
+from datetime import datetime
+
+from arduino_reader import ArduinoReader, BINARY_BAUD, PROTOCOLS
+from arduino_service import DailyCSVWriter
+from reading_wal import ReadingWAL
+from minute_aggregator import MinuteAggregationSink, MINUTE_COLUMNS, MINUTE_PREFIX, RAW_PREFIX
+from stream_compression import (CompressionSink, StreamCompressor, COMPRESSED_COLUMNS, COMPRESSED_PREFIX, MODES,
+                                DEFAULT_MAX_SILENCE)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = "/tmp/drywall_arduino.sock"
+DEFAULT_CAPACITY = 3600  # ~30 min a 2 Hz
+DEFAULT_MAX_AGE = 10     # segundos para considerar vigente la última lectura
+
+
+class ReadingRingBuffer:
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """Buffer circular thread-safe de lecturas con número de secuencia"""
+        self.capacity = capacity
+        self.readings = deque(maxlen=capacity)
+        self.lock = threading.Lock()
+        self.next_seq = 1
+
+    def append(self, reading):
+        """Añade una lectura (la más antigua se descarta si está lleno)"""
+        with self.lock:
+            reading = dict(reading, seq=self.next_seq, received_at=time.time())
+            self.next_seq += 1
+            self.readings.append(reading)
+            return reading
+
+    def latest(self, max_age=None):
+        """Última lectura o None si no hay o es más antigua que max_age segundos"""
+        with self.lock:
+            if not self.readings:
+                return None
+            reading = self.readings[-1]
+        if max_age is not None and time.time() - reading['received_at'] > max_age:
+            return None
+        return dict(reading)
+
+    def history(self, n=100):
+        """Las n lecturas más recientes, de la más antigua a la más nueva"""
+        with self.lock:
+            return [dict(r) for r in list(self.readings)[-n:]] if n > 0 else []
+
+    def since(self, seq):
+        """Lecturas con secuencia mayor que seq (para consumidores incrementales)"""
+        with self.lock:
+            return [dict(r) for r in self.readings if r['seq'] > seq]
+
+    def __len__(self):
+        with self.lock:
+            return len(self.readings)
+
+
+class ArduinoDaemon:
+    def __init__(self, port='COM7', baudrate=9600, capacity=DEFAULT_CAPACITY,
+                 socket_path=DEFAULT_SOCKET_PATH, log_csv=True, reconnect_delay=5, protocol='text',
+                 use_wal=True, aggregate=False, raw_retention_days=None, compress=None,
+                 max_silence=DEFAULT_MAX_SILENCE):
+        """
+        Lector del Arduino de larga duración
+
+        Args:
+            port: Puerto serie
+            baudrate: Velocidad del puerto
+            capacity: Lecturas que conserva el buffer circular
+            socket_path: Socket Unix para otros procesos (None = solo en proceso)
+            log_csv: Agregar cada lectura al CSV diario
+            reconnect_delay: Segundos entre intentos de reconexión
+            protocol: 'text' (líneas del sketch) o 'binary' (tramas con CRC)
+            use_wal: Pasar las lecturas por el write-ahead log antes del CSV
+            aggregate: Escribir también registros por minuto (arduino_minutes_*.csv),
+                que es lo que se sube en lugar del CSV crudo
+            raw_retention_days: Días de CSV crudo a conservar con aggregate (None = todos)
+            compress: Modo de stream_compression ('swinging_door' o 'deadband') para
+                escribir arduino_compressed_*.csv y subirlo en lugar del CSV crudo
+            max_silence: Segundos máximos entre puntos comprimidos
+        """
+        self.reader = ArduinoReader(port, baudrate, protocol=protocol)
+        self.buffer = ReadingRingBuffer(capacity)
+        self.socket_path = socket_path
+        self.log_csv = log_csv
+
+        # Destinos de cada lectura; el último determina el archivo que se sube
+        self.sinks = []
+        self.upload_prefix = None
+        if log_csv:
+            self.sinks.append(DailyCSVWriter(wal=ReadingWAL('daemon') if use_wal else None))
+            self.upload_prefix = RAW_PREFIX
+        if compress:
+            self.sinks.append(CompressionSink(DailyCSVWriter(prefix=COMPRESSED_PREFIX, columns=COMPRESSED_COLUMNS),
+                                              StreamCompressor(max_silence=max_silence, mode=compress)))
+            self.upload_prefix = COMPRESSED_PREFIX
+        if aggregate:
+            self.sinks.append(MinuteAggregationSink(
+                DailyCSVWriter(prefix=MINUTE_PREFIX, columns=MINUTE_COLUMNS), raw_retention_days))
+            self.upload_prefix = MINUTE_PREFIX
+        self.reconnect_delay = reconnect_delay
+        self.max_misses = 5  # segundos sin lecturas antes de reabrir el puerto
+
+        self.started_at = None
+        self.connected = False
+        self.reconnects = 0
+        self.connect_failures = 0
+        self.read_errors = 0
+        self._stop_event = threading.Event()
+        self._reader_thread = None
+        self._server = None
+        self._server_thread = None
+
+    # --- Consumidores en el mismo proceso ---
+
+    def latest(self, max_age=DEFAULT_MAX_AGE):
+        return self.buffer.latest(max_age)
+
+    def history(self, n=100):
+        return self.buffer.history(n)
+
+    def since(self, seq):
+        return self.buffer.since(seq)
+
+    def stats(self):
+        latest = self.buffer.latest()
+        return {
+            'port': self.reader.port,
+            'baudrate': self.reader.baudrate,
+            'protocol': self.reader.protocol,
+            'connected': self.connected,
+            'started_at': self.started_at,
+            'buffered': len(self.buffer),
+            'capacity': self.buffer.capacity,
+            'last_seq': latest['seq'] if latest else 0,
+            'last_reading_age': round(time.time() - latest['received_at'], 3) if latest else None,
+            'reconnects': self.reconnects,
+            'connect_failures': self.connect_failures,
+            'read_errors': self.read_errors,
+            'csv_logging': self.log_csv,
+            'upload_prefix': self.upload_prefix,
+            'ingestion': self.reader.ingestion_stats()
+        }
+
+    # --- Lectura del puerto ---
+
+    def _ensure_connected(self):
+        if self.connected:
+            return True
+        if self.reader.connect():
+            # El hilo de ingesta vacía el puerto continuamente; aquí solo se consume la cola
+            self.reader.start_ingestion()
+            self.connected = True
+            return True
+        self.connect_failures += 1
+        self._stop_event.wait(self.reconnect_delay)
+        return False
+
+    def _read_loop(self):
+        misses = 0
+        while not self._stop_event.is_set():
+            for sink in self.sinks:
+                sink.maybe_flush()
+            if not self._ensure_connected():
+                continue
+
+            sensor_data = self.reader.get_reading(timeout=1)
+
+            if sensor_data:
+                misses = 0
+                self.buffer.append(sensor_data)
+                for sink in self.sinks:
+                    sink.write(sensor_data)
+                continue
+
+            misses += 1
+            if not self.reader.ingesting:
+                # El hilo de ingesta terminó por un error del puerto
+                self.read_errors += 1
+                misses = self.max_misses
+            if misses >= self.max_misses:
+                # Sin datos válidos (cable desconectado, Arduino reiniciado): reabrir el puerto
+                logger.warning(f"⚠️  {misses} s sin lecturas, reconectando {self.reader.port}...")
+                self.reader.close()
+                self.connected = False
+                self.reconnects += 1
+                misses = 0
+
+    # --- Servidor de socket Unix ---
+
+    def _start_socket_server(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # Socket huérfano de una ejecución anterior
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        response = daemon.handle_request(json.loads(line))
+                    except Exception as e:
+                        response = {'ok': False, 'error': str(e)}
+                    self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+
+        class Server(socketserver.ThreadingUnixStreamServer):
+            daemon_threads = True
+
+        self._server = Server(self.socket_path, Handler)
+        self._server_thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._server_thread.start()
+        logger.info(f"🔌 Socket de lecturas en {self.socket_path}")
+
+    def handle_request(self, request):
+        """Atiende un comando JSON: latest, history, since, stats o flush"""
+        cmd = request.get('cmd')
+        if cmd == 'latest':
+            return {'ok': True, 'reading': self.latest(request.get('max_age', DEFAULT_MAX_AGE))}
+        if cmd == 'history':
+            return {'ok': True, 'readings': self.history(int(request.get('n', 100)))}
+        if cmd == 'since':
+            return {'ok': True, 'readings': self.since(int(request.get('seq', 0)))}
+        if cmd == 'stats':
+            return {'ok': True, 'stats': self.stats()}
+        if cmd == 'flush':
+            for sink in self.sinks:
+                sink.flush()
+            return {'ok': True}
+        return {'ok': False, 'error': f"Comando desconocido: {cmd}"}
+
+    # --- Ciclo de vida ---
+
+    def start(self):
+        self.started_at = datetime.now().isoformat()
+        self._reader_thread = threading.Thread(target=self._read_loop, name='arduino-reader', daemon=True)
+        self._reader_thread.start()
+        if self.socket_path:
+            self._start_socket_server()
+        logger.info(f"✅ Servicio Arduino iniciado en {self.reader.port}")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._reader_thread:
+            self._reader_thread.join(5)
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+        self.reader.close()
+        self.connected = False
+        for sink in self.sinks:
+            sink.close()
+
+    def run_forever(self):
+        self.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("\n⏹️  Servicio detenido")
+        finally:
+            self.stop()
+
+
+class DaemonClient:
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, timeout=2):
+        """Cliente del socket Unix de ArduinoDaemon para otros procesos"""
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def available(self):
+        return os.path.exists(self.socket_path)
+
+    def request(self, cmd, **params):
+        import socket
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            sock.sendall((json.dumps(dict(params, cmd=cmd)) + '\n').encode('utf-8'))
+            with sock.makefile('rb') as f:
+                response = json.loads(f.readline())
+
+        if not response.get('ok'):
+            raise RuntimeError(response.get('error', 'Error del servicio Arduino'))
+        return response
+
+    def latest(self, max_age=DEFAULT_MAX_AGE):
+        return self.request('latest', max_age=max_age)['reading']
+
+    def history(self, n=100):
+        return self.request('history', n=n)['readings']
+
+    def since(self, seq):
+        return self.request('since', seq=seq)['readings']
+
+    def stats(self):
+        return self.request('stats')['stats']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servicio persistente de lectura del Arduino')
+    parser.add_argument('--port', default='COM7', help='Puerto serie (default: COM7)')
+    parser.add_argument('--baud', type=int, help=f'Velocidad (default: 9600 texto, {BINARY_BAUD} binario)')
+    parser.add_argument('--protocol', choices=PROTOCOLS, default='text',
+                        help='Formato serie del sketch (default: text)')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH, help=f'Socket Unix (default: {DEFAULT_SOCKET_PATH})')
+    parser.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY, help='Lecturas en memoria')
+    parser.add_argument('--no-csv', action='store_true', help='No agregar lecturas al CSV diario')
+    parser.add_argument('--aggregate', action='store_true',
+                        help='Guardar también registros por minuto (se suben en lugar del CSV crudo)')
+    parser.add_argument('--raw-retention-days', type=int,
+                        help='Días de CSV crudo a conservar con --aggregate (default: todos)')
+    parser.add_argument('--compress', choices=MODES,
+                        help='Guardar también la señal comprimida (se sube en lugar del CSV crudo)')
+    parser.add_argument('--max-silence', type=float, default=DEFAULT_MAX_SILENCE,
+                        help=f'Segundos máximos entre puntos comprimidos (default: {DEFAULT_MAX_SILENCE})')
+    parser.add_argument('--no-wal', action='store_true', help='Sin write-ahead log (menos durabilidad)')
+    parser.add_argument('--query', choices=['latest', 'history', 'stats'],
+                        help='Consultar un servicio en ejecución en lugar de iniciarlo')
+
+    args = parser.parse_args()
+
+    if args.query:
+        client = DaemonClient(args.socket)
+        result = getattr(client, args.query)()
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return 0
+
+    baudrate = args.baud or (BINARY_BAUD if args.protocol == 'binary' else 9600)
+    daemon = ArduinoDaemon(args.port, baudrate, args.capacity, args.socket, log_csv=not args.no_csv,
+                           protocol=args.protocol, use_wal=not args.no_wal,
+                           aggregate=args.aggregate, raw_retention_days=args.raw_retention_days,
+                           compress=args.compress, max_silence=args.max_silence)
+    daemon.run_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    exit(main())
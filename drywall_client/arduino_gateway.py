@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+DryWall Client - Pasarela multi-Arduino
+Lee varios puertos serie a la vez desde un solo hilo (selectors), etiqueta cada
+lectura con el device_id de su puerto y las guarda con un escritor por lotes compartido
+
+Solo POSIX (Linux/macOS): en Windows los puertos serie no admiten select(); allí
+se usa arduino_daemon.py, un proceso por puerto
+"""
+
+import os
+import time
+import logging
+import argparse
+import selectors
+import threading
+from datetime import datetime
+
+import serial
+
+from arduino_reader import FrameDecoder, parse_line, BINARY_BAUD, FRAME_SIZE, MAX_LINE_BYTES, PROTOCOLS
+from arduino_service import DailyCSVWriter
+from reading_wal import ReadingWAL
+from minute_aggregator import MinuteAggregationSink, MINUTE_COLUMNS, MINUTE_PREFIX
+from stream_compression import (CompressionSink, StreamCompressor, COMPRESSED_COLUMNS, COMPRESSED_PREFIX, MODES,
+                                DEFAULT_MAX_SILENCE)
+
+logger = logging.getLogger(__name__)
+
+# VID USB de placas Arduino y conversores serie habituales (CH340, FTDI, CP210x)
+ARDUINO_VIDS = {0x2341, 0x2A03, 0x1A86, 0x0403, 0x10C4}
+DEFAULT_FLUSH_ROWS = 500
+DEFAULT_FLUSH_INTERVAL = 2.0  # segundos
+RECONNECT_INTERVAL = 5.0
+POSIX_ONLY_MESSAGE = "La pasarela requiere POSIX (select sobre puertos serie); en Windows usa arduino_daemon.py"
+
+
+def discover_ports():
+    """Puertos serie que parecen un Arduino (por VID USB o descripción)"""
+    from serial.tools import list_ports
+
+    ports = []
+    for info in list_ports.comports():
+        description = (info.description or '').lower()
+        if info.vid in ARDUINO_VIDS or 'arduino' in description or 'ttyACM' in info.device:
+            ports.append(info.device)
+    return sorted(ports)
+
+
+def default_device_ids(ports):
+    """arduino_sensor_01, arduino_sensor_02... en el orden de los puertos"""
+    return {port: f"arduino_sensor_{index:02d}" for index, port in enumerate(ports, 1)}
+
+
+class PortChannel:
+    def __init__(self, port, device_id, baudrate=9600, protocol='text'):
+        """Un puerto serie en modo no bloqueante con su propio buffer de parseo"""
+        self.port = port
+        self.device_id = device_id
+        self.baudrate = baudrate
+        self.protocol = protocol
+        self.decoder = FrameDecoder() if protocol == 'binary' else None
+        self.serial_conn = None
+        self.pending = b''
+        self.last_attempt = 0.0
+        self.counters = {'bytes': 0, 'readings': 0, 'invalid': 0, 'disconnects': 0}
+
+    def open(self):
+        self.last_attempt = time.monotonic()
+        try:
+            self.serial_conn = serial.Serial(self.port, self.baudrate, timeout=0)
+        except Exception as e:
+            logger.error(f"❌ No se pudo abrir {self.port}: {e}")
+            self.serial_conn = None
+            return False
+        self.pending = b''
+        logger.info(f"✅ {self.port} -> {self.device_id}")
+        return True
+
+    def close(self):
+        if self.serial_conn:
+            try:
+                self.serial_conn.close()
+            except Exception:
+                pass
+            self.serial_conn = None
+
+    def fileno(self):
+        return self.serial_conn.fileno()
+
+    def read_available(self):
+        """Lee lo que haya en el puerto y devuelve las lecturas completas"""
+        chunk = self.serial_conn.read(max(FRAME_SIZE, self.serial_conn.in_waiting))
+        if not chunk:
+            return []
+        arrival = datetime.now().isoformat()
+        self.counters['bytes'] += len(chunk)
+
+        if self.decoder:
+            parsed = [(raw, pct) for _, raw, pct in self.decoder.feed(chunk)]
+        else:
+            lines = (self.pending + chunk).split(b'\n')
+            self.pending = lines.pop()
+            if len(self.pending) > MAX_LINE_BYTES:
+                self.pending = b''
+                self.counters['invalid'] += 1
+            parsed = []
+            for line in lines:
+                values = parse_line(line.decode('utf-8', errors='ignore'))
+                if values:
+                    parsed.append(values)
+                else:
+                    self.counters['invalid'] += 1
+
+        self.counters['readings'] += len(parsed)
+        return [{
+            'timestamp': arrival,
+            'raw_value': raw,
+            'humidity_pct': pct,
+            'device_id': self.device_id
+        } for raw, pct in parsed]
+
+
+class SerialGateway:
+    def __init__(self, ports, device_ids=None, baudrate=None, protocol='text', writers=(),
+                 on_reading=None):
+        """
+        Adquisición concurrente de varios Arduinos en un solo hilo
+
+        Args:
+            ports: Lista de puertos serie
+            device_ids: dict puerto -> device_id (por defecto arduino_sensor_NN)
+            baudrate: Velocidad (default: 9600 texto, 115200 binario)
+            protocol: 'text' o 'binary'
+            writers: Escritores compartidos por todos los puertos (DailyCSVWriter,
+                MinuteAggregationSink...)
+            on_reading: Callback opcional por lectura
+        """
+        if os.name != 'posix':
+            raise RuntimeError(POSIX_ONLY_MESSAGE)
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Protocolo no soportado: {protocol}")
+        baudrate = baudrate or (BINARY_BAUD if protocol == 'binary' else 9600)
+        device_ids = dict(default_device_ids(ports), **(device_ids or {}))
+
+        self.channels = [PortChannel(port, device_ids[port], baudrate, protocol) for port in ports]
+        self.writers = list(writers)
+        self.on_reading = on_reading
+        self.selector = selectors.DefaultSelector()
+        self._stop_event = threading.Event()
+
+    def _open(self, channel):
+        if channel.open():
+            self.selector.register(channel, selectors.EVENT_READ)
+
+    def _drop(self, channel, error):
+        logger.warning(f"⚠️  {channel.port} desconectado: {error}")
+        self.selector.unregister(channel)
+        channel.close()
+        channel.counters['disconnects'] += 1
+
+    def _reconnect_closed(self):
+        now = time.monotonic()
+        for channel in self.channels:
+            if channel.serial_conn is None and now - channel.last_attempt >= RECONNECT_INTERVAL:
+                self._open(channel)
+
+    def poll(self, timeout=0.5):
+        """Una vuelta del bucle: atiende los puertos con datos y devuelve sus lecturas"""
+        if not self.selector.get_map():
+            # Sin puertos abiertos select() no espera en todas las plataformas
+            time.sleep(timeout)
+            return []
+
+        readings = []
+        for key, _ in self.selector.select(timeout):
+            channel = key.fileobj
+            try:
+                new_readings = channel.read_available()
+            except (serial.SerialException, OSError) as e:
+                self._drop(channel, e)
+                continue
+            readings.extend(new_readings)
+        return readings
+
+    def run(self, duration=None):
+        """Bucle principal hasta stop(), Ctrl+C o duration segundos"""
+        for channel in self.channels:
+            self._open(channel)
+
+        deadline = time.monotonic() + duration if duration else None
+        try:
+            while not self._stop_event.is_set():
+                if deadline and time.monotonic() >= deadline:
+                    break
+
+                readings = self.poll()
+                if readings:
+                    for writer in self.writers:
+                        writer.write_many(readings)
+                    if self.on_reading:
+                        for reading in readings:
+                            self.on_reading(reading)
+                for writer in self.writers:
+                    writer.maybe_flush()
+                self._reconnect_closed()
+        finally:
+            self.close()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
+        for channel in self.channels:
+            if channel.serial_conn is not None:
+                self.selector.unregister(channel)
+                channel.close()
+        self.selector.close()
+
+    def stats(self):
+        return {channel.port: dict(channel.counters, device_id=channel.device_id,
+                                   connected=channel.serial_conn is not None)
+                for channel in self.channels}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pasarela multi-Arduino (varios puertos serie, solo Linux/macOS)',
+                                     epilog=POSIX_ONLY_MESSAGE)
+    parser.add_argument('--ports', help='Puertos separados por comas (default: autodetectar)')
+    parser.add_argument('--device', action='append', default=[], metavar='PUERTO=ID',
+                        help='device_id para un puerto (repetible)')
+    parser.add_argument('--protocol', choices=PROTOCOLS, default='text', help='Formato serie (default: text)')
+    parser.add_argument('--baud', type=int, help=f'Velocidad (default: 9600 texto, {BINARY_BAUD} binario)')
+    parser.add_argument('--flush-rows', type=int, default=DEFAULT_FLUSH_ROWS,
+                        help=f'Filas por escritura (default: {DEFAULT_FLUSH_ROWS})')
+    parser.add_argument('--flush-interval', type=float, default=DEFAULT_FLUSH_INTERVAL,
+                        help=f'Segundos máximos entre escrituras (default: {DEFAULT_FLUSH_INTERVAL})')
+    parser.add_argument('--aggregate', action='store_true',
+                        help='Guardar también registros por minuto (arduino_minutes_*.csv)')
+    parser.add_argument('--raw-retention-days', type=int,
+                        help='Días de CSV crudo a conservar con --aggregate (default: todos)')
+    parser.add_argument('--compress', choices=MODES, help='Guardar también la señal comprimida por dispositivo')
+    parser.add_argument('--max-silence', type=float, default=DEFAULT_MAX_SILENCE,
+                        help=f'Segundos máximos entre puntos comprimidos (default: {DEFAULT_MAX_SILENCE})')
+    parser.add_argument('--no-wal', action='store_true', help='Sin write-ahead log (menos durabilidad)')
+    parser.add_argument('--duration', type=float, help='Segundos de adquisición (default: hasta Ctrl+C)')
+
+    args = parser.parse_args()
+    if os.name != 'posix':
+        parser.error(POSIX_ONLY_MESSAGE)
+
+    ports = [p for p in args.ports.split(',') if p] if args.ports else discover_ports()
+    if not ports:
+        print("❌ No se encontraron Arduinos conectados")
+        return 1
+    device_ids = dict(mapping.split('=', 1) for mapping in args.device)
+
+    writer = DailyCSVWriter(args.flush_rows, args.flush_interval,
+                            wal=None if args.no_wal else ReadingWAL('gateway'))
+    writers = [writer]
+    if args.compress:
+        writers.append(CompressionSink(
+            DailyCSVWriter(args.flush_rows, args.flush_interval, prefix=COMPRESSED_PREFIX,
+                           columns=COMPRESSED_COLUMNS),
+            StreamCompressor(max_silence=args.max_silence, mode=args.compress)))
+    if args.aggregate:
+        writers.append(MinuteAggregationSink(
+            DailyCSVWriter(args.flush_rows, args.flush_interval, prefix=MINUTE_PREFIX, columns=MINUTE_COLUMNS),
+            args.raw_retention_days))
+    gateway = SerialGateway(ports, device_ids, args.baud, args.protocol, writers)
+    print(f"🔄 Adquisición en {len(ports)} puertos: {', '.join(ports)}")
+    print("Presiona Ctrl+C para detener")
+
+    start = time.monotonic()
+    try:
+        gateway.run(args.duration)
+    except KeyboardInterrupt:
+        print("\n⏹️  Adquisición detenida")
+
+    elapsed = time.monotonic() - start
+    for port, stats in gateway.stats().items():
+        print(f"📊 {port} ({stats['device_id']}): {stats['readings']} lecturas, "
+              f"{stats['invalid']} inválidas, {stats['disconnects']} desconexiones")
+    print(f"💾 {writer.written} filas en {writer.flushes} escrituras "
+          f"({writer.written / elapsed:.1f} lecturas/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    exit(main())
@@ -1,22 +1,133 @@
 import serial
+import struct
 import time
 import logging
+import threading
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 import re
 
 logger = logging.getLogger(__name__)
 
+# Formato del sketch: "Raw: 603  |  H2O%: 45%"
+LINE_PATTERN = re.compile(r'Raw:\s*(\d+).*H2O%:\s*(\d+)%')
+DEFAULT_QUEUE_SIZE = 1024
+# Una línea válida ocupa ~25 bytes; más sin '\n' es ruido o baudrate incorrecto
+MAX_LINE_BYTES = 256
+
+# Protocolo binario (sensor_sketch.ino con BINARY_PROTOCOL 1), tramas de 6 bytes:
+# 0xA5 | seq | raw (uint16 LE) | pct | CRC8 (polinomio 0x07 sobre seq..pct)
+PROTOCOLS = ('text', 'binary')
+FRAME_SYNC = 0xA5
+FRAME_STRUCT = struct.Struct('<BBHBB')
+FRAME_SIZE = FRAME_STRUCT.size
+BINARY_BAUD = 115200
+
+def _crc8_table(poly=0x07):
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return bytes(table)
+
+CRC8_TABLE = _crc8_table()
+
+def crc8(data):
+    """CRC-8 (polinomio 0x07, valor inicial 0), igual que crc8() del sketch"""
+    crc = 0
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
+def encode_frame(seq, raw, pct):
+    """Trama binaria tal como la envía el sketch (útil para pruebas y simuladores)"""
+    body = struct.pack('<BHB', seq & 0xFF, raw, pct)
+    return bytes([FRAME_SYNC]) + body + bytes([crc8(body)])
+
+def parse_line(line):
+    """Devuelve (raw, pct) de una línea del sketch o None si no es válida"""
+    if "Raw:" not in line or "H2O%:" not in line:
+        return None
+    match = LINE_PATTERN.search(line)
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+class FrameDecoder:
+    def __init__(self):
+        """
+        Decodificador incremental de tramas binarias
+        
+        Acumula bytes, lee cada trama con struct.unpack_from sobre el buffer (sin
+        copiar) y, ante bytes sueltos o CRC incorrecto, avanza hasta el siguiente
+        byte de sincronía.
+        """
+        self.buffer = bytearray()
+        self.last_seq = None
+        self.counters = {'frames': 0, 'crc_errors': 0, 'resync_bytes': 0, 'lost_frames': 0}
+    
+    def feed(self, data):
+        """Añade bytes recibidos y devuelve las tramas completas como (seq, raw, pct)"""
+        buf = self.buffer
+        buf += data
+        frames = []
+        pos = 0
+        end = len(buf)
+        
+        while end - pos >= FRAME_SIZE:
+            if buf[pos] != FRAME_SYNC:
+                sync = buf.find(FRAME_SYNC, pos + 1)
+                skip = (sync if sync >= 0 else end) - pos
+                self.counters['resync_bytes'] += skip
+                pos += skip
+                continue
+            
+            _, seq, raw, pct, crc = FRAME_STRUCT.unpack_from(buf, pos)
+            # CRC sobre seq, raw (LE) y pct sin crear un slice
+            expected = CRC8_TABLE[CRC8_TABLE[CRC8_TABLE[CRC8_TABLE[seq] ^ (raw & 0xFF)] ^ (raw >> 8)] ^ pct]
+            if crc != expected:
+                # Sincronía falsa o trama corrupta: buscar desde el byte siguiente
+                self.counters['crc_errors'] += 1
+                self.counters['resync_bytes'] += 1
+                pos += 1
+                continue
+            
+            if self.last_seq is not None:
+                self.counters['lost_frames'] += (seq - self.last_seq - 1) & 0xFF
+            self.last_seq = seq
+            self.counters['frames'] += 1
+            frames.append((seq, raw, pct))
+            pos += FRAME_SIZE
+        
+        del buf[:pos]
+        return frames
+
 class ArduinoReader:
-    def __init__(self, port='COM7', baudrate=9600):
+    def __init__(self, port='COM7', baudrate=9600, device_id='arduino_sensor_01', protocol='text'):
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Protocolo no soportado: {protocol}")
         self.port = port
         self.baudrate = baudrate
+        self.device_id = device_id
+        self.protocol = protocol
+        self.decoder = FrameDecoder() if protocol == 'binary' else None
         self.serial_conn = None
         # Usar directorio del script actual
         script_dir = Path(__file__).parent
         self.data_dir = script_dir / "data"
         self.data_dir.mkdir(exist_ok=True)
         
+        # Ingesta en segundo plano (ver start_ingestion)
+        self._queue = None
+        self._queue_cond = threading.Condition()
+        self._ingest_thread = None
+        self._ingest_stop = threading.Event()
+        self.ingest_error = None
+        self.counters = {'bytes': 0, 'lines': 0, 'readings': 0, 'invalid': 0, 'dropped': 0}
+        
     def connect(self):
         """Conectar al Arduino"""
         try:
@@ -27,40 +138,170 @@ class ArduinoReader:
         except Exception as e:
             logger.error(f"❌ Error conectando Arduino: {e}")
             return False
-    
-    def read_sensor_data(self):
-        """Lee datos del sensor desde Arduino"""
+            
+    def _make_reading(self, raw, pct, timestamp=None):
+        return {
+            'timestamp': (timestamp or datetime.now()).isoformat(),
+            'raw_value': raw,
+            'humidity_pct': pct,
+            'device_id': self.device_id
+        }
+        
+    def read_sensor_data(self, timeout=5):
+        """
+        Lee datos del sensor desde Arduino
+        
+        Con la ingesta en segundo plano activa devuelve la siguiente lectura de
+        la cola (esperando hasta timeout segundos); si no, lee del puerto.
+        """
+        if self.ingesting:
+            return self.get_reading(timeout)
+        
         if not self.serial_conn:
             return None
         
+        if self.protocol == 'binary':
+            return self._read_frame()
+        
         try:
             # Leer varias líneas para asegurar datos válidos
             for _ in range(10):  # Aumentar intentos
                 line = self.serial_conn.readline().decode('utf-8', errors='ignore').strip()
                 
-                if "Raw:" in line and "H2O%:" in line:
-                    # Parsear: "Raw: 603  |  H2O%: 45%"
-                    match = re.search(r'Raw:\s*(\d+).*H2O%:\s*(\d+)%', line)
-                    if match:
-                        raw = int(match.group(1))
-                        pct = int(match.group(2))
-                        
-                        return {
-                            'timestamp': datetime.now().isoformat(),
-                            'raw_value': raw,
-                            'humidity_pct': pct,
-                            'device_id': 'arduino_sensor_01'
-                        }
+                parsed = parse_line(line)
+                if parsed:
+                    return self._make_reading(*parsed)
                 
                 time.sleep(0.1)  # Pequeña pausa entre lecturas
-                
+        
         except Exception as e:
             logger.error(f"Error leyendo datos: {e}")
         
         return None
     
+    def _read_frame(self):
+        """Lectura puntual en modo binario: la trama más reciente disponible"""
+        try:
+            for _ in range(10):
+                frames = self.decoder.feed(self.serial_conn.read(max(FRAME_SIZE, self.serial_conn.in_waiting)))
+                if frames:
+                    _, raw, pct = frames[-1]
+                    return self._make_reading(raw, pct)
+        except Exception as e:
+            logger.error(f"Error leyendo datos: {e}")
+        
+        return None
+        
+    # --- Ingesta en segundo plano ---
+    
+    @property
+    def ingesting(self):
+        return self._ingest_thread is not None and self._ingest_thread.is_alive()
+        
+    def start_ingestion(self, queue_size=DEFAULT_QUEUE_SIZE):
+        """
+        Inicia un hilo que vacía el puerto continuamente y parsea cada línea
+        
+        Las lecturas van a una cola acotada; si se llena se descarta la más
+        antigua (counters['dropped']). El timestamp es el de llegada de la línea.
+        """
+        if not self.serial_conn:
+            raise RuntimeError("Arduino no conectado")
+        if self.ingesting:
+            return
+        
+        self._queue = deque(maxlen=queue_size)
+        self._ingest_stop.clear()
+        self.ingest_error = None
+        self._ingest_thread = threading.Thread(target=self._ingest_loop, name=f'serial-{self.port}', daemon=True)
+        self._ingest_thread.start()
+        
+    def _ingest_loop(self):
+        pending = b''
+        try:
+            while not self._ingest_stop.is_set():
+                # Bloquea hasta timeout (1 s) esperando el primer byte y luego toma todo lo disponible
+                chunk = self.serial_conn.read(max(1, self.serial_conn.in_waiting))
+                if not chunk:
+                    continue
+                arrival = datetime.now()
+                self.counters['bytes'] += len(chunk)
+                
+                if self.decoder:
+                    for _, raw, pct in self.decoder.feed(chunk):
+                        self._enqueue(self._make_reading(raw, pct, arrival))
+                    continue
+                
+                lines = (pending + chunk).split(b'\n')
+                pending = lines.pop()
+                if len(pending) > MAX_LINE_BYTES:
+                    # Sin fin de línea a la vista: se descarta para no crecer sin límite
+                    pending = b''
+                    self.counters['invalid'] += 1
+                for line in lines:
+                    self._handle_line(line, arrival)
+        
+        except Exception as e:
+            if not self._ingest_stop.is_set():
+                self.ingest_error = e
+                logger.error(f"❌ Error en la ingesta de {self.port}: {e}")
+        finally:
+            with self._queue_cond:
+                self._queue_cond.notify_all()
+                
+    def _handle_line(self, line, arrival):
+        self.counters['lines'] += 1
+        parsed = parse_line(line.decode('utf-8', errors='ignore'))
+        if not parsed:
+            self.counters['invalid'] += 1
+            return
+        
+        self._enqueue(self._make_reading(*parsed, timestamp=arrival))
+            
+    def _enqueue(self, reading):
+        with self._queue_cond:
+            if len(self._queue) == self._queue.maxlen:
+                self.counters['dropped'] += 1
+            self._queue.append(reading)
+            self.counters['readings'] += 1
+            self._queue_cond.notify()
+            
+    def get_reading(self, timeout=None):
+        """Siguiente lectura de la cola (None si no llega ninguna en timeout segundos)"""
+        if self._queue is None:
+            return None
+        with self._queue_cond:
+            if not self._queue and self.ingesting:
+                self._queue_cond.wait(timeout)
+            return self._queue.popleft() if self._queue else None
+            
+    def drain(self):
+        """Saca todas las lecturas pendientes de la cola"""
+        if self._queue is None:
+            return []
+        with self._queue_cond:
+            readings = list(self._queue)
+            self._queue.clear()
+        return readings
+        
+    def ingestion_stats(self):
+        stats = dict(self.counters)
+        if self.decoder:
+            stats.update(self.decoder.counters)
+        stats['queued'] = len(self._queue) if self._queue is not None else 0
+        stats['running'] = self.ingesting
+        stats['error'] = str(self.ingest_error) if self.ingest_error else None
+        return stats
+        
+    def stop_ingestion(self):
+        self._ingest_stop.set()
+        if self._ingest_thread:
+            self._ingest_thread.join(2)
+            self._ingest_thread = None
+            
     def close(self):
         """Cerrar conexión"""
+        self.stop_ingestion()
         if self.serial_conn:
             self.serial_conn.close()
             logger.info("🔌 Conexión Arduino cerrada")
\ No newline at end of file
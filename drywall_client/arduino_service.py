@@ -1,145 +1,363 @@
-from arduino_reader import ArduinoReader
-import csv
-import logging
-from datetime import datetime
-from pathlib import Path
-import time
-
-logger = logging.getLogger(__name__)
-
-def get_daily_csv_path():
-    """Obtiene la ruta del archivo CSV del día actual"""
-    script_dir = Path(__file__).parent
-    data_dir = script_dir / "data"
-    data_dir.mkdir(exist_ok=True)
-    
-    # Nombre del archivo con fecha actual
-    today = datetime.now().strftime('%Y%m%d')
-    filename = f"arduino_data_{today}.csv"
-    filepath = data_dir / filename
-    
-    return filepath
-
-def ensure_csv_header(filepath):
-    """Asegura que el archivo CSV tenga el header si es nuevo"""
-    if not filepath.exists():
-        with open(filepath, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['timestamp', 'humidity_pct', 'raw_value', 'device_id'])
-        return True  # Archivo nuevo creado
-    else:
-        return False  # Archivo existente
-
-def append_to_daily_csv(sensor_data):
-    """Agrega datos al archivo CSV diario (sin mensajes)"""
-    filepath = get_daily_csv_path()
-    ensure_csv_header(filepath)  # Solo crea header si es necesario
-    
-    # Agregar nueva fila al CSV
-    with open(filepath, 'a', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            sensor_data['timestamp'],
-            sensor_data['humidity_pct'],
-            sensor_data['raw_value'],
-            sensor_data['device_id']
-        ])
-    
-    return filepath
-
-def generate_arduino_data():
-    """
-    Función compatible con tu simple_auto.py
-    Lee UNA SOLA vez y retorna (para simple_auto.py)
-    """
-    reader = ArduinoReader()
-    
-    if not reader.connect():
-        raise Exception("No se pudo conectar al Arduino")
-    
-    try:
-        # Leer datos del sensor
-        sensor_data = reader.read_sensor_data()
-        
-        if not sensor_data:
-            raise Exception("No se pudieron leer datos del sensor")
-        
-        # Agregar al archivo CSV diario
-        filepath = append_to_daily_csv(sensor_data)
-        
-        # Crear líneas de salida compatibles con tu simple_auto.py
-        output_lines = [
-            f"[STATS] Humedad: {sensor_data['humidity_pct']}%",
-            f"[STATS] Valor RAW: {sensor_data['raw_value']}",
-            f"[STATS] Dispositivo: {sensor_data['device_id']}",
-            f"[STATS] Timestamp: {sensor_data['timestamp']}",
-            f"[FILE] Archivo: {filepath}"
-        ]
-        
-        # Imprimir para compatibilidad
-        for line in output_lines:
-            print(line)
-        
-        return {
-            'output_lines': output_lines,
-            'filepath': str(filepath),
-            'data': sensor_data
-        }
-        
-    finally:
-        reader.close()
-
-def continuous_logging():
-    """
-    Logging continuo - función principal
-    """
-    reader = ArduinoReader()
-    
-    if not reader.connect():
-        print("❌ No se pudo conectar al Arduino")
-        return
-    
-    # Configurar archivo CSV una sola vez
-    filepath = get_daily_csv_path()
-    is_new_file = ensure_csv_header(filepath)
-    
-    if is_new_file:
-        print(f"📄 Nuevo archivo CSV creado: {filepath.name}")
-    else:
-        print(f"📄 Usando archivo CSV existente: {filepath.name}")
-    
-    print(f"🔄 Logging continuo iniciado...")
-    print("Presiona Ctrl+C para detener")
-    print("-" * 50)
-    
-    start_time = datetime.now()
-    readings_count = 0
-    
-    try:
-        while True:
-            sensor_data = reader.read_sensor_data()
-            
-            if sensor_data:
-                # Guardar en CSV diario (sin mensajes)
-                append_to_daily_csv(sensor_data)
-                readings_count += 1
-                
-                # Mostrar en consola (simple y limpio)
-                current_time = datetime.now().strftime('%H:%M:%S')
-                print(f"📊 {current_time} - "
-                      f"Humedad: {sensor_data['humidity_pct']}% "
-                      f"(Raw: {sensor_data['raw_value']})")
-            
-            # Pausa entre lecturas
-            time.sleep(1)
-            
-    except KeyboardInterrupt:
-        print(f"\n⏹️  Logging detenido. Total lecturas: {readings_count}")
-        print(f"💾 Datos guardados en: {filepath.name}")
-    
-    finally:
-        reader.close()
-
-if __name__ == "__main__":
-    # Ejecutar logging continuo directamente
+from arduino_reader import ArduinoReader
+from rolling_features import RollingFeatureEngine
+from reading_wal import ReadingWAL
+from minute_aggregator import MinuteAggregationSink, MINUTE_COLUMNS, MINUTE_PREFIX
+import csv
+import os
+import logging
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CSV_HEADER = ['timestamp', 'humidity_pct', 'raw_value', 'device_id']
+DEFAULT_FLUSH_ROWS = 100
+DEFAULT_FLUSH_INTERVAL = 5.0  # segundos
+
+def get_daily_csv_path(day=None, prefix='arduino_data'):
+    """Obtiene la ruta del archivo CSV del día actual (o del día YYYYMMDD indicado)"""
+    script_dir = Path(__file__).parent
+    data_dir = script_dir / "data"
+    data_dir.mkdir(exist_ok=True)
+    
+    # Nombre del archivo con fecha actual
+    today = day or datetime.now().strftime('%Y%m%d')
+    filename = f"{prefix}_{today}.csv"
+    filepath = data_dir / filename
+    
+    return filepath
+
+def ensure_csv_header(filepath):
+    """Asegura que el archivo CSV tenga el header si es nuevo"""
+    if not filepath.exists():
+        with open(filepath, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADER)
+        return True  # Archivo nuevo creado
+    else:
+        return False  # Archivo existente
+
+def append_to_daily_csv(sensor_data):
+    """Agrega datos al archivo CSV diario (sin mensajes)"""
+    filepath = get_daily_csv_path()
+    ensure_csv_header(filepath)  # Solo crea header si es necesario
+    
+    # Agregar nueva fila al CSV
+    with open(filepath, 'a', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            sensor_data['timestamp'],
+            sensor_data['humidity_pct'],
+            sensor_data['raw_value'],
+            sensor_data['device_id']
+        ])
+    
+    return filepath
+
+def reading_day(timestamp):
+    """Día YYYYMMDD de una lectura (timestamp ISO o datetime)"""
+    if isinstance(timestamp, str):
+        return timestamp[:10].replace('-', '')
+    return timestamp.strftime('%Y%m%d')
+
+class DailyCSVWriter:
+    def __init__(self, flush_rows=DEFAULT_FLUSH_ROWS, flush_interval=DEFAULT_FLUSH_INTERVAL, wal=None,
+                 prefix='arduino_data', columns=CSV_HEADER):
+        """
+        Escritor de larga duración del CSV diario
+        
+        Mantiene el archivo abierto y acumula filas; escribe al llegar a
+        flush_rows, cuando pasan flush_interval segundos o al cerrar. Cambia de
+        archivo según la fecha de cada lectura, así las filas pendientes del día
+        anterior se escriben en su archivo antes de abrir el nuevo.
+        
+        Con wal (reading_wal.ReadingWAL) cada lectura pasa antes por el log; al
+        crear el escritor se recupera lo que no llegó al CSV. Cada escritura
+        anota en el WAL el tamaño previo del CSV, hace fsync y confirma en el
+        log solo hasta la última lectura escrita, así una caída a medias no deja
+        filas rotas ni duplicadas y lo que sigue en el buffer no se pierde.
+        
+        prefix y columns permiten reutilizarlo para otros registros diarios
+        (p. ej. los agregados por minuto de minute_aggregator.py).
+        """
+        self.flush_rows = flush_rows
+        self.prefix = prefix
+        self.columns = list(columns)
+        self.flush_interval = flush_interval
+        self.day = None
+        self.path = None
+        self.file = None
+        self.csv_writer = None
+        self.rows = []
+        self.buffered_seq = None  # seq del WAL de la última fila del buffer
+        self.last_flush = time.monotonic()
+        self.written = 0
+        self.flushes = 0
+        self.lock = threading.Lock()
+        self.wal = wal
+        
+        if wal:
+            recovered = wal.recover()
+            if recovered:
+                logger.info(f"♻️  {len(recovered)} lecturas recuperadas del WAL")
+                with self.lock:
+                    self._buffer_rows([reading for _, reading in recovered], recovered[0][0])
+                    self._flush_locked()
+    
+    def _open(self, day):
+        self.day = day
+        self.path = get_daily_csv_path(day, self.prefix)
+        new_file = not self.path.exists() or self.path.stat().st_size == 0
+        self.file = open(self.path, 'a', newline='')
+        self.csv_writer = csv.writer(self.file)
+        if new_file:
+            self.csv_writer.writerow(self.columns)
+    
+    def _flush_locked(self):
+        applied_seq = None
+        if self.rows:
+            if self.wal:
+                # Tamaño antes de anexar: la recuperación corta aquí una escritura a medias
+                self.file.flush()
+                self.wal.begin_apply(self.path, os.fstat(self.file.fileno()).st_size)
+            self.csv_writer.writerows(self.rows)
+            self.written += len(self.rows)
+            self.flushes += 1
+            self.rows = []
+            applied_seq = self.buffered_seq
+            self.buffered_seq = None
+        if self.file:
+            self.file.flush()
+            if self.wal and applied_seq is not None:
+                # Las filas ya están en disco: el log puede descartarlas
+                os.fsync(self.file.fileno())
+                self.wal.checkpoint(applied_seq)
+        self.last_flush = time.monotonic()
+    
+    def _buffer_rows(self, readings, first_seq=None):
+        for index, r in enumerate(readings):
+            day = reading_day(r['timestamp'])
+            if day != self.day:
+                # Medianoche: vaciar el buffer en el archivo del día anterior y rotar
+                if self.file:
+                    self._flush_locked()
+                    self.file.close()
+                self._open(day)
+            self.rows.append([r[column] for column in self.columns])
+            if first_seq is not None:
+                self.buffered_seq = first_seq + index
+    
+    def write(self, sensor_data):
+        """Agrega una lectura al buffer"""
+        self.write_many([sensor_data])
+    
+    def write_many(self, readings):
+        """Agrega varias lecturas (de cualquier dispositivo) al buffer"""
+        with self.lock:
+            first_seq = self.wal.append(readings) if self.wal else None
+            self._buffer_rows(readings, first_seq)
+            
+            if len(self.rows) >= self.flush_rows or time.monotonic() - self.last_flush >= self.flush_interval:
+                self._flush_locked()
+    
+    def maybe_flush(self):
+        """Escribe el buffer si pasó flush_interval (para llamar en bucles sin lecturas)"""
+        with self.lock:
+            if self.rows and time.monotonic() - self.last_flush >= self.flush_interval:
+                self._flush_locked()
+            if self.wal:
+                self.wal.maybe_sync()
+    
+    def flush(self):
+        with self.lock:
+            if self.file:
+                self._flush_locked()
+    
+    def close(self):
+        with self.lock:
+            if self.file:
+                self._flush_locked()
+                self.file.close()
+                self.file = None
+                self.day = None
+            if self.wal:
+                self.wal.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def generate_arduino_data():
+    """
+    Función compatible con tu simple_auto.py
+    Lee UNA SOLA vez y retorna (para simple_auto.py)
+    
+    Si arduino_daemon.py está en marcha se toma su última lectura (sin abrir el
+    puerto ni esperar el reset del Arduino); si no, se conecta para esta lectura.
+    """
+    sensor_data, filepath = read_from_daemon()
+    if sensor_data:
+        return _report_reading(sensor_data, filepath)
+    
+    reader = ArduinoReader()
+    
+    if not reader.connect():
+        raise Exception("No se pudo conectar al Arduino")
+    
+    try:
+        # Leer datos del sensor
+        sensor_data = reader.read_sensor_data()
+        
+        if not sensor_data:
+            raise Exception("No se pudieron leer datos del sensor")
+        
+        # Agregar al archivo CSV diario
+        filepath = append_to_daily_csv(sensor_data)
+        
+        return _report_reading(sensor_data, filepath)
+    
+    finally:
+        reader.close()
+
+def read_from_daemon(max_age=None):
+    """
+    Última lectura del servicio persistente (arduino_daemon.py)
+    
+    Returns:
+        tuple: (lectura, ruta CSV) o (None, None) si el servicio no está disponible
+    """
+    # Import local: arduino_daemon importa este módulo
+    from arduino_daemon import DaemonClient, DEFAULT_MAX_AGE
+    
+    client = DaemonClient()
+    if not client.available():
+        return None, None
+    
+    try:
+        stats = client.stats()
+        sensor_data = client.latest(DEFAULT_MAX_AGE if max_age is None else max_age)
+    except Exception as e:
+        logger.warning(f"⚠️  Servicio Arduino no responde: {e}")
+        return None, None
+    
+    if not sensor_data:
+        return None, None
+    
+    sensor_data = {key: sensor_data[key] for key in ('timestamp', 'raw_value', 'humidity_pct', 'device_id')}
+    if stats.get('upload_prefix'):
+        # El servicio ya guarda las lecturas (crudas, comprimidas o por minuto): vaciar sus buffers
+        client.request('flush')
+        return sensor_data, get_daily_csv_path(reading_day(sensor_data['timestamp']), stats['upload_prefix'])
+    return sensor_data, append_to_daily_csv(sensor_data)
+
+def _report_reading(sensor_data, filepath):
+    """Líneas de salida y resultado de generate_arduino_data"""
+    # Crear líneas de salida compatibles con tu simple_auto.py
+    output_lines = [
+        f"[STATS] Humedad: {sensor_data['humidity_pct']}%",
+        f"[STATS] Valor RAW: {sensor_data['raw_value']}",
+        f"[STATS] Dispositivo: {sensor_data['device_id']}",
+        f"[STATS] Timestamp: {sensor_data['timestamp']}",
+        f"[FILE] Archivo: {filepath}"
+    ]
+    
+    # Imprimir para compatibilidad
+    for line in output_lines:
+        print(line)
+    
+    return {
+        'output_lines': output_lines,
+        'filepath': str(filepath),
+        'data': sensor_data
+    }
+
+def continuous_logging(feature_engine=None, use_wal=True, aggregate=False, raw_retention_days=None):
+    """
+    Logging continuo - función principal
+    
+    Cada lectura actualiza el motor de características móviles (el mismo que
+    rolling_features.compute_rolling_features usa en lote).
+    
+    El puerto se vacía en un hilo de ingesta, así que no se pierden muestras
+    del sketch por pausas y cada lectura lleva la hora de llegada de su línea.
+    Con use_wal las lecturas pasan por un write-ahead log (ver reading_wal.py).
+    Con aggregate se escriben además registros por minuto (ver minute_aggregator.py).
+    """
+    reader = ArduinoReader()
+    
+    if not reader.connect():
+        print("❌ No se pudo conectar al Arduino")
+        return
+    
+    reader.start_ingestion()
+    
+    # Archivo CSV abierto durante todo el logging (rota solo a medianoche)
+    filepath = get_daily_csv_path()
+    csv_writer = DailyCSVWriter(wal=ReadingWAL('logging') if use_wal else None)
+    minute_sink = None
+    if aggregate:
+        minute_sink = MinuteAggregationSink(
+            DailyCSVWriter(prefix=MINUTE_PREFIX, columns=MINUTE_COLUMNS), raw_retention_days)
+    
+    if not filepath.exists():
+        print(f"📄 Nuevo archivo CSV: {filepath.name}")
+    else:
+        print(f"📄 Usando archivo CSV existente: {filepath.name}")
+    
+    print(f"🔄 Logging continuo iniciado...")
+    print("Presiona Ctrl+C para detener")
+    print("-" * 50)
+    
+    start_time = datetime.now()
+    readings_count = 0
+    engine = feature_engine or RollingFeatureEngine()
+    window = engine.windows[0]
+    
+    try:
+        while True:
+            # Espera la siguiente lectura de la cola de ingesta (sin pausas fijas)
+            sensor_data = reader.read_sensor_data(timeout=1)
+            
+            if sensor_data:
+                # Guardar en CSV diario (sin mensajes)
+                csv_writer.write(sensor_data)
+                if minute_sink:
+                    minute_sink.write(sensor_data)
+                readings_count += 1
+                
+                features = engine.update(sensor_data['device_id'], sensor_data['timestamp'], sensor_data)
+                
+                # Mostrar en consola (simple y limpio)
+                current_time = datetime.now().strftime('%H:%M:%S')
+                print(f"📊 {current_time} - "
+                      f"Humedad: {sensor_data['humidity_pct']}% "
+                      f"(Raw: {sensor_data['raw_value']}) | "
+                      f"Media {window}s: {features[f'humidity_pct_mean_{window}s']:.1f}% "
+                      f"EWMA: {features['humidity_pct_ewma']:.1f}%")
+            elif not reader.ingesting:
+                print(f"❌ Ingesta detenida: {reader.ingest_error}")
+                break
+            else:
+                csv_writer.maybe_flush()
+                if minute_sink:
+                    minute_sink.maybe_flush()
+            
+    except KeyboardInterrupt:
+        print(f"\n⏹️  Logging detenido. Total lecturas: {readings_count}")
+        stats = reader.ingestion_stats()
+        print(f"📈 Líneas: {stats['lines']} | Inválidas: {stats['invalid']} | Descartadas: {stats['dropped']}")
+        print(f"💾 Datos guardados en: {(csv_writer.path or filepath).name}")
+    
+    finally:
+        csv_writer.close()
+        if minute_sink:
+            minute_sink.close()
+        reader.close()
+
+if __name__ == "__main__":
+    # Ejecutar logging continuo directamente
     continuous_logging()
\ No newline at end of file
@@ -5,12 +5,13 @@ Simula el comportamiento real de sensores IoT que envían datos automáticamente
 """
 
 import time
-import subprocess
-import os
 import logging
 from pathlib import Path
 from datetime import datetime
 
+from upload_spool import UploadSpool, SpoolFlusher, DEFAULT_SPOOL_DIR
+from generate_humidity import generate_humidity_data, summary_lines
+
 # Configurar logging
 logging.basicConfig(
     level=logging.INFO,
@@ -22,61 +23,91 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Cada runner usa su propio spool (simple_auto usa spool/local)
+SPOOL_DIR = DEFAULT_SPOOL_DIR / "sftp"
+
 class AutoSensorSystem:
-    def __init__(self, interval_minutes=5):
+    def __init__(self, interval_minutes=5, spool_dir=SPOOL_DIR, spool_max_mb=200, num_records=10,
+                 sftp_host='localhost', sftp_port=2222, sftp_user='drywall_user', key_path='keys/drywall_key',
+                 remote_dir='/upload'):
         """
         Sistema automático de sensores
         
         Args:
             interval_minutes: Intervalo en minutos entre envíos de datos
+            spool_dir: Directorio del spool para envíos pendientes
+            spool_max_mb: Límite de disco del spool en MB
+            num_records: Registros generados por ciclo
+            sftp_host, sftp_port, sftp_user, key_path: Servidor SFTP (mismos defaults que sftp_upload.py)
+            remote_dir: Directorio remoto de destino
         """
+        # Import diferido: sftp_upload configura su propio logging al importarse
+        from sftp_upload import SFTPClient
+        from content_hash import AckedHashIndex, DEFAULT_ACK_INDEX
+        
         self.interval_minutes = interval_minutes
         self.interval_seconds = interval_minutes * 60
+        self.num_records = num_records
+        self.remote_dir = remote_dir
         self.running = False
         
-        # Verificar que los scripts existen
-        self.generate_script = Path("generate_humidity.py")
-        self.upload_script = Path("sftp_upload.py")
+        # Una sola sesión SSH reutilizada entre ciclos (se reabre si se cae)
+        self.sftp = SFTPClient(
+            hostname=sftp_host,
+            port=sftp_port,
+            username=sftp_user,
+            key_path=key_path,
+            ack_index=AckedHashIndex(DEFAULT_ACK_INDEX)
+        )
         
-        if not self.generate_script.exists():
-            raise FileNotFoundError(f"Script no encontrado: {self.generate_script}")
-        if not self.upload_script.exists():
-            raise FileNotFoundError(f"Script no encontrado: {self.upload_script}")
+        # Spool local: los archivos se conservan hasta que el banco confirma
+        self.spool = UploadSpool(spool_dir, max_bytes=spool_max_mb * 1024 * 1024)
+        self.flusher = SpoolFlusher(self.spool, self.upload_via_sftp)
     
     def generate_sensor_data(self):
-        """Generar nuevos datos de sensores"""
+        """
+        Generar nuevos datos de sensores en el propio proceso
+        
+        Returns:
+            dict: filepath, summary (records, avg_humidity, avg_temperature, alerts)
+                  y elapsed_seconds; None si falla
+        """
         try:
             logger.info("🔧 Generando nuevos datos de sensores...")
-            result = subprocess.run(
-                ["python", str(self.generate_script)],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            logger.info(f"✅ Datos generados exitosamente")
-            logger.info(f"📊 Output: {result.stdout.strip()}")
-            return True
-        except subprocess.CalledProcessError as e:
+            start = time.perf_counter()
+            summary = {}
+            filepath = generate_humidity_data(self.num_records, quiet=True, summary=summary)
+            elapsed = time.perf_counter() - start
+            
+            logger.info(f"✅ Datos generados exitosamente en {elapsed * 1000:.1f} ms")
+            for line in summary_lines(filepath, 'csv', summary):
+                logger.info(f"📊 {line}")
+            return {'filepath': filepath, 'summary': summary, 'elapsed_seconds': elapsed}
+        except Exception as e:
             logger.error(f"❌ Error generando datos: {e}")
-            logger.error(f"💥 Error output: {e.stderr}")
-            return False
+            return None
     
-    def upload_via_sftp(self):
-        """Subir datos via SFTP"""
+    def upload_via_sftp(self, local_file):
+        """
+        Subir un archivo por la sesión SFTP persistente
+        
+        Returns:
+            str: Ruta remota (las métricas quedan en self.sftp.last_transfer); False si falla
+        """
         try:
-            logger.info("📤 Subiendo datos via SFTP...")
-            result = subprocess.run(
-                ["python", str(self.upload_script)],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            logger.info(f"✅ Datos subidos exitosamente")
-            logger.info(f"📡 Output: {result.stdout.strip()}")
-            return True
-        except subprocess.CalledProcessError as e:
+            logger.info(f"📤 Subiendo {Path(local_file).name} via SFTP...")
+            if not self.sftp.is_connected():
+                self.sftp.disconnect()
+                if not self.sftp.connect():
+                    return False
+            
+            remote_path = self.sftp.upload_file(local_file, self.remote_dir)
+            logger.info(f"✅ Datos subidos exitosamente: {remote_path}")
+            return remote_path
+        except Exception as e:
             logger.error(f"❌ Error subiendo datos: {e}")
-            logger.error(f"💥 Error output: {e.stderr}")
+            # Sesión en estado dudoso: se reabre en el próximo envío
+            self.sftp.disconnect()
             return False
     
     def send_sensor_cycle(self):
@@ -84,19 +115,22 @@ class AutoSensorSystem:
         logger.info(f"🚀 Iniciando ciclo de sensores - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         
         # Paso 1: Generar datos
-        if not self.generate_sensor_data():
+        generated = self.generate_sensor_data()
+        if not generated:
             logger.error("💥 Falló la generación de datos")
             return False
         
-        # Pequeña pausa entre pasos
-        time.sleep(2)
+        # Paso 2: Guardar en el spool antes de intentar el envío
+        self.spool.enqueue(generated['filepath'])
         
-        # Paso 2: Subir via SFTP
-        if not self.upload_via_sftp():
-            logger.error("💥 Falló la subida SFTP")
+        # Paso 3: Vaciar el spool via SFTP (los más antiguos primero)
+        sent, failed = self.flusher.flush_once()
+        if failed:
+            stats = self.spool.stats()
+            logger.error(f"💥 Falló la subida SFTP, {stats['pending']} archivos pendientes en el spool")
             return False
         
-        logger.info(f"✅ Ciclo completado exitosamente")
+        logger.info(f"✅ Ciclo completado exitosamente ({sent} archivos enviados)")
         return True
     
     def start_automatic_system(self):
@@ -107,6 +141,9 @@ class AutoSensorSystem:
         logger.info(f"🔄 Enviando datos cada {self.interval_seconds} segundos")
         logger.info("⭐ Presiona Ctrl+C para detener")
         
+        # Reintentos en segundo plano de lo que quede en el spool
+        self.flusher.start()
+        
         try:
             # Primer ciclo inmediato
             logger.info("🎯 Ejecutando primer ciclo...")
@@ -133,6 +170,10 @@ class AutoSensorSystem:
     def stop(self):
         """Detener el sistema"""
         self.running = False
+        self.flusher.stop()
+        self.sftp.disconnect()
+        logger.info(f"📦 Spool: {self.spool.stats()}")
+        self.spool.close()
         logger.info("🔚 Sistema automático detenido")
 
 def main():
@@ -163,9 +204,6 @@ def main():
     try:
         system = AutoSensorSystem(interval_minutes=interval)
         system.start_automatic_system()
-    except FileNotFoundError as e:
-        logger.error(f"❌ {e}")
-        logger.error("💡 Asegúrate de ejecutar desde el directorio drywall_client")
     except Exception as e:
         logger.error(f"💥 Error inesperado: {e}")
 
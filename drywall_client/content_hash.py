@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+DryWall Client - Hash de contenido para deduplicar subidas
+Calcula SHA-256 en streaming y recuerda qué contenidos ya confirmó el banco
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1 MB
+DEFAULT_ACK_INDEX = Path(__file__).parent / "data" / "acked_hashes.json"
+
+
+def file_sha256(file_path, chunk_size=HASH_CHUNK_SIZE):
+    """Calcula el SHA-256 de un archivo leyendo por bloques (memoria constante)"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AckedHashIndex:
+    def __init__(self, index_path=DEFAULT_ACK_INDEX):
+        """
+        Índice local de hashes ya confirmados por el banco
+
+        Args:
+            index_path: Archivo JSON donde se persiste el índice
+        """
+        self.index_path = Path(index_path)
+        self.lock = threading.Lock()
+        self.entries = {}
+
+        if self.index_path.exists():
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def get(self, sha256):
+        """Devuelve la entrada registrada para un hash o None"""
+        with self.lock:
+            entry = self.entries.get(sha256)
+            return dict(entry) if entry else None
+
+    def is_acked(self, sha256):
+        with self.lock:
+            return sha256 in self.entries
+
+    def record(self, sha256, name, remote_path):
+        """Registra un contenido confirmado y persiste el índice"""
+        with self.lock:
+            self.entries[sha256] = {
+                'name': name,
+                'remote_path': remote_path,
+                'acked_at': datetime.now().isoformat()
+            }
+            self._save()
+
+    def _save(self):
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
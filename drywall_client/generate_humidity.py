@@ -11,33 +11,84 @@ import json
 from datetime import datetime, timedelta
 import os
 
-def generate_humidity_data(num_records=10, output_file=None, format_type='csv'):
+from output_writers import FORMATS, open_writer, read_output
+
+# Configuración de sensores
+LOCATIONS = [
+    'Sala Servidor A', 'Sala Servidor B', 'Oficina Principal', 
+    'Oficina Secundaria', 'Almacén Equipos', 'Centro Datos',
+    'Sala Comunicaciones', 'Backup Room'
+]
+
+SENSOR_TYPES = ['DHT22', 'SHT30', 'BME280', 'AM2302']
+
+FIELDNAMES = [
+    'timestamp', 'sensor_id', 'sensor_type', 'humidity_percent', 'temperature_celsius',
+    'location', 'alert_level', 'battery_level', 'signal_strength'
+]
+
+# Tipos de cada columna para los formatos tipados (sidecar .schema.json)
+HUMIDITY_SCHEMA = {
+    'timestamp': 'string',
+    'sensor_id': 'string',
+    'sensor_type': 'string',
+    'humidity_percent': 'float64',
+    'temperature_celsius': 'float64',
+    'location': 'string',
+    'alert_level': 'string',
+    'battery_level': 'float64',
+    'signal_strength': 'int64'
+}
+
+# csv/json más los formatos de output_writers
+OUTPUT_FORMATS = ['csv', 'json'] + [f for f in FORMATS if f != 'csv']
+
+def default_output_file(format_type):
+    """Ruta por defecto data/humedad_TIMESTAMP.ext"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    extension = '.json' if format_type == 'json' else FORMATS[format_type]
+    return f"data/humedad_{timestamp}{extension}"
+
+def summary_lines(output_file, format_type, summary):
+    """Líneas [OK]/[FILE]/[STATS] que imprime el generador a partir de su resumen"""
+    lines = [
+        f"[OK] Generados {summary['records']} registros en formato {format_type.upper()}",
+        f"[FILE] Archivo: {output_file}"
+    ]
+    if summary['records']:
+        lines.append(f"[STATS] Humedad promedio: {summary['avg_humidity']:.1f}%")
+        lines.append(f"[STATS] Temperatura promedio: {summary['avg_temperature']:.1f}°C")
+        lines.append(f"[STATS] Alertas generadas: {summary['alerts']}")
+        if summary.get('sensors'):
+            lines.append(f"[STATS] Sensores en la flota: {summary['sensors']}")
+    return lines
+
+def generate_humidity_data(num_records=10, output_file=None, format_type='csv', num_sensors=None,
+                           quiet=False, summary=None):
     """
     Genera datos simulados de sensores de humedad
     
     Args:
         num_records (int): Número de registros a generar
         output_file (str): Nombre del archivo de salida
-        format_type (str): Formato de salida ('csv' o 'json')
+        format_type (str): Formato de salida ('csv', 'json', 'ndjson.gz', 'parquet' o 'feather')
+        num_sensors (int): Flota fija de sensores (usa la versión vectorizada)
+        quiet (bool): No imprimir el resumen
+        summary (dict): Si se pasa, se rellena con records, avg_humidity,
+                        avg_temperature, alerts y sensors (para llamadas en proceso)
     """
     
+    # Los formatos columnares se escriben por bloques desde la versión vectorizada
+    if num_sensors or format_type not in ('csv', 'json'):
+        return generate_humidity_data_vectorized(num_records, output_file, format_type,
+                                                 num_sensors=num_sensors, quiet=quiet, summary=summary)
+    
     # Si no se especifica archivo, usar timestamp
     if output_file is None:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        extension = 'csv' if format_type == 'csv' else 'json'
-        output_file = f"data/humedad_{timestamp}.{extension}"
+        output_file = default_output_file(format_type)
     
     # Crear directorio data si no existe
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    
-    # Configuración de sensores
-    locations = [
-        'Sala Servidor A', 'Sala Servidor B', 'Oficina Principal', 
-        'Oficina Secundaria', 'Almacén Equipos', 'Centro Datos',
-        'Sala Comunicaciones', 'Backup Room'
-    ]
-    
-    sensor_types = ['DHT22', 'SHT30', 'BME280', 'AM2302']
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
     
     # Generar datos
     records = []
@@ -62,10 +113,10 @@ def generate_humidity_data(num_records=10, output_file=None, format_type='csv'):
         record = {
             'timestamp': record_time.strftime("%Y-%m-%d %H:%M:%S"),
             'sensor_id': f"DW_SENSOR_{i+1:03d}",
-            'sensor_type': random.choice(sensor_types),
+            'sensor_type': random.choice(SENSOR_TYPES),
             'humidity_percent': round(humidity, 2),
             'temperature_celsius': round(temperature, 2),
-            'location': random.choice(locations),
+            'location': random.choice(LOCATIONS),
             'alert_level': alert_level,
             'battery_level': round(random.uniform(75.0, 100.0), 1),
             'signal_strength': random.randint(-70, -30)  # dBm
@@ -98,18 +149,281 @@ def generate_humidity_data(num_records=10, output_file=None, format_type='csv'):
         with open(output_file, 'w', encoding='utf-8') as jsonfile:
             json.dump(output_data, jsonfile, indent=2, ensure_ascii=False)
     
-    print(f"[OK] Generados {num_records} registros en formato {format_type.upper()}")
-    print(f"[FILE] Archivo: {output_file}")
-    
     # Estadísticas
+    result = {'records': num_records, 'avg_humidity': None, 'avg_temperature': None, 'alerts': 0, 'sensors': None}
     if records:
-        avg_humidity = sum(r['humidity_percent'] for r in records) / len(records)
-        avg_temp = sum(r['temperature_celsius'] for r in records) / len(records)
-        alerts = len([r for r in records if r['alert_level'] != 'NORMAL'])
+        result['avg_humidity'] = sum(r['humidity_percent'] for r in records) / len(records)
+        result['avg_temperature'] = sum(r['temperature_celsius'] for r in records) / len(records)
+        result['alerts'] = len([r for r in records if r['alert_level'] != 'NORMAL'])
+    if summary is not None:
+        summary.update(result)
+    
+    if not quiet:
+        for line in summary_lines(output_file, format_type, result):
+            print(line)
+    
+    return output_file
+
+def build_sensor_fleet(num_sensors, rng, first_sensor=1):
+    """
+    Crea una flota de sensores persistentes con ubicación y tipo fijos
+    
+    Args:
+        num_sensors (int): Número de sensores
+        rng (numpy.random.Generator): Generador aleatorio
+        first_sensor (int): Número del primer sensor (DW_SENSOR_<n>)
+    
+    Returns:
+        dict: Arrays por sensor (número, tipo, ubicación y parámetros de su serie)
+    """
+    import numpy as np
+    
+    return {
+        'sensor_number': np.arange(first_sensor, first_sensor + num_sensors),
+        'type_idx': rng.integers(0, len(SENSOR_TYPES), num_sensors),
+        'location_idx': rng.integers(0, len(LOCATIONS), num_sensors),
+        # Cada sensor oscila alrededor de su propio nivel con un ciclo diario
+        'base_humidity': rng.uniform(40.0, 60.0, num_sensors),
+        'daily_amplitude': rng.uniform(1.0, 6.0, num_sensors),
+        'base_temperature': rng.uniform(18.0, 24.0, num_sensors),
+        'battery_start': rng.uniform(85.0, 100.0, num_sensors),
+        'battery_drain': rng.uniform(0.0, 0.002, num_sensors),  # % por lectura
+        'base_signal': rng.integers(-67, -33, num_sensors, endpoint=True)
+    }
+
+def _random_chunks(num_records, chunk_size, rng, np):
+    """Bloques de lecturas independientes (un sensor nuevo por registro) en la última hora"""
+    window_seconds = 3600
+    window_start = datetime.now().replace(microsecond=0) - timedelta(seconds=window_seconds)
+    timestamps = np.array([
+        (window_start + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S")
+        for i in range(window_seconds + 1)
+    ])
+    
+    for start in range(0, num_records, chunk_size):
+        n = min(chunk_size, num_records - start)
+        
+        # Cada bloque ocupa su tramo proporcional de la ventana: orden global sin sort global
+        offsets = (start + np.sort(rng.random(n)) * n) / num_records * window_seconds
+        
+        # Rango normal: 40-60% humedad, 18-24°C (alta humedad tiende a subir la temperatura)
+        humidity = np.round(rng.uniform(35.0, 75.0, n) * 100).astype(np.int64)
+        temperature = rng.uniform(16.0, 28.0, n)
+        temperature += np.where(humidity > 6500, rng.uniform(1.0, 3.0, n), 0.0)
+        
+        yield {
+            'timestamp': timestamps[offsets.astype(np.int64)],
+            'sensor_number': np.arange(start + 1, start + n + 1),
+            'type_idx': rng.integers(0, len(SENSOR_TYPES), n),
+            'humidity': humidity,
+            'temperature': np.round(temperature * 100).astype(np.int64),
+            'location_idx': rng.integers(0, len(LOCATIONS), n),
+            'battery': np.round(rng.uniform(75.0, 100.0, n) * 10).astype(np.int64),
+            'signal': rng.integers(-70, -30, n, endpoint=True)  # dBm
+        }
+
+def _fleet_chunks(num_records, fleet, interval_seconds, chunk_size, rng, np):
+    """Bloques de series temporales de una flota fija: una lectura por sensor e intervalo"""
+    num_sensors = len(fleet['sensor_number'])
+    num_steps = -(-num_records // num_sensors)
+    steps_per_chunk = max(1, chunk_size // num_sensors)
+    
+    end_time = np.datetime64(datetime.now().replace(microsecond=0), 's')
+    start_time = end_time - np.timedelta64((num_steps - 1) * interval_seconds, 's')
+    drift = np.zeros(num_sensors)  # Deriva lenta por sensor, continua entre bloques
+    
+    for first_step in range(0, num_steps, steps_per_chunk):
+        steps = np.arange(first_step, min(first_step + steps_per_chunk, num_steps))
+        step_times = start_time + (steps * interval_seconds).astype('timedelta64[s]')
         
-        print(f"[STATS] Humedad promedio: {avg_humidity:.1f}%")
-        print(f"[STATS] Temperatura promedio: {avg_temp:.1f}°C")
-        print(f"[STATS] Alertas generadas: {alerts}")
+        # Matrices pasos x sensores
+        hour = (step_times - step_times.astype('datetime64[D]')).astype(np.int64) / 3600
+        daily = np.sin(2 * np.pi * (hour - 9) / 24)[:, None]  # Más húmedo de noche
+        steps_drift = drift + np.cumsum(rng.normal(0, 0.05, (len(steps), num_sensors)), axis=0)
+        drift = steps_drift[-1]
+        
+        humidity = (fleet['base_humidity'] - fleet['daily_amplitude'] * daily + steps_drift
+                    + rng.normal(0, 0.3, steps_drift.shape))
+        humidity = np.clip(np.round(humidity * 100), 3500, 7500).astype(np.int64)
+        
+        temperature = (fleet['base_temperature'] + 2.0 * daily
+                       + rng.normal(0, 0.2, humidity.shape)
+                       + np.where(humidity > 6500, 2.0, 0.0))
+        temperature = np.clip(np.round(temperature * 100), 1600, 3100).astype(np.int64)
+        
+        battery = fleet['battery_start'] - fleet['battery_drain'] * steps[:, None]
+        battery = np.clip(np.round(battery * 10), 750, 1000).astype(np.int64)
+        
+        signal = np.clip(fleet['base_signal'] + rng.integers(-3, 3, humidity.shape, endpoint=True), -70, -30)
+        
+        # El último paso puede quedar incompleto para respetar num_records
+        n = min(humidity.size, num_records - first_step * num_sensors)
+        step_labels = np.char.replace(np.datetime_as_string(step_times), 'T', ' ')
+        
+        yield {
+            'timestamp': np.repeat(step_labels, num_sensors)[:n],
+            'sensor_number': np.tile(fleet['sensor_number'], len(steps))[:n],
+            'type_idx': np.tile(fleet['type_idx'], len(steps))[:n],
+            'humidity': humidity.ravel()[:n],
+            'temperature': temperature.ravel()[:n],
+            'location_idx': np.tile(fleet['location_idx'], len(steps))[:n],
+            'battery': battery.ravel()[:n],
+            'signal': signal.ravel()[:n]
+        }
+
+def generate_humidity_data_vectorized(num_records=10, output_file=None, format_type='csv',
+                                      chunk_size=100_000, seed=None, num_sensors=None,
+                                      interval_seconds=60, first_sensor=1, fleet=None, quiet=False,
+                                      summary=None):
+    """
+    Versión vectorizada con NumPy para datasets grandes (millones de registros)
+    
+    Genera las columnas por bloques con un numpy.random.Generator y las escribe
+    en disco bloque a bloque: la memoria depende de chunk_size, no de num_records.
+    Los registros salen ordenados por timestamp sin ordenar todo el dataset.
+    
+    Sin num_sensors cada registro es un sensor nuevo dentro de la última hora
+    (comportamiento de generate_humidity_data). Con num_sensors se simula una
+    flota fija: cada sensor conserva ubicación y tipo y reporta cada
+    interval_seconds, de modo que la cardinalidad de sensores es realista.
+    
+    Args:
+        num_records (int): Número de registros a generar
+        output_file (str): Nombre del archivo de salida
+        format_type (str): Formato de salida ('csv', 'json', 'ndjson.gz', 'parquet' o 'feather')
+        chunk_size (int): Registros por bloque
+        seed (int): Semilla para resultados reproducibles
+        num_sensors (int): Tamaño de la flota (None = un sensor por registro)
+        interval_seconds (int): Intervalo entre lecturas de cada sensor de la flota
+        first_sensor (int): Número del primer sensor de la flota
+        fleet (dict): Flota ya creada con build_sensor_fleet (mantiene los mismos
+                      sensores entre llamadas; ignora num_sensors y first_sensor)
+        quiet (bool): No imprimir el resumen
+        summary (dict): Si se pasa, se rellena con el resumen (ver generate_humidity_data)
+    """
+    import numpy as np
+    import pandas as pd
+    
+    if output_file is None:
+        output_file = default_output_file(format_type)
+    
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    
+    rng = np.random.default_rng(seed)
+    if fleet is not None:
+        num_sensors = len(fleet['sensor_number'])
+    elif num_sensors:
+        fleet = build_sensor_fleet(num_sensors, rng, first_sensor)
+    if num_sensors:
+        chunks = _fleet_chunks(num_records, fleet, interval_seconds, chunk_size, rng, np)
+    else:
+        chunks = _random_chunks(num_records, chunk_size, rng, np)
+    
+    # Los valores llegan como enteros (centésimas, décimas) para formatear el
+    # CSV con tablas precalculadas en lugar de convertir cada float
+    humidity_values = np.arange(3500, 7501) / 100          # 35.00 - 75.00 %
+    temperature_values = np.arange(1600, 3101) / 100       # 16.00 - 31.00 °C
+    battery_values = np.arange(750, 1001) / 10             # 75.0 - 100.0 %
+    alert_levels = np.array(['LOW', 'NORMAL', 'HIGH'], dtype=object)
+    
+    def csv_table(values):
+        return np.array([f"{v}," for v in values])
+    
+    tables = {
+        'sensor_type': csv_table(SENSOR_TYPES),
+        'humidity_percent': csv_table(humidity_values),
+        'temperature_celsius': csv_table(temperature_values),
+        'location': csv_table(LOCATIONS),
+        'alert_level': csv_table(alert_levels),
+        'battery_level': csv_table(battery_values)
+    }
+    
+    humidity_sum = 0
+    temperature_sum = 0
+    alerts = 0
+    first_chunk = True
+    
+    # JSON conserva el documento con metadata; el resto pasa por output_writers
+    if format_type == 'json':
+        f = open(output_file, 'w', newline='', encoding='utf-8')
+        metadata = {
+            'generated_at': datetime.now().isoformat(),
+            'total_records': num_records,
+            'data_type': 'humidity_sensors',
+            'client': 'drywall_client_v1.0'
+        }
+        f.write('{"metadata": ' + json.dumps(metadata, ensure_ascii=False) + ', "sensors": [')
+    else:
+        writer = open_writer(output_file, format_type, schema=HUMIDITY_SCHEMA)
+    
+    try:
+        for chunk in chunks:
+            humidity = chunk['humidity']
+            temperature = chunk['temperature']
+            
+            # Alertas cuando humedad > 70% o < 30%
+            alert_idx = np.where(humidity > 7000, 2, np.where(humidity < 3000, 0, 1))
+            
+            humidity_sum += int(humidity.sum())
+            temperature_sum += int(temperature.sum())
+            alerts += int((alert_idx != 1).sum())
+            
+            if format_type == 'csv':
+                columns = [
+                    np.char.add(chunk['timestamp'], ',DW_SENSOR_'),
+                    np.char.zfill(chunk['sensor_number'].astype(str), 3),
+                    ',' + tables['sensor_type'][chunk['type_idx']],
+                    tables['humidity_percent'][humidity - 3500],
+                    tables['temperature_celsius'][temperature - 1600],
+                    tables['location'][chunk['location_idx']],
+                    tables['alert_level'][alert_idx],
+                    tables['battery_level'][chunk['battery'] - 750],
+                    chunk['signal'].astype(str)
+                ]
+                lines = columns[0]
+                for column in columns[1:]:
+                    lines = np.char.add(lines, column)
+                writer.write_encoded('\n'.join(lines.tolist()) + '\n', len(lines))
+                continue
+            
+            frame = pd.DataFrame({
+                'timestamp': chunk['timestamp'].astype(object),
+                'sensor_id': [f"DW_SENSOR_{i:03d}" for i in chunk['sensor_number']],
+                'sensor_type': np.array(SENSOR_TYPES, dtype=object)[chunk['type_idx']],
+                'humidity_percent': humidity / 100,
+                'temperature_celsius': temperature / 100,
+                'location': np.array(LOCATIONS, dtype=object)[chunk['location_idx']],
+                'alert_level': alert_levels[alert_idx],
+                'battery_level': chunk['battery'] / 10,
+                'signal_strength': chunk['signal'].astype(np.int64)
+            }, columns=FIELDNAMES)
+            
+            if format_type == 'json':
+                records = frame.to_json(orient='records', force_ascii=False)[1:-1]
+                f.write(('' if first_chunk else ',') + records)
+                first_chunk = False
+            else:
+                writer.write(frame)
+    finally:
+        if format_type == 'json':
+            f.write(']}')
+            f.close()
+        else:
+            writer.close()
+    
+    result = {
+        'records': num_records,
+        'avg_humidity': humidity_sum / 100 / num_records if num_records else None,
+        'avg_temperature': temperature_sum / 100 / num_records if num_records else None,
+        'alerts': alerts,
+        'sensors': num_sensors
+    }
+    if summary is not None:
+        summary.update(result)
+    
+    if not quiet:
+        for line in summary_lines(output_file, format_type, result):
+            print(line)
     
     return output_file
 
@@ -123,6 +437,8 @@ Ejemplos:
   python generate_humidity.py -n 50               # 50 registros
   python generate_humidity.py --format json       # Formato JSON
   python generate_humidity.py -o data/test.csv    # Archivo específico
+  python generate_humidity.py -n 10000000 --vectorized --seed 42  # Dataset de carga
+  python generate_humidity.py -n 1000000 --sensors 5000 --interval 60  # Flota de 5000 sensores
         """
     )
     
@@ -136,14 +452,14 @@ Ejemplos:
     parser.add_argument(
         '-o', '--output', 
         type=str,
-        help='Archivo de salida (default: data/humedad_TIMESTAMP.csv/json)'
+        help='Archivo de salida (default: data/humedad_TIMESTAMP.<formato>)'
     )
     
     parser.add_argument(
         '--format', 
-        choices=['csv', 'json'], 
+        choices=OUTPUT_FORMATS, 
         default='csv',
-        help='Formato de salida (default: csv)'
+        help='Formato de salida (default: csv; parquet/feather requieren pyarrow)'
     )
     
     parser.add_argument(
@@ -152,14 +468,57 @@ Ejemplos:
         help='Mostrar preview de los primeros registros'
     )
     
+    parser.add_argument(
+        '--vectorized',
+        action='store_true',
+        help='Generador NumPy por bloques para millones de registros'
+    )
+    
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=100_000,
+        help='Registros por bloque con --vectorized (default: 100000)'
+    )
+    
+    parser.add_argument(
+        '--seed',
+        type=int,
+        help='Semilla para resultados reproducibles con --vectorized'
+    )
+    
+    parser.add_argument(
+        '--sensors',
+        type=int,
+        help='Flota de N sensores persistentes con series temporales (implica --vectorized)'
+    )
+    
+    parser.add_argument(
+        '--interval',
+        type=int,
+        default=60,
+        help='Segundos entre lecturas de cada sensor con --sensors (default: 60)'
+    )
+    
     args = parser.parse_args()
     
     try:
-        output_file = generate_humidity_data(
-            num_records=args.num_records,
-            output_file=args.output,
-            format_type=args.format
-        )
+        if args.vectorized or args.sensors:
+            output_file = generate_humidity_data_vectorized(
+                num_records=args.num_records,
+                output_file=args.output,
+                format_type=args.format,
+                chunk_size=args.chunk_size,
+                seed=args.seed,
+                num_sensors=args.sensors,
+                interval_seconds=args.interval
+            )
+        else:
+            output_file = generate_humidity_data(
+                num_records=args.num_records,
+                output_file=args.output,
+                format_type=args.format
+            )
         
         # Mostrar preview si se solicita
         if args.preview:
@@ -179,6 +538,9 @@ Ejemplos:
                     print(f"  Primeros 3 sensores:")
                     for sensor in data['sensors'][:3]:
                         print(f"    {sensor}")
+            
+            else:
+                print(read_output(output_file, args.format).head(5).to_string())
         
         print(f"\n[SUCCESS] Archivo generado exitosamente: {output_file}")
         return 0
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+DryWall Client - Generador de carga para el backend bancario
+Simula una flota de sensores repartida entre muchos clientes concurrentes que
+entregan archivos a un ritmo fijo (SFTP y/o directorio de subida) y mide la
+latencia hasta que las lecturas son visibles en /api/drywall/sensor-data
+"""
+
+import os
+import json
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+from generate_humidity import build_sensor_fleet, generate_humidity_data_vectorized
+from upload_metrics import UploadMetrics
+
+logger = logging.getLogger(__name__)
+
+TRANSPORTS = ('sftp', 'dir', 'mixed')
+DEFAULT_API_URL = 'http://localhost:8000'
+DEFAULT_UPLOAD_DIR = Path(__file__).parent.parent / "project" / "backend" / "upload"
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """Resumen de una lista de latencias en segundos"""
+    import numpy as np
+
+    if not values:
+        return {'count': 0}
+    data = np.asarray(values)
+    summary = {'count': len(values), 'mean': float(data.mean()), 'max': float(data.max())}
+    for point in points:
+        summary[f"p{point}"] = float(np.percentile(data, point))
+    return summary
+
+
+class VisibilityTracker:
+    def __init__(self, baseline_readings):
+        """
+        Relaciona cada subida completada con el momento en que la API la muestra
+
+        Con file_readings (sensor-data?per_file=true) una subida es visible
+        cuando su archivo remoto aparece con todas sus lecturas. Con backends
+        que solo exponen total_readings se atribuye en orden de finalización:
+        con muchos clientes el backend puede contar los archivos en otro orden
+        y los percentiles quedan sesgados (el informe lo indica).
+        """
+        self.baseline = baseline_readings
+        self.lock = threading.Lock()
+        self.pending = {}       # archivo remoto -> (lecturas, inicio, fin de la subida)
+        self.order = deque()    # (lecturas acumuladas, archivo) para la atribución por total
+        self.attribution = None  # 'per_file' o 'total_fifo' según la respuesta de la API
+        self.uploaded_readings = 0
+        self.visible_readings = 0
+        self.upload_seconds = []
+        self.visibility_seconds = []  # fin de la subida -> visible
+        self.end_to_end_seconds = []  # inicio de la subida -> visible
+        self.api_seconds = []
+
+    def record_upload(self, filename, readings, started_at, completed_at):
+        with self.lock:
+            self.uploaded_readings += readings
+            self.pending[filename] = (readings, started_at, completed_at)
+            self.order.append((self.uploaded_readings, filename))
+            self.upload_seconds.append(completed_at - started_at)
+
+    def _mark_visible(self, filename, observed_at):
+        _, started_at, completed_at = self.pending.pop(filename)
+        self.visibility_seconds.append(max(0.0, observed_at - completed_at))
+        self.end_to_end_seconds.append(max(0.0, observed_at - started_at))
+
+    def observe(self, data, observed_at, api_seconds):
+        """data: respuesta JSON de /api/drywall/sensor-data"""
+        with self.lock:
+            self.api_seconds.append(api_seconds)
+            file_readings = data.get('file_readings')
+            if file_readings is not None:
+                self.attribution = 'per_file'
+                for filename, (readings, _, _) in list(self.pending.items()):
+                    if file_readings.get(filename, 0) >= readings:
+                        self.visible_readings += readings
+                        self._mark_visible(filename, observed_at)
+                return
+
+            self.attribution = 'total_fifo'
+            self.visible_readings = max(self.visible_readings, data['total_readings'] - self.baseline)
+            while self.order and self.order[0][0] <= self.visible_readings:
+                _, filename = self.order.popleft()
+                if filename in self.pending:
+                    self._mark_visible(filename, observed_at)
+
+    def all_visible(self):
+        with self.lock:
+            return not self.pending
+
+
+class ApiPoller(threading.Thread):
+    def __init__(self, api_url, tracker, poll_interval=2.0, timeout=60):
+        super().__init__(daemon=True)
+        self.url = f"{api_url.rstrip('/')}/api/drywall/sensor-data?per_file=true"
+        self.tracker = tracker
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.errors = 0
+        self._stop_event = threading.Event()
+
+    def poll_once(self):
+        started = time.monotonic()
+        response = requests.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        finished = time.monotonic()
+        self.tracker.observe(response.json(), finished, finished - started)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"[POLL] Error consultando {self.url}: {e}")
+            self._stop_event.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(self.timeout)
+
+
+class SimulatedClient(threading.Thread):
+    def __init__(self, client_id, num_sensors, first_sensor, transport, config, tracker, work_dir, metrics):
+        """
+        Cliente simulado: una porción fija de la flota que entrega un archivo
+        por periodo con una lectura por sensor
+
+        Args:
+            client_id: Número de cliente (también fija su desfase en el periodo)
+            num_sensors: Sensores propios del cliente
+            first_sensor: Número del primer sensor propio
+            transport: 'sftp' o 'dir'
+            config: argparse.Namespace con la configuración de la carga
+            tracker: VisibilityTracker compartido
+            work_dir: Directorio temporal para generar archivos
+            metrics: UploadMetrics compartido
+        """
+        super().__init__(daemon=True, name=f"load-client-{client_id}")
+        self.client_id = client_id
+        self.num_sensors = num_sensors
+        self.first_sensor = first_sensor
+        self.transport = transport
+        self.config = config
+        self.tracker = tracker
+        self.work_dir = Path(work_dir)
+        self.metrics = metrics
+
+        self.sftp = None
+        self.files_sent = 0
+        self.errors = 0
+        self.late = 0
+        self.stop_event = threading.Event()
+
+    def _seed(self, seq):
+        if self.config.seed is None:
+            return None
+        return [self.config.seed, self.client_id, seq]
+
+    def _upload_sftp(self, local_file):
+        from sftp_upload import SFTPClient
+
+        if self.sftp is None or not self.sftp.is_connected():
+            self.sftp = SFTPClient(self.config.host, self.config.port, self.config.user, self.config.key,
+                                   metrics=self.metrics, verify_checksum=not self.config.no_verify)
+            if not self.sftp.connect():
+                self.sftp = None
+                raise ConnectionError(f"No se pudo conectar a {self.config.host}:{self.config.port}")
+        return Path(self.sftp.upload_file(str(local_file), self.config.remote_dir)).name
+
+    def _upload_dir(self, local_file):
+        # Copia con nombre temporal y rename atómico: el backend solo lista *.csv completos
+        upload_dir = Path(self.config.upload_dir)
+        tmp_path = upload_dir / f".{local_file.name}.tmp"
+        shutil.copyfile(local_file, tmp_path)
+        os.replace(tmp_path, upload_dir / local_file.name)
+        return local_file.name
+
+    def run(self):
+        config = self.config
+        import numpy as np
+
+        fleet = build_sensor_fleet(self.num_sensors, np.random.default_rng(self._seed(0)), self.first_sensor)
+        start = self.config.start_time + self.client_id * config.period / config.clients
+        seq = 0
+
+        while not self.stop_event.is_set():
+            scheduled = start + seq * config.period
+            if scheduled >= config.end_time:
+                break
+
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                if self.stop_event.wait(delay):
+                    break
+            elif -delay > config.period:
+                self.late += 1  # El cliente no sigue el ritmo objetivo
+
+            seq += 1
+            local_file = self.work_dir / f"load_c{self.client_id:04d}_{seq:06d}_{datetime.now():%H%M%S}.csv"
+            try:
+                generate_humidity_data_vectorized(self.num_sensors, str(local_file), 'csv',
+                                                  seed=self._seed(seq), fleet=fleet, quiet=True)
+                started_at = time.monotonic()
+                if self.transport == 'sftp':
+                    remote_name = self._upload_sftp(local_file)
+                else:
+                    remote_name = self._upload_dir(local_file)
+                self.tracker.record_upload(remote_name, self.num_sensors, started_at, time.monotonic())
+                self.files_sent += 1
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"[LOAD] Cliente {self.client_id}: error entregando {local_file.name}: {e}")
+                if self.sftp is not None:
+                    self.sftp.disconnect()
+                    self.sftp = None
+            finally:
+                local_file.unlink(missing_ok=True)
+
+        if self.sftp is not None:
+            self.sftp.disconnect()
+
+
+def run_load(config):
+    """
+    Ejecuta la prueba de carga y devuelve el informe
+
+    Returns:
+        dict: Configuración, entregas, latencias y errores
+    """
+    if config.transport in ('dir', 'mixed'):
+        Path(config.upload_dir).mkdir(parents=True, exist_ok=True)
+
+    api_url = config.api_url.rstrip('/')
+    baseline = requests.get(f"{api_url}/api/drywall/sensor-data", timeout=60).json()['total_readings']
+    tracker = VisibilityTracker(baseline)
+    metrics = UploadMetrics()
+
+    files_per_minute = config.clients * 60 / config.period
+    print(f"[LOAD] {config.sensors} sensores en {config.clients} clientes ({config.transport}), "
+          f"un archivo por cliente cada {config.period}s ({files_per_minute:.1f} archivos/min, "
+          f"{config.sensors * 60 / config.period:,.0f} lecturas/min) durante {config.duration}s")
+    print(f"[LOAD] Lecturas visibles al inicio: {baseline}")
+
+    work_dir = Path(tempfile.mkdtemp(prefix='drywall_load_'))
+    config.start_time = time.monotonic() + 1
+    config.end_time = config.start_time + config.duration
+
+    # Reparto de sensores: los primeros clientes reciben uno más si no es exacto
+    base, extra = divmod(config.sensors, config.clients)
+    clients = []
+    first_sensor = config.first_sensor
+    for client_id in range(config.clients):
+        num_sensors = base + (1 if client_id < extra else 0)
+        if num_sensors == 0:
+            continue
+        transport = config.transport
+        if transport == 'mixed':
+            transport = 'sftp' if client_id % 2 == 0 else 'dir'
+        clients.append(SimulatedClient(client_id, num_sensors, first_sensor, transport, config,
+                                       tracker, work_dir, metrics))
+        first_sensor += num_sensors
+
+    poller = ApiPoller(api_url, tracker, config.poll_interval)
+    poller.start()
+    for client in clients:
+        client.start()
+
+    try:
+        for client in clients:
+            client.join()
+    except KeyboardInterrupt:
+        print("\n[LOAD] Interrumpido, esperando a los clientes...")
+        for client in clients:
+            client.stop_event.set()
+        for client in clients:
+            client.join()
+
+    sent_at = time.monotonic()
+    # Esperar a que el backend muestre todo lo entregado
+    while not tracker.all_visible() and time.monotonic() - sent_at < config.drain_timeout:
+        time.sleep(config.poll_interval)
+    poller.stop()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    elapsed = sent_at - config.start_time
+    files_sent = sum(c.files_sent for c in clients)
+    report = {
+        'generated_at': datetime.now().isoformat(),
+        'config': {
+            'sensors': config.sensors,
+            'clients': len(clients),
+            'period_seconds': config.period,
+            'duration_seconds': config.duration,
+            'transport': config.transport,
+            'api_url': api_url
+        },
+        'delivery': {
+            'files_sent': files_sent,
+            'readings_sent': tracker.uploaded_readings,
+            'readings_visible': tracker.visible_readings,
+            'files_per_minute': files_sent / elapsed * 60 if elapsed > 0 else 0,
+            'upload_errors': sum(c.errors for c in clients),
+            'late_deliveries': sum(c.late for c in clients),
+            'not_visible_uploads': len(tracker.pending),
+            'poll_errors': poller.errors
+        },
+        # per_file: por archivo remoto; total_fifo: por orden de subida (sesgo posible)
+        'visibility_attribution': tracker.attribution,
+        'latency_seconds': {
+            'upload': percentiles(tracker.upload_seconds),
+            'upload_to_visible': percentiles(tracker.visibility_seconds),
+            'end_to_end': percentiles(tracker.end_to_end_seconds),
+            'api_response': percentiles(tracker.api_seconds)
+        },
+        'sftp_metrics': metrics.to_dict()
+    }
+    return report
+
+
+def print_report(report):
+    delivery = report['delivery']
+    print(f"\n[STATS] Archivos entregados: {delivery['files_sent']} "
+          f"({delivery['files_per_minute']:.1f}/min), errores: {delivery['upload_errors']}, "
+          f"con retraso: {delivery['late_deliveries']}")
+    print(f"[STATS] Lecturas enviadas: {delivery['readings_sent']:,} | visibles: {delivery['readings_visible']:,}")
+    if delivery['not_visible_uploads']:
+        print(f"[WARN] Subidas no visibles al terminar: {delivery['not_visible_uploads']}")
+    if report['visibility_attribution'] == 'total_fifo':
+        print("[WARN] El backend no expone lecturas por archivo: la visibilidad se atribuye en orden "
+              "de subida y p95/p99 pueden estar sesgados si el backend cuenta los archivos en otro orden")
+
+    for name, label in (('upload', 'Subida'), ('upload_to_visible', 'Subida -> visible'),
+                        ('end_to_end', 'Extremo a extremo'), ('api_response', 'Respuesta API')):
+        summary = report['latency_seconds'][name]
+        if summary['count']:
+            print(f"[LATENCY] {label}: p50 {summary['p50']:.2f}s | p95 {summary['p95']:.2f}s | "
+                  f"p99 {summary['p99']:.2f}s | max {summary['max']:.2f}s ({summary['count']} muestras)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Generador de carga: flota de sensores simulada contra el backend local',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  python load_generator.py --sensors 5000 --clients 50 --period 60 --duration 600
+  python load_generator.py --transport dir --upload-dir ../project/backend/upload
+  python load_generator.py --transport mixed --report data/load_report.json
+        """
+    )
+    parser.add_argument('--sensors', type=int, default=5000, help='Sensores de la flota (default: 5000)')
+    parser.add_argument('--clients', type=int, default=50, help='Clientes concurrentes (default: 50)')
+    parser.add_argument('--period', type=float, default=60, help='Segundos entre archivos de cada cliente (default: 60)')
+    parser.add_argument('--duration', type=float, default=300, help='Duración de la carga en segundos (default: 300)')
+    parser.add_argument('--transport', choices=TRANSPORTS, default='sftp',
+                        help='sftp, dir (copia al directorio de subida) o mixed (mitad y mitad)')
+    parser.add_argument('--first-sensor', type=int, default=1, help='Número del primer sensor (default: 1)')
+    parser.add_argument('--seed', type=int, help='Semilla para datos reproducibles')
+
+    parser.add_argument('--host', default='localhost', help='Servidor SFTP (default: localhost)')
+    parser.add_argument('--port', type=int, default=2222, help='Puerto SFTP (default: 2222)')
+    parser.add_argument('--user', default='drywall_user', help='Usuario SFTP (default: drywall_user)')
+    parser.add_argument('--key', default='keys/drywall_key', help='Clave privada SSH (default: keys/drywall_key)')
+    parser.add_argument('--remote-dir', default='/upload', help='Directorio remoto (default: /upload)')
+    parser.add_argument('--no-verify', action='store_true', help='No verificar el SHA-256 remoto tras cada subida')
+    parser.add_argument('--upload-dir', default=str(DEFAULT_UPLOAD_DIR),
+                        help='Directorio de subida del backend para --transport dir/mixed')
+
+    parser.add_argument('--api-url', default=DEFAULT_API_URL, help=f'API del backend (default: {DEFAULT_API_URL})')
+    parser.add_argument('--poll-interval', type=float, default=2.0,
+                        help='Segundos entre consultas a /api/drywall/sensor-data (default: 2)')
+    parser.add_argument('--drain-timeout', type=float, default=120,
+                        help='Espera máxima a que todo sea visible al terminar (default: 120)')
+    parser.add_argument('--report', help='Guardar el informe completo en este JSON')
+
+    args = parser.parse_args()
+
+    if args.clients < 1 or args.period <= 0 or args.sensors < 1:
+        parser.error("--sensors, --clients y --period deben ser positivos")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # Una línea por subida con cientos de clientes satura la consola
+    logging.getLogger('sftp_upload').setLevel(logging.WARNING)
+    logging.getLogger('paramiko').setLevel(logging.WARNING)
+
+    try:
+        report = run_load(args)
+    except requests.RequestException as e:
+        print(f"[ERROR] No se pudo consultar el backend en {args.api_url}: {e}")
+        return 1
+
+    print_report(report)
+    if args.report:
+        Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"[FILE] Informe: {args.report}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+DryWall Client - Agregación por minuto en el borde
+Convierte el flujo de lecturas en un registro por dispositivo y minuto
+(count, min/max/media/última y número de anomalías) para subir solo eso,
+y aplica la retención local de los CSV crudos
+"""
+
+import re
+import logging
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MINUTE_PREFIX = 'arduino_minutes'
+RAW_PREFIX = 'arduino_data'
+MINUTE_COLUMNS = [
+    'timestamp', 'device_id', 'count',
+    'humidity_pct', 'humidity_min', 'humidity_max', 'humidity_last',
+    'raw_value', 'raw_min', 'raw_max', 'raw_last',
+    'anomaly_count'
+]
+
+
+def is_anomaly(humidity_pct, raw_value):
+    """Mismas reglas que data_enhancer.detect_anomaly, sin depender de pandas"""
+    if humidity_pct > 95 or humidity_pct < 5:
+        return True
+    if raw_value < 10 or raw_value > 1000:
+        return True
+    return abs(raw_value - (510 - humidity_pct * 3)) > 150
+
+
+def minute_key(timestamp):
+    """'YYYY-MM-DDTHH:MM' de un timestamp ISO o datetime"""
+    if isinstance(timestamp, str):
+        return timestamp[:16]
+    return timestamp.strftime('%Y-%m-%dT%H:%M')
+
+
+class MinuteBucket:
+    def __init__(self, minute, device_id):
+        self.minute = minute
+        self.device_id = device_id
+        self.count = 0
+        self.anomalies = 0
+        self.humidity_sum = 0
+        self.raw_sum = 0
+        self.humidity_min = self.humidity_max = self.humidity_last = None
+        self.raw_min = self.raw_max = self.raw_last = None
+
+    def add(self, humidity_pct, raw_value):
+        if self.count == 0:
+            self.humidity_min = self.humidity_max = humidity_pct
+            self.raw_min = self.raw_max = raw_value
+        else:
+            self.humidity_min = min(self.humidity_min, humidity_pct)
+            self.humidity_max = max(self.humidity_max, humidity_pct)
+            self.raw_min = min(self.raw_min, raw_value)
+            self.raw_max = max(self.raw_max, raw_value)
+        self.humidity_last = humidity_pct
+        self.raw_last = raw_value
+        self.humidity_sum += humidity_pct
+        self.raw_sum += raw_value
+        self.count += 1
+        if is_anomaly(humidity_pct, raw_value):
+            self.anomalies += 1
+
+    def record(self):
+        return {
+            'timestamp': f"{self.minute}:00",
+            'device_id': self.device_id,
+            'count': self.count,
+            'humidity_pct': round(self.humidity_sum / self.count, 2),
+            'humidity_min': self.humidity_min,
+            'humidity_max': self.humidity_max,
+            'humidity_last': self.humidity_last,
+            'raw_value': round(self.raw_sum / self.count, 2),
+            'raw_min': self.raw_min,
+            'raw_max': self.raw_max,
+            'raw_last': self.raw_last,
+            'anomaly_count': self.anomalies
+        }
+
+
+class MinuteAggregator:
+    def __init__(self):
+        """
+        Agregador en streaming por (device_id, minuto)
+
+        Cada dispositivo tiene un minuto abierto; al llegar una lectura de un
+        minuto posterior se emite el registro del anterior. Las lecturas de un
+        puerto llegan en orden, así que una lectura atrasada se suma al minuto abierto.
+        """
+        self.buckets = {}
+        self.readings = 0
+        self.records = 0
+
+    def add(self, reading):
+        """Incorpora una lectura y devuelve los registros de minutos cerrados"""
+        device_id = reading['device_id']
+        minute = minute_key(reading['timestamp'])
+        bucket = self.buckets.get(device_id)
+        completed = []
+
+        if bucket is None or minute > bucket.minute:
+            if bucket is not None:
+                completed.append(bucket.record())
+            bucket = self.buckets[device_id] = MinuteBucket(minute, device_id)
+
+        bucket.add(reading['humidity_pct'], reading['raw_value'])
+        self.readings += 1
+        self.records += len(completed)
+        return completed
+
+    def add_many(self, readings):
+        completed = []
+        for reading in readings:
+            completed.extend(self.add(reading))
+        return completed
+
+    def flush(self):
+        """Cierra todos los minutos abiertos (al detener el servicio)"""
+        completed = [bucket.record() for bucket in self.buckets.values()]
+        self.buckets.clear()
+        self.records += len(completed)
+        return completed
+
+
+def apply_raw_retention(keep_days, data_dir=None, today=None, prefix=RAW_PREFIX):
+    """
+    Borra los CSV crudos diarios con más de keep_days días
+
+    keep_days=0 conserva solo el de hoy; None no borra nada.
+
+    Returns:
+        list: Rutas eliminadas
+    """
+    if keep_days is None:
+        return []
+
+    data_dir = Path(data_dir) if data_dir else Path(__file__).parent / "data"
+    today = today or datetime.now().date()
+    cutoff = (today - timedelta(days=keep_days)).strftime('%Y%m%d')
+    pattern = re.compile(rf'^{re.escape(prefix)}_(\d{{8}})\.csv$')
+
+    removed = []
+    for path in sorted(data_dir.glob(f'{prefix}_*.csv')):
+        match = pattern.match(path.name)
+        if match and match.group(1) < cutoff:
+            path.unlink()
+            removed.append(path)
+
+    if removed:
+        logger.info(f"🧹 Retención: {len(removed)} CSV crudos eliminados (> {keep_days} días)")
+    return removed
+
+
+class MinuteAggregationSink:
+    def __init__(self, writer, raw_retention_days=None):
+        """
+        Agrega lecturas por minuto y escribe los registros con un DailyCSVWriter
+
+        Args:
+            writer: DailyCSVWriter con prefix=MINUTE_PREFIX y columns=MINUTE_COLUMNS
+            raw_retention_days: Días de CSV crudo a conservar (None = todos);
+                se aplica al arrancar y en cada cambio de día
+        """
+        self.writer = writer
+        self.aggregator = MinuteAggregator()
+        self.raw_retention_days = raw_retention_days
+        self.day = None
+        apply_raw_retention(raw_retention_days)
+
+    def write_many(self, readings):
+        records = self.aggregator.add_many(readings)
+        if records:
+            self.writer.write_many(records)
+            day = records[-1]['timestamp'][:10]
+            if day != self.day:
+                if self.day is not None:
+                    apply_raw_retention(self.raw_retention_days)
+                self.day = day
+
+    def write(self, reading):
+        self.write_many([reading])
+
+    def maybe_flush(self):
+        self.writer.maybe_flush()
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        records = self.aggregator.flush()
+        if records:
+            self.writer.write_many(records)
+        self.writer.close()
+
+
+def _round2(value):
+    # round() de Python (como MinuteBucket.record); Series.round difiere en los casos .xx5
+    return round(value, 2)
+
+
+def aggregate_frame(df):
+    """
+    Versión por lotes (pandas) para CSV crudos ya guardados
+
+    Devuelve las mismas columnas y valores que MinuteAggregator sobre las mismas filas.
+    """
+    import numpy as np
+    import pandas as pd
+
+    df = df.copy()
+    df['minute'] = df['timestamp'].astype(str).str[:16]
+    humidity = df['humidity_pct']
+    raw = df['raw_value']
+    df['anomaly'] = ((humidity > 95) | (humidity < 5) | (raw < 10) | (raw > 1000)
+                     | ((raw - (510 - humidity * 3)).abs() > 150)).astype(np.int64)
+
+    grouped = df.groupby(['device_id', 'minute'], sort=False)
+    result = pd.DataFrame({
+        'count': grouped.size(),
+        'humidity_pct': grouped['humidity_pct'].mean().map(_round2),
+        'humidity_min': grouped['humidity_pct'].min(),
+        'humidity_max': grouped['humidity_pct'].max(),
+        'humidity_last': grouped['humidity_pct'].last(),
+        'raw_value': grouped['raw_value'].mean().map(_round2),
+        'raw_min': grouped['raw_value'].min(),
+        'raw_max': grouped['raw_value'].max(),
+        'raw_last': grouped['raw_value'].last(),
+        'anomaly_count': grouped['anomaly'].sum()
+    }).reset_index()
+    result['timestamp'] = result['minute'] + ':00'
+    return result.sort_values(['timestamp', 'device_id'], kind='stable')[MINUTE_COLUMNS].reset_index(drop=True)
+
+
+def main():
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description='Agregación por minuto de lecturas crudas')
+    parser.add_argument('input', nargs='?', help='CSV crudo (timestamp, humidity_pct, raw_value, device_id)')
+    parser.add_argument('-o', '--output', help='CSV de salida (default: arduino_minutes_<fecha>.csv junto a la entrada)')
+    parser.add_argument('--raw-retention-days', type=int,
+                        help='Borrar CSV crudos con más de N días en data/')
+
+    args = parser.parse_args()
+
+    if args.input:
+        input_path = Path(args.input)
+        output = args.output or str(input_path.with_name(input_path.name.replace(RAW_PREFIX, MINUTE_PREFIX, 1)
+                                                         if input_path.name.startswith(RAW_PREFIX)
+                                                         else input_path.stem + '_minutes.csv'))
+        df = pd.read_csv(input_path)
+        result = aggregate_frame(df)
+        result.to_csv(output, index=False)
+
+        ratio = input_path.stat().st_size / max(1, Path(output).stat().st_size)
+        print(f"✅ {len(df):,} lecturas -> {len(result):,} registros por minuto ({ratio:.0f}x menos bytes)")
+        print(f"💾 Guardados en: {output}")
+
+    if args.raw_retention_days is not None:
+        removed = apply_raw_retention(args.raw_retention_days)
+        print(f"🧹 {len(removed)} CSV crudos eliminados")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+DryWall Client - Escritores de salida compartidos
+CSV, NDJSON comprimido y, si pyarrow está instalado, Parquet y Feather.
+Escriben por bloques de DataFrame y dejan un archivo .schema.json con los tipos
+"""
+
+import gzip
+import json
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+# formato -> extensión
+FORMATS = {
+    'csv': '.csv',
+    'ndjson.gz': '.ndjson.gz',
+    'parquet': '.parquet',
+    'feather': '.feather'
+}
+ARROW_FORMATS = ('parquet', 'feather')
+APPENDABLE_FORMATS = ('csv', 'ndjson.gz')
+SCHEMA_SUFFIX = '.schema.json'
+
+
+def format_from_path(path):
+    """Deduce el formato por la extensión del archivo (CSV por defecto)"""
+    name = str(path).lower()
+    for format_type, extension in FORMATS.items():
+        if name.endswith(extension):
+            return format_type
+    return 'csv'
+
+
+def with_format_extension(path, format_type):
+    """Sustituye la extensión de una ruta por la del formato"""
+    path = Path(path)
+    name = path.name
+    for extension in sorted(FORMATS.values(), key=len, reverse=True):
+        if name.lower().endswith(extension):
+            name = name[:-len(extension)]
+            break
+    else:
+        name = path.stem if path.suffix else name
+    return path.with_name(name + FORMATS[format_type])
+
+
+def schema_path_for(path):
+    return Path(str(path) + SCHEMA_SUFFIX)
+
+
+def write_schema_file(path, format_type, schema, rows=None):
+    """Escribe <archivo>.schema.json con el formato, las columnas y sus tipos"""
+    sidecar = {
+        'format': format_type,
+        'file': Path(path).name,
+        'rows': rows,
+        'columns': [{'name': name, 'dtype': dtype} for name, dtype in (schema or {}).items()],
+        'generated_at': datetime.now().isoformat()
+    }
+    with open(schema_path_for(path), 'w', encoding='utf-8') as f:
+        json.dump(sidecar, f, indent=2, ensure_ascii=False)
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        raise ImportError("Los formatos parquet/feather requieren pyarrow: pip install pyarrow")
+
+
+def _dtype_name(dtype):
+    """Tipo lógico de una columna de pandas para el sidecar"""
+    name = str(dtype)
+    if name in ('object', 'str', 'string'):
+        return 'string'
+    if name == 'bool':
+        return 'bool'
+    return name
+
+
+class OutputWriter:
+    """Base de los escritores: acumula filas y el esquema del primer bloque"""
+
+    format_type = None
+
+    def __init__(self, path, schema=None, write_schema=True, append=False):
+        """
+        Args:
+            path: Archivo de salida
+            schema: dict columna -> tipo (si no, se toma del primer bloque)
+            write_schema: Escribir <archivo>.schema.json al cerrar
+            append: Añadir a un archivo existente (solo CSV y NDJSON.gz)
+        """
+        self.path = Path(path)
+        self.schema = dict(schema) if schema else None
+        self.write_schema = write_schema
+        self.append = append and self.path.exists()
+        self.rows = 0
+        self.previous_rows = 0
+        if self.append:
+            sidecar = schema_path_for(self.path)
+            if sidecar.exists():
+                previous = json.loads(sidecar.read_text(encoding='utf-8'))
+                self.previous_rows = previous.get('rows') or 0
+                if self.schema is None:
+                    self.schema = {c['name']: c['dtype'] for c in previous['columns']}
+        self.closed = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def write(self, df):
+        """Escribe un bloque (DataFrame) en el archivo"""
+        if self.schema is None:
+            self.schema = {column: _dtype_name(dtype) for column, dtype in df.dtypes.items()}
+        if len(df):
+            self._write_frame(df)
+        self.rows += len(df)
+
+    def _write_frame(self, df):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._close()
+        if self.write_schema:
+            write_schema_file(self.path, self.format_type, self.schema, self.previous_rows + self.rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CSVWriter(OutputWriter):
+    format_type = 'csv'
+
+    def __init__(self, path, schema=None, write_schema=True, append=False):
+        super().__init__(path, schema, write_schema, append)
+        self.header_written = self.append and self.path.stat().st_size > 0
+        self.file = open(self.path, 'a' if self.append else 'w', newline='', encoding='utf-8')
+
+    def _write_header(self):
+        if not self.header_written:
+            self.file.write(','.join(self.schema) + '\n')
+            self.header_written = True
+
+    def _write_frame(self, df):
+        self._write_header()
+        df.to_csv(self.file, header=False, index=False)
+
+    def write_encoded(self, text, rows):
+        """Escribe líneas CSV ya formateadas (requiere schema para la cabecera)"""
+        self._write_header()
+        self.file.write(text)
+        self.rows += rows
+
+    def _close(self):
+        if self.schema and not self.header_written:
+            self._write_header()
+        self.file.close()
+
+
+class NDJSONGzipWriter(OutputWriter):
+    format_type = 'ndjson.gz'
+
+    def __init__(self, path, schema=None, write_schema=True, append=False, compresslevel=6):
+        super().__init__(path, schema, write_schema, append)
+        # En modo append se añade un nuevo miembro gzip (el archivo sigue siendo válido)
+        self.file = gzip.open(self.path, 'at' if self.append else 'wt', encoding='utf-8',
+                              compresslevel=compresslevel)
+
+    def _write_frame(self, df):
+        self.file.write(df.to_json(orient='records', lines=True, force_ascii=False, double_precision=15).rstrip('\n') + '\n')
+
+    def _close(self):
+        self.file.close()
+
+
+class ArrowWriter(OutputWriter):
+    """Parquet o Feather (Arrow IPC) escritos por bloques con pyarrow"""
+
+    def __init__(self, path, schema=None, write_schema=True, format_type='parquet'):
+        super().__init__(path, schema, write_schema)
+        self.format_type = format_type
+        self.pa = _import_pyarrow()
+        self.writer = None
+        self.arrow_schema = None
+
+    def _write_frame(self, df):
+        table = self.pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.arrow_schema = table.schema
+            if self.format_type == 'parquet':
+                import pyarrow.parquet as pq
+                self.writer = pq.ParquetWriter(self.path, self.arrow_schema)
+            else:
+                import pyarrow.ipc as ipc
+                self.writer = ipc.new_file(str(self.path), self.arrow_schema)
+        self.writer.write_table(table.cast(self.arrow_schema))
+
+    def _close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def open_writer(path, format_type=None, schema=None, write_schema=True, append=False):
+    """
+    Abre el escritor adecuado para el formato (o para la extensión de path)
+
+    append añade al archivo existente; Parquet y Feather no lo admiten.
+
+    Returns:
+        OutputWriter: Usar como context manager o llamar a close()
+    """
+    format_type = format_type or format_from_path(path)
+    if append and format_type not in APPENDABLE_FORMATS:
+        raise ValueError(f"El formato {format_type} no admite añadir datos (usar csv o ndjson.gz)")
+    if format_type == 'csv':
+        return CSVWriter(path, schema, write_schema, append)
+    if format_type == 'ndjson.gz':
+        return NDJSONGzipWriter(path, schema, write_schema, append)
+    if format_type in ARROW_FORMATS:
+        return ArrowWriter(path, schema, write_schema, format_type)
+    raise ValueError(f"Formato no soportado: {format_type}")
+
+
+def write_frame(df, path, format_type=None, write_schema=True):
+    """Escribe un DataFrame completo en el formato indicado"""
+    with open_writer(path, format_type, write_schema=write_schema) as writer:
+        writer.write(df)
+    return writer.path
+
+
+def schema_dtypes(path):
+    """Tipos de pandas según el sidecar de un archivo (None si no existe)"""
+    sidecar = schema_path_for(path)
+    if not sidecar.exists():
+        return None
+    columns = json.loads(sidecar.read_text(encoding='utf-8'))['columns']
+    return {c['name']: ('str' if c['dtype'] == 'string' else c['dtype']) for c in columns}
+
+
+def read_output(path, format_type=None):
+    """Lee un archivo escrito por estos escritores como DataFrame"""
+    import pandas as pd
+
+    format_type = format_type or format_from_path(path)
+    # En los formatos de texto el sidecar evita inferir tipos (y fechas) al leer
+    dtypes = schema_dtypes(path) if format_type in ('csv', 'ndjson.gz') else None
+    if format_type == 'csv':
+        return pd.read_csv(path, dtype=dtypes)
+    if format_type == 'ndjson.gz':
+        if dtypes:
+            return pd.read_json(path, lines=True, compression='gzip', dtype=dtypes,
+                                convert_dates=False, precise_float=True)
+        return pd.read_json(path, lines=True, compression='gzip', precise_float=True)
+    if format_type == 'parquet':
+        _import_pyarrow()
+        return pd.read_parquet(path)
+    if format_type == 'feather':
+        _import_pyarrow()
+        return pd.read_feather(path)
+    raise ValueError(f"Formato no soportado: {format_type}")
+
+
+def concat_outputs(paths, output_path, format_type=None, schema=None, rows=None):
+    """
+    Une archivos del mismo formato en uno solo conservando el orden
+
+    CSV y NDJSON.gz se concatenan byte a byte (gzip admite varios miembros);
+    Parquet y Feather se releen archivo a archivo. Con schema se escribe el sidecar.
+    """
+    format_type = format_type or format_from_path(output_path)
+    output_path = Path(output_path)
+
+    if format_type in ARROW_FORMATS:
+        with open_writer(output_path, format_type, schema, write_schema=schema is not None) as writer:
+            for path in paths:
+                writer.write(read_output(path, format_type))
+        return output_path
+
+    with open(output_path, 'wb') as out:
+        for index, path in enumerate(paths):
+            with open(path, 'rb') as f:
+                if format_type == 'csv':
+                    header = f.readline()
+                    if index == 0:
+                        out.write(header)
+                shutil.copyfileobj(f, out, 1024 * 1024)
+
+    if schema is not None:
+        write_schema_file(output_path, format_type, schema, rows)
+    return output_path
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+DryWall Client - Write-ahead log de lecturas
+Registro binario de solo-anexar para que un corte de corriente no pierda las
+lecturas que aún estaban en buffer o a medio escribir en el CSV diario
+"""
+
+import os
+import json
+import time
+import zlib
+import struct
+import logging
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WAL_DIR = Path(__file__).parent / "wal"
+DEFAULT_SYNC_INTERVAL = 1.0          # segundos entre fsync (group commit)
+DEFAULT_SYNC_BYTES = 64 * 1024       # o bytes pendientes que fuerzan un fsync
+
+# Registro: cabecera (longitud del cuerpo, CRC32 del cuerpo) + cuerpo
+# Cuerpo: seq (uint64) | raw (uint32) | pct (uint8) | len(timestamp) (uint8) | timestamp | device_id
+RECORD_HEADER = struct.Struct('<II')
+RECORD_FIELDS = struct.Struct('<QIBB')
+MAX_RECORD_SIZE = 1024
+
+
+def encode_record(seq, reading):
+    timestamp = reading['timestamp'].encode('utf-8')
+    body = RECORD_FIELDS.pack(seq, reading['raw_value'], reading['humidity_pct'], len(timestamp)) \
+        + timestamp + reading['device_id'].encode('utf-8')
+    return RECORD_HEADER.pack(len(body), zlib.crc32(body)) + body
+
+
+def decode_body(body):
+    """Devuelve (seq, lectura) de un cuerpo de registro"""
+    seq, raw, pct, ts_len = RECORD_FIELDS.unpack_from(body)
+    start = RECORD_FIELDS.size
+    return seq, {
+        'timestamp': body[start:start + ts_len].decode('utf-8'),
+        'raw_value': raw,
+        'humidity_pct': pct,
+        'device_id': body[start + ts_len:].decode('utf-8')
+    }
+
+
+def iter_records(data):
+    """
+    Recorre los registros válidos de un bloque de bytes
+
+    Se detiene en el primer registro incompleto o con CRC incorrecto (cola
+    escrita a medias durante un corte).
+
+    Yields:
+        tuple: (offset final del registro, seq, lectura)
+    """
+    pos = 0
+    end = len(data)
+    while end - pos >= RECORD_HEADER.size:
+        length, crc = RECORD_HEADER.unpack_from(data, pos)
+        body_start = pos + RECORD_HEADER.size
+        if length < RECORD_FIELDS.size or length > MAX_RECORD_SIZE or body_start + length > end:
+            return
+        body = data[body_start:body_start + length]
+        if zlib.crc32(body) != crc:
+            return
+        seq, reading = decode_body(body)
+        pos = body_start + length
+        yield pos, seq, reading
+
+
+class ReadingWAL:
+    def __init__(self, name='readings', wal_dir=DEFAULT_WAL_DIR, sync_interval=DEFAULT_SYNC_INTERVAL,
+                 sync_bytes=DEFAULT_SYNC_BYTES):
+        """
+        WAL de lecturas con fsync agrupado y checkpoint
+
+        Args:
+            name: Nombre del log (<name>.wal y <name>.checkpoint.json); uno por proceso escritor
+            wal_dir: Directorio del WAL
+            sync_interval: Segundos máximos entre fsync del log
+            sync_bytes: Bytes sin sincronizar que fuerzan un fsync
+        """
+        self.wal_dir = Path(wal_dir)
+        self.path = self.wal_dir / f"{name}.wal"
+        self.checkpoint_path = self.wal_dir / f"{name}.checkpoint.json"
+        self.sync_interval = sync_interval
+        self.sync_bytes = sync_bytes
+        self.lock = threading.Lock()
+
+        self.wal_dir.mkdir(parents=True, exist_ok=True)
+
+        checkpoint = self._load_checkpoint()
+        self.checkpoint_seq = checkpoint.get('seq', 0)
+        # Destino (CSV) a medio escribir: ruta y tamaño antes de la escritura en curso
+        self.target = checkpoint.get('target')
+        self.target_size = checkpoint.get('target_size')
+        self.next_seq = self.checkpoint_seq + 1
+        self.file = None
+        self.unsynced_bytes = 0
+        self.last_sync = time.monotonic()
+        self.stats = {'appended': 0, 'syncs': 0, 'checkpoints': 0, 'recovered': 0, 'truncated_bytes': 0,
+                      'rolled_back_bytes': 0}
+
+    def _load_checkpoint(self):
+        if not self.checkpoint_path.exists():
+            return {}
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_checkpoint(self):
+        """Escribe el checkpoint de forma atómica (tmp + fsync + replace)"""
+        checkpoint = {'seq': self.checkpoint_seq, 'updated_at': datetime.now().isoformat()}
+        if self.target:
+            checkpoint['target'] = self.target
+            checkpoint['target_size'] = self.target_size
+        tmp_path = self.checkpoint_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _roll_back_target(self):
+        """Corta el destino al tamaño previo a la escritura interrumpida (fila rota o duplicadas)"""
+        path = Path(self.target)
+        if path.exists() and path.stat().st_size > self.target_size:
+            extra = path.stat().st_size - self.target_size
+            os.truncate(path, self.target_size)
+            self.stats['rolled_back_bytes'] += extra
+            logger.warning(f"⚠️  WAL {self.path.name}: {extra} bytes sin confirmar descartados de {path.name}")
+        self.target = None
+        self.target_size = None
+
+    def recover(self):
+        """
+        Lee el log al arrancar y devuelve las lecturas posteriores al checkpoint
+
+        Corta la cola dañada si la hay y, si una escritura del destino quedó sin
+        confirmar, corta el destino al tamaño que tenía antes: al reaplicar las
+        lecturas devueltas no quedan filas rotas ni duplicadas. Las lecturas
+        deben aplicarse (CSV) y confirmarse con checkpoint() antes de descartarlas.
+
+        Returns:
+            list: Pares (seq, lectura) en orden
+        """
+        with self.lock:
+            if self.target:
+                self._roll_back_target()
+                self._save_checkpoint()
+
+            data = self.path.read_bytes() if self.path.exists() else b''
+            valid_end = 0
+            pending = []
+            for valid_end, seq, reading in iter_records(data):
+                self.next_seq = max(self.next_seq, seq + 1)
+                if seq > self.checkpoint_seq:
+                    pending.append((seq, reading))
+
+            if valid_end < len(data):
+                self.stats['truncated_bytes'] += len(data) - valid_end
+                logger.warning(f"⚠️  WAL {self.path.name}: {len(data) - valid_end} bytes de cola dañada descartados")
+
+            self.file = open(self.path, 'r+b' if self.path.exists() else 'w+b')
+            self.file.truncate(valid_end)
+            self.file.seek(valid_end)
+            self.stats['recovered'] += len(pending)
+            return pending
+
+    def append(self, readings):
+        """
+        Añade lecturas al log y devuelve el seq de la primera
+
+        Los registros pasan al sistema operativo en cada llamada (una caída del
+        proceso no los pierde) y se hace fsync cuando pasa sync_interval o hay
+        sync_bytes pendientes, aunque sigan llegando lecturas sin pausa.
+        """
+        with self.lock:
+            if self.file is None:
+                raise RuntimeError("Llamar a recover() antes de escribir en el WAL")
+            first_seq = self.next_seq
+            records = []
+            for reading in readings:
+                records.append(encode_record(self.next_seq, reading))
+                self.next_seq += 1
+            data = b''.join(records)
+            self.file.write(data)
+            self.file.flush()
+            self.unsynced_bytes += len(data)
+            self.stats['appended'] += len(records)
+            self._maybe_sync_locked()
+            return first_seq
+
+    def _maybe_sync_locked(self):
+        if self.unsynced_bytes and (self.unsynced_bytes >= self.sync_bytes
+                                    or time.monotonic() - self.last_sync >= self.sync_interval):
+            self._sync_locked()
+
+    def _sync_locked(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced_bytes = 0
+        self.last_sync = time.monotonic()
+        self.stats['syncs'] += 1
+
+    def maybe_sync(self):
+        with self.lock:
+            if self.file:
+                self._maybe_sync_locked()
+
+    def sync(self):
+        with self.lock:
+            if self.file and self.unsynced_bytes:
+                self._sync_locked()
+
+    def begin_apply(self, target, size):
+        """
+        Anota que se va a anexar al destino (ruta del CSV y su tamaño actual)
+
+        Llamar antes de escribir las filas; checkpoint() borra la anotación. El
+        log se sincroniza primero para que todo lo que llegue al destino esté
+        también en el log.
+        """
+        with self.lock:
+            if self.file and self.unsynced_bytes:
+                self._sync_locked()
+            self.target = str(target)
+            self.target_size = size
+            self._save_checkpoint()
+
+    def checkpoint(self, seq=None):
+        """
+        Marca como aplicadas las lecturas hasta seq (default: todas las escritas)
+
+        Llamar solo cuando el destino (CSV) ya está en disco (fsync) y con el seq
+        de la última lectura escrita en él: las que siguen en el buffer del
+        escritor deben seguir en el log. El log se vacía cuando todo está
+        aplicado; si el vaciado no llega a disco, los registros se ignoran en la
+        recuperación por su número de secuencia.
+        """
+        with self.lock:
+            if self.file is None:
+                return
+            seq = self.next_seq - 1 if seq is None else min(seq, self.next_seq - 1)
+            if seq <= self.checkpoint_seq and not self.target:
+                return
+            self.checkpoint_seq = max(seq, self.checkpoint_seq)
+            self.target = None
+            self.target_size = None
+            self._save_checkpoint()
+            if self.checkpoint_seq == self.next_seq - 1:
+                self.file.seek(0)
+                self.file.truncate(0)
+                self.unsynced_bytes = 0
+            self.stats['checkpoints'] += 1
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                if self.unsynced_bytes:
+                    self._sync_locked()
+                self.file.close()
+                self.file = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspeccionar un WAL de lecturas')
+    parser.add_argument('name', nargs='?', default='readings', help='Nombre del log (default: readings)')
+    parser.add_argument('--wal-dir', default=str(DEFAULT_WAL_DIR), help='Directorio del WAL')
+
+    args = parser.parse_args()
+
+    wal = ReadingWAL(args.name, args.wal_dir)
+    data = wal.path.read_bytes() if wal.path.exists() else b''
+    records = list(iter_records(data))
+    pending = [seq for _, seq, _ in records if seq > wal.checkpoint_seq]
+    valid_end = records[-1][0] if records else 0
+
+    print(f"📄 {wal.path}: {len(data):,} bytes, {len(records)} registros")
+    print(f"✅ Checkpoint: seq {wal.checkpoint_seq}")
+    if wal.target:
+        print(f"✂️  Escritura sin confirmar en {wal.target}: se corta a {wal.target_size:,} bytes al recuperar")
+    print(f"♻️  Pendientes de aplicar: {len(pending)}")
+    if valid_end < len(data):
+        print(f"⚠️  Cola dañada: {len(data) - valid_end} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
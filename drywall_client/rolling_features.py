@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+DryWall Client - Características de ventana móvil por dispositivo
+Media, desviación, mínimo y máximo en ventanas de tiempo, EWMA y tasa de cambio,
+actualizadas en O(1) amortizado por lectura. El mismo motor se usa en lote
+(DataFrame) y en streaming (arduino_service), con resultados idénticos.
+"""
+
+import math
+import argparse
+from collections import deque
+from datetime import datetime
+
+DEFAULT_WINDOWS = (60, 300, 3600)  # segundos
+DEFAULT_ALPHA = 0.1
+DEFAULT_COLUMNS = ('humidity_pct', 'raw_value')
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def timestamp_seconds(timestamp):
+    """Segundos desde epoch de un timestamp ISO, datetime, pandas.Timestamp o numpy.datetime64 (sin zona)"""
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    elif not isinstance(timestamp, datetime):
+        # numpy solo llega aquí desde DataFrames (compute_rolling_features)
+        import numpy as np
+
+        if isinstance(timestamp, (np.integer, np.floating)):
+            return float(timestamp)
+        if not isinstance(timestamp, np.datetime64):
+            raise TypeError(f"Timestamp no soportado: {type(timestamp).__name__}")
+        timestamp = timestamp.astype('datetime64[us]').item()
+    if timestamp.tzinfo is not None:
+        return timestamp.timestamp()
+    return (timestamp - EPOCH).total_seconds()
+
+
+class RollingWindow:
+    def __init__(self, seconds):
+        """
+        Ventana de tiempo (t - seconds, t] con suma, suma de cuadrados y
+        colas monótonas para mínimo y máximo
+        """
+        self.seconds = seconds
+        self.items = deque()      # (seq, t, valor)
+        self.min_queue = deque()  # (seq, valor) con valores crecientes
+        self.max_queue = deque()  # (seq, valor) con valores decrecientes
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        self.seq = 0
+
+    def add(self, t, value):
+        self.seq += 1
+        self.items.append((self.seq, t, value))
+        self.sum += value
+        self.sum_sq += value * value
+
+        while self.min_queue and self.min_queue[-1][1] >= value:
+            self.min_queue.pop()
+        self.min_queue.append((self.seq, value))
+        while self.max_queue and self.max_queue[-1][1] <= value:
+            self.max_queue.pop()
+        self.max_queue.append((self.seq, value))
+
+        self.evict(t)
+
+    def evict(self, now):
+        """Saca las lecturas que ya no están dentro de la ventana"""
+        limit = now - self.seconds
+        while self.items and self.items[0][1] <= limit:
+            seq, _, value = self.items.popleft()
+            self.sum -= value
+            self.sum_sq -= value * value
+            if self.min_queue[0][0] == seq:
+                self.min_queue.popleft()
+            if self.max_queue[0][0] == seq:
+                self.max_queue.popleft()
+
+        if not self.items:
+            # Evita arrastrar error de redondeo cuando la ventana se vacía
+            self.sum = 0.0
+            self.sum_sq = 0.0
+
+    def stats(self):
+        """Devuelve (media, desviación muestral, mínimo, máximo)"""
+        n = len(self.items)
+        if n == 0:
+            return math.nan, math.nan, math.nan, math.nan
+
+        mean = self.sum / n
+        if n > 1:
+            variance = max(0.0, (self.sum_sq - self.sum * mean) / (n - 1))
+            std = math.sqrt(variance)
+        else:
+            std = math.nan
+        return mean, std, self.min_queue[0][1], self.max_queue[0][1]
+
+
+class DeviceState:
+    def __init__(self, windows, columns):
+        self.windows = {column: [RollingWindow(seconds) for seconds in windows] for column in columns}
+        self.ewma = {column: None for column in columns}
+        self.last = {column: None for column in columns}  # (t, valor)
+        self.last_t = None  # último instante visto (para acotar lecturas desordenadas)
+
+
+class RollingFeatureEngine:
+    def __init__(self, windows=DEFAULT_WINDOWS, alpha=DEFAULT_ALPHA, columns=DEFAULT_COLUMNS):
+        """
+        Motor de características online por device_id
+
+        Args:
+            windows: Tamaños de ventana en segundos
+            alpha: Factor de suavizado de la EWMA (0-1]
+            columns: Columnas numéricas a seguir
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError(f"alpha debe estar en (0, 1]: {alpha}")
+
+        self.windows = tuple(int(seconds) for seconds in windows)
+        self.alpha = alpha
+        self.columns = tuple(columns)
+        self.devices = {}
+        self.clamped = 0  # lecturas con timestamp anterior al último del dispositivo
+
+    def feature_names(self):
+        """Nombres de las columnas generadas, en orden estable"""
+        names = []
+        for column in self.columns:
+            for seconds in self.windows:
+                names += [f"{column}_{stat}_{seconds}s" for stat in ('mean', 'std', 'min', 'max')]
+            names += [f"{column}_ewma", f"{column}_roc"]
+        return names
+
+    def update(self, device_id, timestamp, values):
+        """
+        Incorpora una lectura y devuelve sus características
+
+        Args:
+            device_id: Identificador del dispositivo
+            timestamp: Timestamp ISO, datetime o segundos desde epoch
+            values: dict columna -> valor (NaN/None se ignoran)
+
+        Un timestamp anterior al último del dispositivo no se rechaza: se acota a
+        ese último instante (dt = 0, sin tasa de cambio) y se cuenta en
+        self.clamped, para que las ventanas y la EWMA sigan siendo coherentes.
+
+        Returns:
+            dict: Característica -> valor
+        """
+        t = timestamp_seconds(timestamp)
+        state = self.devices.get(device_id)
+        if state is None:
+            state = self.devices[device_id] = DeviceState(self.windows, self.columns)
+        if state.last_t is not None and t < state.last_t:
+            t = state.last_t
+            self.clamped += 1
+        state.last_t = t
+
+        features = {}
+        for column in self.columns:
+            value = values.get(column)
+            valid = value is not None and not math.isnan(value)
+            if valid:
+                value = float(value)
+
+            for seconds, window in zip(self.windows, state.windows[column]):
+                if valid:
+                    window.add(t, value)
+                else:
+                    window.evict(t)
+                mean, std, minimum, maximum = window.stats()
+                features[f"{column}_mean_{seconds}s"] = mean
+                features[f"{column}_std_{seconds}s"] = std
+                features[f"{column}_min_{seconds}s"] = minimum
+                features[f"{column}_max_{seconds}s"] = maximum
+
+            # Tasa de cambio por segundo respecto a la lectura válida anterior
+            roc = math.nan
+            if valid:
+                previous = state.last[column]
+                if previous is not None and t > previous[0]:
+                    roc = (value - previous[1]) / (t - previous[0])
+                state.last[column] = (t, value)
+
+                ewma = state.ewma[column]
+                state.ewma[column] = value if ewma is None else ewma + self.alpha * (value - ewma)
+
+            features[f"{column}_ewma"] = math.nan if state.ewma[column] is None else state.ewma[column]
+            features[f"{column}_roc"] = roc
+
+        return features
+
+    def reset(self, device_id=None):
+        """Olvida el estado de un dispositivo (o de todos)"""
+        if device_id is None:
+            self.devices.clear()
+        else:
+            self.devices.pop(device_id, None)
+
+
+def compute_rolling_features(df, engine=None, windows=DEFAULT_WINDOWS, alpha=DEFAULT_ALPHA,
+                             columns=DEFAULT_COLUMNS):
+    """
+    Aplica el motor a un DataFrame (timestamp, device_id y columnas numéricas)
+    en el orden de las filas, igual que si las lecturas llegaran en streaming
+
+    Returns:
+        pandas.DataFrame: Características alineadas con el índice de df
+    """
+    import pandas as pd
+
+    engine = engine or RollingFeatureEngine(windows, alpha, columns)
+    data = {column: df[column].to_numpy() for column in engine.columns}
+
+    rows = []
+    for i, (device_id, timestamp) in enumerate(zip(df['device_id'].to_numpy(), df['timestamp'].to_numpy())):
+        values = {column: data[column][i] for column in engine.columns}
+        rows.append(engine.update(device_id, timestamp, values))
+
+    return pd.DataFrame(rows, columns=engine.feature_names(), index=df.index)
+
+
+def main():
+    import pandas as pd
+    from output_writers import FORMATS, format_from_path, write_frame
+
+    parser = argparse.ArgumentParser(description='Características de ventana móvil por dispositivo')
+    parser.add_argument('input', help='CSV con timestamp, device_id y columnas numéricas')
+    parser.add_argument('-o', '--output', help='Archivo de salida (default: <entrada>_rolling.csv)')
+    parser.add_argument('--format', choices=list(FORMATS), help='Formato de salida (default: según --output o csv)')
+    parser.add_argument('--windows', default=','.join(str(w) for w in DEFAULT_WINDOWS),
+                        help='Ventanas en segundos separadas por comas (default: 60,300,3600)')
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA, help='Suavizado EWMA (default: 0.1)')
+
+    args = parser.parse_args()
+
+    windows = [int(w) for w in args.windows.split(',') if w]
+    output = args.output or args.input.rsplit('.', 1)[0] + '_rolling.csv'
+    output_format = args.format or format_from_path(output)
+
+    df = pd.read_csv(args.input)
+    features = compute_rolling_features(df, windows=windows, alpha=args.alpha)
+    write_frame(pd.concat([df, features], axis=1), output, output_format)
+
+    print(f"✅ {len(features.columns)} características para {len(df):,} registros "
+          f"({df['device_id'].nunique()} dispositivos)")
+    print(f"💾 Guardadas en: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -12,6 +12,12 @@ import logging
 from datetime import datetime
 from pathlib import Path
 import stat
+import time
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+from content_hash import file_sha256, AckedHashIndex, DEFAULT_ACK_INDEX
+from upload_metrics import DEFAULT_METRICS
 
 # Configuración de logging
 logging.basicConfig(
@@ -24,14 +30,36 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def make_progress_callback(steps=10):
+    """Callback de progreso que registra cada 1/steps del total (seguro con archivos pequeños)"""
+    state = {'next_step': 1}
+    
+    def progress_callback(transferred, total):
+        if total <= 0:
+            return
+        # Registrar solo al cruzar un nuevo umbral (10%, 20%, ...) o al terminar
+        step = transferred * steps // total
+        if step >= state['next_step'] or transferred == total:
+            state['next_step'] = step + 1
+            percentage = (transferred / total) * 100
+            logger.info(f"[PROGRESS] {percentage:.1f}% ({transferred}/{total} bytes)")
+    
+    return progress_callback
+
 class SFTPClient:
-    def __init__(self, hostname, port=2222, username='drywall_user', key_path='keys/drywall_key'):
+    def __init__(self, hostname, port=2222, username='drywall_user', key_path='keys/drywall_key', ack_index=None,
+                 metrics=None, verify_checksum=True):
         self.hostname = hostname
         self.port = port
         self.username = username
         self.key_path = key_path
-        self.ssh_client = None
+        self.ack_index = ack_index  # AckedHashIndex opcional para no reenviar contenidos
+        self.metrics = metrics if metrics is not None else DEFAULT_METRICS
+        self.verify_checksum = verify_checksum  # Verificar SHA-256 vía check-file tras subir
+        self.transport = None
         self.sftp_client = None
+        self.last_connection = None  # Tiempos de la última conexión
+        self.last_transfer = None    # Métricas de la última subida
     
     def connect(self):
         """Establece conexión SFTP usando clave privada"""
@@ -53,28 +81,59 @@ class SFTPClient:
                 logger.error(f"[ERROR] Error al cargar clave privada: {e}")
                 raise
             
-            # Crear cliente SSH
-            self.ssh_client = paramiko.SSHClient()
-            self.ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            # Conectar
-            self.ssh_client.connect(
-                hostname=self.hostname,
-                port=self.port,
-                username=self.username,
-                pkey=private_key,
-                timeout=30
-            )
+            # Conexión por fases para medir TCP, negociación SSH y autenticación
+            # por separado (la clave del host se acepta, como con AutoAddPolicy)
+            t_start = time.perf_counter()
+            sock = socket.create_connection((self.hostname, self.port), timeout=30)
+            t_connected = time.perf_counter()
+            
+            self.transport = paramiko.Transport(sock)
+            self.transport.start_client(timeout=30)
+            t_handshake = time.perf_counter()
+            
+            self.transport.auth_publickey(self.username, private_key)
+            t_auth = time.perf_counter()
             
             # Crear cliente SFTP
-            self.sftp_client = self.ssh_client.open_sftp()
+            self.sftp_client = paramiko.SFTPClient.from_transport(self.transport)
+            
+            self.last_connection = {
+                'connect_seconds': t_connected - t_start,
+                'handshake_seconds': t_handshake - t_connected,
+                'auth_seconds': t_auth - t_handshake
+            }
+            self.metrics.record_connection(**self.last_connection)
             
             logger.info(f"[OK] Conexión SFTP establecida exitosamente")
+            logger.info(f"[TIMING] TCP: {self.last_connection['connect_seconds'] * 1000:.1f} ms | "
+                        f"SSH: {self.last_connection['handshake_seconds'] * 1000:.1f} ms | "
+                        f"Auth: {self.last_connection['auth_seconds'] * 1000:.1f} ms")
             return True
             
         except Exception as e:
             logger.error(f"[ERROR] Error al conectar: {e}")
+            if self.transport:
+                self.transport.close()
+                self.transport = None
+            return False
+    
+    def is_connected(self):
+        """Indica si la sesión SSH sigue activa"""
+        if not self.transport or not self.sftp_client:
             return False
+        return self.transport.is_active()
+    
+    def remote_sha256(self, remote_path):
+        """
+        Pide al servidor el SHA-256 de un archivo mediante la extensión check-file.
+        Retorna None si el servidor no la soporta para sha256.
+        """
+        try:
+            with self.sftp_client.open(remote_path, 'r') as remote_file:
+                return remote_file.check('sha256').hex()
+        except IOError as e:
+            logger.info(f"[VERIFY] Servidor sin check-file sha256 ({e}), solo se verifica el tamaño")
+            return None
     
     def upload_file(self, local_file, remote_dir="/upload"):
         """
@@ -92,6 +151,14 @@ class SFTPClient:
             if not local_path.exists():
                 raise FileNotFoundError(f"Archivo local no encontrado: {local_file}")
             
+            # Deduplicar por contenido: el nombre remoto cambia en cada subida
+            content_hash = file_sha256(local_path)
+            if self.ack_index is not None:
+                previous = self.ack_index.get(content_hash)
+                if previous:
+                    logger.info(f"[SKIP] Contenido ya confirmado (sha256 {content_hash[:12]}): {previous['remote_path']}")
+                    return previous['remote_path']
+            
             # Generar nombre remoto con timestamp
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             remote_filename = f"{timestamp}_{local_path.name}"
@@ -110,30 +177,53 @@ class SFTPClient:
             logger.info(f"[UPLOAD] Subiendo: {local_file} -> {remote_path}")
             logger.info(f"[SIZE] Tamaño: {file_size} bytes")
             
-            # Callback para mostrar progreso
-            def progress_callback(transferred, total):
-                percentage = (transferred / total) * 100
-                if transferred % (total // 10) == 0 or transferred == total:
-                    logger.info(f"[PROGRESS] {percentage:.1f}% ({transferred}/{total} bytes)")
-            
-            # Subir archivo
+            # Subir archivo (la verificación se hace aparte para medirla)
+            t_transfer = time.perf_counter()
             self.sftp_client.put(
                 str(local_path), 
                 remote_path, 
-                callback=progress_callback
+                callback=make_progress_callback(),
+                confirm=False
             )
+            t_verify = time.perf_counter()
             
-            # Verificar subida
+            # Verificar subida: tamaño y, si el servidor lo soporta, el SHA-256
+            # que calculó mientras recibía el archivo (sin segunda transferencia)
             remote_stat = self.sftp_client.stat(remote_path)
-            if remote_stat.st_size == file_size:
-                logger.info(f"[OK] Archivo subido exitosamente")
-                logger.info(f"[REMOTE] Archivo remoto: {remote_path}")
-                logger.info(f"[VERIFY] Tamaño verificado: {remote_stat.st_size} bytes")
-                return remote_path
-            else:
+            if remote_stat.st_size != file_size:
                 raise Exception(f"Error en verificación: tamaños no coinciden")
+            
+            remote_hash = self.remote_sha256(remote_path) if self.verify_checksum else None
+            if remote_hash is not None and remote_hash != content_hash:
+                raise Exception(f"Error en verificación: SHA-256 no coincide "
+                                f"(local {content_hash[:12]}, remoto {remote_hash[:12]})")
+            
+            verify_seconds = time.perf_counter() - t_verify
+            transfer_seconds = t_verify - t_transfer
+            mbps = self.metrics.record_transfer(file_size, transfer_seconds, verify_seconds)
+            self.last_transfer = {
+                'remote_path': remote_path,
+                'size_bytes': file_size,
+                'sha256': content_hash,
+                'checksum_verified': remote_hash is not None,
+                'transfer_seconds': transfer_seconds,
+                'transfer_mbps': mbps,
+                'verify_seconds': verify_seconds
+            }
+            
+            logger.info(f"[OK] Archivo subido exitosamente")
+            logger.info(f"[REMOTE] Archivo remoto: {remote_path}")
+            logger.info(f"[VERIFY] Tamaño verificado: {remote_stat.st_size} bytes")
+            if remote_hash is not None:
+                logger.info(f"[VERIFY] SHA-256 verificado: {remote_hash[:12]}...")
+            logger.info(f"[TIMING] Transferencia: {transfer_seconds * 1000:.1f} ms ({mbps:.2f} MB/s) | "
+                        f"Verificación: {verify_seconds * 1000:.1f} ms")
+            if self.ack_index is not None:
+                self.ack_index.record(content_hash, local_path.name, remote_path)
+            return remote_path
                 
         except Exception as e:
+            self.metrics.record_failure()
             logger.error(f"[ERROR] Error al subir archivo: {e}")
             raise
     
@@ -186,14 +276,8 @@ class SFTPClient:
             
             logger.info(f"[SIZE] Tamaño: {file_size} bytes")
             
-            # Callback para progreso
-            def progress_callback(transferred, total):
-                percentage = (transferred / total) * 100
-                if transferred % (total // 10) == 0 or transferred == total:
-                    logger.info(f"[PROGRESS] {percentage:.1f}% ({transferred}/{total} bytes)")
-            
             # Descargar archivo
-            self.sftp_client.get(remote_file, local_path, callback=progress_callback)
+            self.sftp_client.get(remote_file, local_path, callback=make_progress_callback())
             
             logger.info(f"[OK] Archivo descargado: {local_path}")
             return local_path
@@ -209,12 +293,135 @@ class SFTPClient:
                 self.sftp_client.close()
                 logger.info("[CLOSE] Cliente SFTP cerrado")
             
-            if self.ssh_client:
-                self.ssh_client.close()
+            if self.transport:
+                self.transport.close()
                 logger.info("[CLOSE] Cliente SSH cerrado")
                 
         except Exception as e:
             logger.error(f"[ERROR] Error al cerrar conexión: {e}")
+        finally:
+            self.sftp_client = None
+            self.transport = None
+
+class MultiDestinationUploader:
+    def __init__(self, destinations, retries=3, retry_delay=2):
+        """
+        Sube un archivo a varios servidores SFTP en paralelo (p. ej. banco principal y DR)
+        
+        Args:
+            destinations (list): Diccionarios con hostname, port, username, key_path,
+                                 remote_dir y opcionalmente name y ack_index.
+                                 Los repetidos (mismo host, puerto y directorio) se
+                                 fusionan; dos destinos distintos con el mismo name
+                                 son un error
+            retries (int): Intentos por destino
+            retry_delay (float): Espera base entre intentos (se duplica en cada fallo)
+        """
+        if not destinations:
+            raise ValueError("Se requiere al menos un destino")
+        
+        self.destinations = []
+        targets = set()
+        for dest in destinations:
+            dest = dict(dest)
+            dest.setdefault('port', 2222)
+            dest.setdefault('username', 'drywall_user')
+            dest.setdefault('key_path', 'keys/drywall_key')
+            dest.setdefault('remote_dir', '/upload')
+            dest.setdefault('name', f"{dest['hostname']}:{dest['port']}")
+            
+            target = (dest['hostname'], dest['port'], dest['remote_dir'])
+            if target in targets:
+                logger.warning(f"[FANOUT] Destino repetido ignorado: {dest['name']} {dest['remote_dir']}")
+                continue
+            if any(other['name'] == dest['name'] for other in self.destinations):
+                raise ValueError(f"Nombre de destino repetido: {dest['name']}")
+            targets.add(target)
+            self.destinations.append(dest)
+        
+        self.retries = retries
+        self.retry_delay = retry_delay
+        # Una conexión persistente por destino, reutilizada entre subidas
+        self.clients = {
+            dest['name']: SFTPClient(
+                hostname=dest['hostname'],
+                port=dest['port'],
+                username=dest['username'],
+                key_path=dest['key_path'],
+                ack_index=dest.get('ack_index')
+            )
+            for dest in self.destinations
+        }
+    
+    def _upload_to(self, dest, local_file):
+        """Sube a un destino con reintentos y backoff exponencial"""
+        client = self.clients[dest['name']]
+        start = time.monotonic()
+        last_error = None
+        
+        for attempt in range(1, self.retries + 1):
+            try:
+                if not client.is_connected():
+                    client.disconnect()
+                    if not client.connect():
+                        raise ConnectionError(f"No se pudo conectar a {dest['name']}")
+                
+                remote_path = client.upload_file(local_file, dest['remote_dir'])
+                return {
+                    'status': 'OK',
+                    'remote_path': remote_path,
+                    'attempts': attempt,
+                    'elapsed_seconds': round(time.monotonic() - start, 3),
+                    'error': None
+                }
+            except Exception as e:
+                last_error = e
+                client.disconnect()
+                logger.warning(f"[RETRY] {dest['name']} intento {attempt}/{self.retries} falló: {e}")
+                if attempt < self.retries:
+                    time.sleep(self.retry_delay * 2 ** (attempt - 1))
+        
+        return {
+            'status': 'ERROR',
+            'remote_path': None,
+            'attempts': self.retries,
+            'elapsed_seconds': round(time.monotonic() - start, 3),
+            'error': str(last_error)
+        }
+    
+    def upload_file(self, local_file):
+        """
+        Sube el archivo a todos los destinos a la vez
+        
+        Returns:
+            dict: Estado por destino (status, remote_path, attempts, elapsed_seconds, error)
+        """
+        logger.info(f"[FANOUT] Subiendo {local_file} a {len(self.destinations)} destinos")
+        
+        with ThreadPoolExecutor(max_workers=len(self.destinations)) as pool:
+            futures = {
+                dest['name']: pool.submit(self._upload_to, dest, local_file)
+                for dest in self.destinations
+            }
+            results = {name: future.result() for name, future in futures.items()}
+        
+        for name, result in results.items():
+            if result['status'] == 'OK':
+                logger.info(f"[FANOUT] {name}: OK en {result['elapsed_seconds']}s -> {result['remote_path']}")
+            else:
+                logger.error(f"[FANOUT] {name}: ERROR tras {result['attempts']} intentos: {result['error']}")
+        
+        return results
+    
+    def close(self):
+        """Cierra todas las conexiones"""
+        for client in self.clients.values():
+            client.disconnect()
+
+def parse_destination(spec, default_port):
+    """Convierte 'host' o 'host:puerto' en (host, puerto)"""
+    host, _, port = spec.partition(':')
+    return host, int(port) if port else default_port
 
 def main():
     parser = argparse.ArgumentParser(
@@ -226,6 +433,7 @@ Ejemplos:
   python sftp_upload.py --list                                      # Listar archivos remotos
   python sftp_upload.py --download remote_file.csv                  # Descargar archivo
   python sftp_upload.py --host 192.168.1.100 --upload data/test.csv # Servidor específico
+  python sftp_upload.py --upload data/test.csv --mirror dr-bank:2222 # Principal + DR en paralelo
         """
     )
     
@@ -235,6 +443,13 @@ Ejemplos:
     parser.add_argument('--user', default='drywall_user', help='Usuario SFTP (default: drywall_user)')
     parser.add_argument('--key', default='keys/drywall_key', help='Clave privada SSH (default: keys/drywall_key)')
     parser.add_argument('--remote-dir', default='/upload', help='Directorio remoto (default: /upload)')
+    parser.add_argument('--ack-index', default=str(DEFAULT_ACK_INDEX), help='Índice local de hashes confirmados')
+    parser.add_argument('--no-dedup', action='store_true', help='Subir aunque el contenido ya esté confirmado')
+    parser.add_argument('--mirror', action='append', default=[], metavar='HOST[:PORT]',
+                        help='Destino adicional para --upload (repetible, subida en paralelo)')
+    parser.add_argument('--retries', type=int, default=3, help='Intentos por destino con --mirror (default: 3)')
+    parser.add_argument('--metrics-file', help='Acumular métricas de subida en este JSON')
+    parser.add_argument('--metrics-prom', help='Escribir métricas acumuladas en formato Prometheus')
     
     # Acciones
     parser.add_argument('--upload', help='Archivo local a subir')
@@ -247,12 +462,21 @@ Ejemplos:
     if not any([args.upload, args.download, args.list]):
         parser.error("Especifica al menos una acción: --upload, --download, o --list")
     
+    if args.mirror:
+        if not args.upload or args.download or args.list:
+            parser.error("--mirror solo se admite junto con --upload")
+        try:
+            return upload_to_mirrors(args)
+        finally:
+            export_metrics(args)
+    
     # Crear cliente SFTP
     client = SFTPClient(
         hostname=args.host,
         port=args.port,
         username=args.user,
-        key_path=args.key
+        key_path=args.key,
+        ack_index=None if args.no_dedup else AckedHashIndex(args.ack_index)
     )
     
     try:
@@ -279,6 +503,60 @@ Ejemplos:
         
     finally:
         client.disconnect()
+        export_metrics(args)
+
+def export_metrics(args):
+    """Acumula las métricas del proceso en --metrics-file y/o --metrics-prom"""
+    if not args.metrics_file and not args.metrics_prom:
+        return
+    
+    try:
+        metrics = DEFAULT_METRICS
+        if args.metrics_file:
+            metrics = DEFAULT_METRICS.save(args.metrics_file)
+            # Lo ya volcado no debe sumarse de nuevo en la siguiente exportación
+            DEFAULT_METRICS.reset()
+            logger.info(f"[METRICS] Métricas acumuladas en: {args.metrics_file}")
+        if args.metrics_prom:
+            Path(args.metrics_prom).write_text(metrics.to_prometheus(), encoding='utf-8')
+            logger.info(f"[METRICS] Formato Prometheus: {args.metrics_prom}")
+    except Exception as e:
+        logger.error(f"[ERROR] Error al exportar métricas: {e}")
+
+def upload_to_mirrors(args):
+    """Sube --upload al servidor principal y a cada --mirror en paralelo"""
+    destinations = []
+    for index, spec in enumerate([f"{args.host}:{args.port}"] + args.mirror):
+        host, port = parse_destination(spec, args.port)
+        dest = {
+            'hostname': host,
+            'port': port,
+            'username': args.user,
+            'key_path': args.key,
+            'remote_dir': args.remote_dir
+        }
+        if not args.no_dedup:
+            # Cada destino confirma por separado: un índice de hashes por destino.
+            # El principal conserva el mismo índice que las subidas sin --mirror
+            index_path = Path(args.ack_index)
+            if index > 0:
+                index_path = index_path.with_name(f"{index_path.stem}_{host}_{port}.json")
+            dest['ack_index'] = AckedHashIndex(index_path)
+        destinations.append(dest)
+    
+    uploader = MultiDestinationUploader(destinations, retries=args.retries)
+    try:
+        results = uploader.upload_file(args.upload)
+    finally:
+        uploader.close()
+    
+    failed = [name for name, result in results.items() if result['status'] != 'OK']
+    if failed:
+        logger.error(f"[FAILED] Subida fallida en: {', '.join(failed)}")
+        return 1
+    
+    logger.info("[SUCCESS] Archivo subido a todos los destinos")
+    return 0
 
 if __name__ == "__main__":
     exit(main())
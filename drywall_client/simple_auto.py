@@ -5,12 +5,14 @@ Automático con copia de archivos (alternativa a SFTP)
 """
 
 import time
-import subprocess
 import shutil
 import logging
 from datetime import datetime
 from pathlib import Path
 
+from upload_spool import UploadSpool, SpoolFlusher, SpoolLockedError, DEFAULT_SPOOL_DIR
+from generate_humidity import generate_humidity_data, summary_lines
+
 logging.basicConfig(
     level=logging.INFO, 
     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -24,13 +26,25 @@ logger = logging.getLogger(__name__)
 # Configuración
 DATA_DIR = Path("data")
 BACKEND_UPLOAD_DIR = Path("../project/backend/upload")
+SPOOL_DIR = DEFAULT_SPOOL_DIR / "local"  # separado del spool SFTP de auto_sensor_system
+SPOOL_MAX_MB = 200
+
+def copy_to_backend(local_file):
+    """Copia un archivo al directorio de subida del backend"""
+    if not BACKEND_UPLOAD_DIR.exists():
+        raise FileNotFoundError(f"Directorio backend no disponible: {BACKEND_UPLOAD_DIR}")
+    
+    destination = BACKEND_UPLOAD_DIR / Path(local_file).name
+    shutil.copy2(local_file, destination)
+    return str(destination)
 
-def auto_cycle():
+def auto_cycle(spool=None, flusher=None):
     """Ciclo automático: generar datos y copiar al backend"""
     timestamp = datetime.now().strftime('%H:%M:%S')
     print(f"\n🚀 CICLO AUTOMÁTICO - {timestamp}")
     print("-" * 50)
     
+    owned_spool = None
     try:
         # 1. Generar datos (PRIORIDAD: Arduino → Simulados)
         print("🔧 Generando datos de sensores...")
@@ -49,20 +63,11 @@ def auto_cycle():
             print(f"⚠️  Arduino no disponible: {e}")
             print("🔄 Usando datos simulados...")
             
-            # Usar datos simulados
-            result = subprocess.run(
-                ["python", "generate_humidity.py"], 
-                capture_output=True, text=True, check=True
-            )
+            # Usar datos simulados (en el propio proceso)
+            summary = {}
+            csv_file = generate_humidity_data(quiet=True, summary=summary)
+            output_lines = summary_lines(csv_file, 'csv', summary)
             print("✅ Datos simulados generados")
-            
-            # Procesar resultado de simulación
-            output_lines = result.stdout.strip().split('\n')
-            csv_file = None
-            for line in output_lines:
-                if "[FILE] Archivo:" in line:
-                    csv_file = line.split(": ")[1]
-                    break
         
         # 2. Validar archivo
         if not csv_file:
@@ -77,10 +82,20 @@ def auto_cycle():
             print(f"❌ Archivo no encontrado: {csv_path}")
             return False
         
+        if spool is None:
+            spool = owned_spool = UploadSpool(SPOOL_DIR, max_bytes=SPOOL_MAX_MB * 1024 * 1024)
+        if flusher is None:
+            flusher = SpoolFlusher(spool, copy_to_backend)
+        
+        # Encolar primero: si el backend no está disponible el archivo queda en el spool
+        spool.enqueue(csv_path)
+        
         print("📤 Copiando al backend...")
-        destination = BACKEND_UPLOAD_DIR / csv_path.name
-        shutil.copy2(csv_path, destination)
-        print(f"✅ Copiado a: {destination}")
+        sent, failed = flusher.flush_once()
+        if failed:
+            print(f"⚠️  Backend no disponible, {spool.stats()['pending']} archivos pendientes en el spool")
+            return False
+        print(f"✅ Copiados {sent} archivos a: {BACKEND_UPLOAD_DIR}")
         
         # 4. Estadísticas
         for line in output_lines:
@@ -90,12 +105,12 @@ def auto_cycle():
         print("✅ Ciclo completado exitosamente")
         return True
         
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error ejecutando comando: {e}")
-        return False
     except Exception as e:
         print(f"❌ Error inesperado: {e}")
         return False
+    finally:
+        if owned_spool is not None:
+            owned_spool.close()
 
 def main():
     """Sistema automático con intervalos configurables"""
@@ -106,9 +121,16 @@ def main():
     
     # Verificar directorios
     if not BACKEND_UPLOAD_DIR.exists():
-        print(f"❌ Directorio backend no encontrado: {BACKEND_UPLOAD_DIR}")
-        print("💡 Asegúrate de que el proyecto esté en la estructura correcta")
+        print(f"⚠️  Directorio backend no encontrado: {BACKEND_UPLOAD_DIR}")
+        print("💡 Los archivos se guardarán en el spool hasta que esté disponible")
+    
+    try:
+        spool = UploadSpool(SPOOL_DIR, max_bytes=SPOOL_MAX_MB * 1024 * 1024)
+    except SpoolLockedError as e:
+        print(f"❌ {e}")
         return
+    flusher = SpoolFlusher(spool, copy_to_backend)
+    flusher.start()
     
     # Configurar intervalo
     try:
@@ -130,7 +152,7 @@ def main():
             cycle_count += 1
             print(f"\n🔄 CICLO #{cycle_count}")
             
-            success = auto_cycle()
+            success = auto_cycle(spool, flusher)
             
             if success:
                 print(f"😴 Esperando {interval} segundos hasta el próximo ciclo...")
@@ -141,7 +163,11 @@ def main():
             
     except KeyboardInterrupt:
         print(f"\n🛑 Sistema detenido después de {cycle_count} ciclos")
+        print(f"📦 Spool: {spool.stats()}")
         print("👋 ¡Adiós!")
+    finally:
+        flusher.stop()
+        spool.close()
 
 if __name__ == "__main__":
     main()
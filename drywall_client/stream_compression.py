@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+DryWall Client - Compresión por banda muerta / puerta giratoria (swinging door)
+Guarda solo los puntos necesarios para reconstruir la señal por interpolación
+lineal dentro de la tolerancia, más un latido cada max_silence segundos.
+Las lecturas anómalas (posibles fugas) se conservan siempre.
+
+Los archivos comprimidos llevan el prefijo arduino_compressed_ y la columna
+compression con el modo: el backend no debe contarlos como lecturas sino
+reconstruir la señal (reconstruct_frame aquí, el endpoint /compressed allí).
+"""
+
+import argparse
+import logging
+
+from rolling_features import timestamp_seconds
+from minute_aggregator import is_anomaly
+
+logger = logging.getLogger(__name__)
+
+COMPRESSED_PREFIX = 'arduino_compressed'
+COMPRESSED_COLUMNS = ['timestamp', 'humidity_pct', 'raw_value', 'device_id', 'compression']
+MODES = ('swinging_door', 'deadband')
+DEFAULT_TOLERANCES = {'humidity_pct': 1.0, 'raw_value': 3.0}
+DEFAULT_MAX_SILENCE = 300  # segundos
+
+
+class DeviceTrack:
+    def __init__(self, reading, t):
+        self.archived = reading      # último punto guardado
+        self.archived_t = t
+        self.held = None             # último punto recibido sin guardar
+        self.held_t = None
+        self.slopes = {}             # columna -> (pendiente mínima superior, máxima inferior)
+
+
+class StreamCompressor:
+    def __init__(self, tolerances=None, max_silence=DEFAULT_MAX_SILENCE, mode='swinging_door',
+                 keep_anomalies=True):
+        """
+        Compresor de lecturas por dispositivo
+
+        Args:
+            tolerances: dict columna -> error máximo admitido al reconstruir
+            max_silence: Segundos máximos sin guardar un punto (latido)
+            mode: 'swinging_door' (interpolación lineal) o 'deadband' (último valor)
+            keep_anomalies: Guardar siempre las lecturas anómalas
+        """
+        if mode not in MODES:
+            raise ValueError(f"Modo no soportado: {mode}")
+        self.tolerances = dict(tolerances or DEFAULT_TOLERANCES)
+        self.max_silence = max_silence
+        self.mode = mode
+        self.keep_anomalies = keep_anomalies
+        self.tracks = {}
+        self.received = 0
+        self.emitted = 0
+
+    def _archive(self, track, reading, t):
+        track.archived = reading
+        track.archived_t = t
+        track.held = None
+        track.held_t = None
+        track.slopes = {}
+        return reading
+
+    def _door_closed(self, track, reading, t):
+        """
+        True si la recta desde el punto guardado hasta el nuevo se sale de la
+        tolerancia de algún punto intermedio; si no, estrecha las puertas
+        """
+        dt = t - track.archived_t
+        bounds = {}
+        for column, tolerance in self.tolerances.items():
+            origin = track.archived[column]
+            value = reading[column]
+            slope = (value - origin) / dt
+            upper = (value + tolerance - origin) / dt
+            lower = (value - tolerance - origin) / dt
+            if column in track.slopes:
+                min_upper, max_lower = track.slopes[column]
+                if not max_lower <= slope <= min_upper:
+                    return True
+                upper = min(upper, min_upper)
+                lower = max(lower, max_lower)
+            bounds[column] = (upper, lower)
+        track.slopes.update(bounds)
+        return False
+
+    def add(self, reading):
+        """Procesa una lectura y devuelve la lista de puntos a guardar (0, 1 o 2)"""
+        self.received += 1
+        device_id = reading['device_id']
+        t = timestamp_seconds(reading['timestamp'])
+        track = self.tracks.get(device_id)
+
+        if track is None:
+            self.tracks[device_id] = DeviceTrack(reading, t)
+            self.emitted += 1
+            return [reading]
+
+        emitted = []
+        if (self.keep_anomalies and is_anomaly(reading['humidity_pct'], reading['raw_value'])) \
+                or t <= track.archived_t or t - track.archived_t >= self.max_silence:
+            # Anomalía, timestamp repetido o latido: guardar el retenido y este punto
+            if track.held is not None and track.held_t > track.archived_t and t > track.held_t:
+                emitted.append(track.held)
+            emitted.append(self._archive(track, reading, t))
+
+        elif self.mode == 'deadband':
+            if any(abs(reading[c] - track.archived[c]) > tol for c, tol in self.tolerances.items()):
+                emitted.append(self._archive(track, reading, t))
+
+        elif self._door_closed(track, reading, t):
+            # El punto retenido cierra el segmento; el nuevo abre otro desde él
+            emitted.append(self._archive(track, track.held, track.held_t))
+            if t <= track.archived_t:
+                emitted.append(self._archive(track, reading, t))
+            else:
+                self._door_closed(track, reading, t)
+                track.held, track.held_t = reading, t
+
+        else:
+            track.held, track.held_t = reading, t
+
+        self.emitted += len(emitted)
+        return emitted
+
+    def add_many(self, readings):
+        emitted = []
+        for reading in readings:
+            emitted.extend(self.add(reading))
+        return emitted
+
+    def flush(self):
+        """Guarda el último punto retenido de cada dispositivo (cierre del servicio)"""
+        emitted = []
+        for track in self.tracks.values():
+            if track.held is not None:
+                emitted.append(self._archive(track, track.held, track.held_t))
+        self.emitted += len(emitted)
+        return emitted
+
+    @property
+    def ratio(self):
+        return self.received / self.emitted if self.emitted else 0.0
+
+
+class CompressionSink:
+    def __init__(self, writer, compressor):
+        """
+        Escribe solo los puntos que guarda el compresor
+
+        writer: DailyCSVWriter con prefix=COMPRESSED_PREFIX y columns=COMPRESSED_COLUMNS
+        """
+        self.writer = writer
+        self.compressor = compressor
+
+    def _write_points(self, points):
+        if points:
+            # Cada punto indica el modo para que el lector sepa cómo reconstruir
+            self.writer.write_many([dict(point, compression=self.compressor.mode) for point in points])
+
+    def write_many(self, readings):
+        self._write_points(self.compressor.add_many(readings))
+
+    def write(self, reading):
+        self.write_many([reading])
+
+    def maybe_flush(self):
+        self.writer.maybe_flush()
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self._write_points(self.compressor.flush())
+        self.writer.close()
+
+
+def reconstruct_frame(compressed, timestamps, columns=tuple(DEFAULT_TOLERANCES), mode='swinging_door'):
+    """
+    Reconstruye la señal en los instantes pedidos a partir de los puntos guardados
+
+    Args:
+        compressed: DataFrame con timestamp, device_id y columnas (salida del compresor)
+        timestamps: DataFrame con timestamp y device_id de los instantes a reconstruir
+        mode: 'swinging_door' interpola linealmente; 'deadband' mantiene el último valor
+
+    Returns:
+        pandas.DataFrame: timestamps con las columnas reconstruidas (mismo índice)
+    """
+    import numpy as np
+    import pandas as pd
+
+    result = timestamps[['timestamp', 'device_id']].copy()
+    # isoformat() omite .ffffff cuando el microsegundo es 0: no inferir el formato de la primera fila
+    def to_us(timestamps):
+        return pd.to_datetime(timestamps, format='ISO8601').to_numpy().astype('datetime64[us]').astype(np.int64)
+
+    target_t = to_us(result['timestamp'])
+    source_t_all = to_us(compressed['timestamp'])
+
+    for column in columns:
+        result[column] = np.nan
+    for device_id, positions in result.groupby('device_id').indices.items():
+        mask = (compressed['device_id'] == device_id).to_numpy()
+        source_t = source_t_all[mask]
+        order = np.argsort(source_t, kind='stable')
+        source_t = source_t[order]
+        for column in columns:
+            values = compressed[column].to_numpy(dtype=float)[mask][order]
+            if mode == 'deadband':
+                index = np.clip(np.searchsorted(source_t, target_t[positions], side='right') - 1, 0, None)
+                reconstructed = values[index]
+            else:
+                reconstructed = np.interp(target_t[positions], source_t, values)
+            result.iloc[positions, result.columns.get_loc(column)] = reconstructed
+    return result
+
+
+def main():
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description='Comprimir un CSV de lecturas y verificar la reconstrucción')
+    parser.add_argument('input', help='CSV crudo (timestamp, humidity_pct, raw_value, device_id)')
+    parser.add_argument('-o', '--output', help='CSV comprimido (default: <entrada>_compressed.csv)')
+    parser.add_argument('--mode', choices=MODES, default='swinging_door', help='Algoritmo (default: swinging_door)')
+    parser.add_argument('--humidity-tolerance', type=float, default=DEFAULT_TOLERANCES['humidity_pct'],
+                        help='Error máximo en humidity_pct (default: 1.0)')
+    parser.add_argument('--raw-tolerance', type=float, default=DEFAULT_TOLERANCES['raw_value'],
+                        help='Error máximo en raw_value (default: 3.0)')
+    parser.add_argument('--max-silence', type=float, default=DEFAULT_MAX_SILENCE,
+                        help=f'Segundos máximos entre puntos guardados (default: {DEFAULT_MAX_SILENCE})')
+
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input)
+    tolerances = {'humidity_pct': args.humidity_tolerance, 'raw_value': args.raw_tolerance}
+    compressor = StreamCompressor(tolerances, args.max_silence, args.mode)
+    points = compressor.add_many(df.to_dict('records')) + compressor.flush()
+    compressed = pd.DataFrame(points, columns=list(df.columns))
+    compressed['compression'] = args.mode
+
+    output = args.output or args.input.rsplit('.', 1)[0] + '_compressed.csv'
+    compressed.to_csv(output, index=False)
+
+    reconstructed = reconstruct_frame(compressed, df, tuple(tolerances), args.mode)
+    print(f"✅ {len(df):,} lecturas -> {len(compressed):,} puntos ({compressor.ratio:.1f}x)")
+    for column, tolerance in tolerances.items():
+        error = (reconstructed[column] - df[column]).abs().max()
+        print(f"📊 {column}: error máximo {error:.3f} (tolerancia {tolerance})")
+    print(f"💾 Guardado en: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
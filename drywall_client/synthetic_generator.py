@@ -1,148 +1,328 @@
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-from pathlib import Path
-
-def generate_synthetic_data(enhanced_csv_path, output_csv_path, num_days=7):
-    """
-    Genera datos sintéticos basados en datos reales enriquecidos
-    """
-    print(f"📖 Leyendo datos enriquecidos de: {enhanced_csv_path}")
-    
-    # Leer datos reales enriquecidos
-    df_real = pd.read_csv(enhanced_csv_path)
-    
-    # Analizar estadísticas de tus datos reales
-    humidity_stats = df_real['humidity_pct'].describe()
-    raw_stats = df_real['raw_value'].describe()
-    
-    print(f"📊 Estadísticas de datos reales:")
-    print(f"   Registros: {len(df_real)}")
-    print(f"   Humedad: {humidity_stats['mean']:.1f}% (±{humidity_stats['std']:.1f})")
-    print(f"   Raw: {raw_stats['mean']:.0f} (±{raw_stats['std']:.0f})")
-    print(f"   Rango humedad: {humidity_stats['min']:.1f}% - {humidity_stats['max']:.1f}%")
-    
-    # Generar datos sintéticos
-    synthetic_data = []
-    samples_per_day = 1440  # Una muestra por minuto
-    total_samples = num_days * samples_per_day
-    
-    print(f"🔄 Generando {total_samples:,} registros sintéticos para {num_days} días...")
-    
-    for day in range(num_days):
-        base_date = datetime.now() - timedelta(days=day)
-        print(f"📅 Generando día {day + 1}/{num_days}: {base_date.strftime('%Y-%m-%d')}")
-        
-        for minute in range(samples_per_day):
-            timestamp = base_date + timedelta(minutes=minute)
-            
-            # Generar humedad realista basada en tus datos
-            humidity_pct = generate_realistic_humidity(timestamp, humidity_stats, df_real)
-            
-            # Generar raw_value correlacionado con humedad
-            raw_value = generate_correlated_raw(humidity_pct, raw_stats)
-            
-            # Crear registro sintético completo
-            synthetic_record = create_synthetic_record(timestamp, humidity_pct, raw_value, day, minute)
-            synthetic_data.append(synthetic_record)
-            
-            # Mostrar progreso
-            if len(synthetic_data) % 5000 == 0:
-                print(f"   Generados {len(synthetic_data):,} registros...")
-    
-    # Guardar datos sintéticos
-    df_synthetic = pd.DataFrame(synthetic_data)
-    df_synthetic.to_csv(output_csv_path, index=False)
-    
-    print(f"✅ {len(synthetic_data):,} registros sintéticos generados")
-    print(f"💾 Guardados en: {output_csv_path}")
-    
-    # Estadísticas finales
-    print(f"\n📈 Estadísticas de datos sintéticos:")
-    print(f"   Humedad promedio: {df_synthetic['humidity_pct'].mean():.1f}%")
-    print(f"   Anomalías generadas: {df_synthetic['is_anomaly'].sum()} ({df_synthetic['is_anomaly'].mean()*100:.1f}%)")
-    
-    return output_csv_path
-
-def generate_realistic_humidity(timestamp, humidity_stats, df_real):
-    """Genera humedad realista con patrones temporales"""
-    base_humidity = humidity_stats['mean']
-    hour = timestamp.hour
-    
-    # Analizar patrones por hora en datos reales
-    hourly_avg = df_real.groupby(df_real['timestamp'].str[11:13].astype(int))['humidity_pct'].mean()
-    if hour in hourly_avg.index:
-        base_humidity = hourly_avg[hour]
-    
-    # Patrones diarios (más húmedo de noche)
-    if 22 <= hour or hour <= 6:
-        base_humidity += np.random.normal(5, 2)
-    elif 10 <= hour <= 16:
-        base_humidity += np.random.normal(-3, 1)
-    
-    # Variación por día de la semana
-    if timestamp.weekday() >= 5:  # Fin de semana
-        base_humidity += np.random.normal(2, 1)
-    
-    # Añadir variación natural
-    humidity_pct = np.random.normal(base_humidity, humidity_stats['std'] * 0.6)
-    
-    return max(0, min(100, humidity_pct))
-
-def generate_correlated_raw(humidity_pct, raw_stats):
-    """Genera raw_value correlacionado con humedad (relación inversa)"""
-    # Basado en la relación observada en tus datos
-    raw_value = 510 - (humidity_pct * 3) + np.random.normal(0, raw_stats['std'] * 0.4)
-    return max(0, min(1023, int(raw_value)))
-
-def create_synthetic_record(timestamp, humidity_pct, raw_value, day, minute):
-    """Crea registro sintético completo con todas las características"""
-    
-    # Generar algunas anomalías (2% de probabilidad)
-    is_anomaly = np.random.random() < 0.02
-    if is_anomaly:
-        if np.random.random() < 0.5:
-            humidity_pct = np.random.choice([
-                np.random.uniform(0, 3),     # Muy seco
-                np.random.uniform(97, 100)   # Muy húmedo
-            ])
-        else:
-            raw_value = np.random.choice([
-                np.random.uniform(0, 20),     # Sensor defectuoso
-                np.random.uniform(1000, 1023) # Sensor saturado
-            ])
-    
-    # Calcular características
-    hour = timestamp.hour
-    
-    return {
-        'timestamp': timestamp.isoformat(),
-        'humidity_pct': round(humidity_pct, 1),
-        'raw_value': int(raw_value),
-        'device_id': 'arduino_sensor_01',
-        'hour': hour,
-        'day_of_week': timestamp.weekday(),
-        'is_weekend': 1 if timestamp.weekday() >= 5 else 0,
-        'is_night': 1 if hour < 6 or hour > 22 else 0,
-        'humidity_category': 0 if humidity_pct < 40 else (1 if humidity_pct < 70 else 2),
-        'raw_normalized': raw_value / 1024.0,
-        'humidity_risk_level': min(1.0, max(0.1, 
-            0.1 if humidity_pct < 30 else 
-            0.3 if humidity_pct < 50 else 
-            0.6 if humidity_pct < 70 else 
-            0.8 if humidity_pct < 85 else 1.0)),
-        'sensor_stability': 1.0 if 100 <= raw_value <= 924 else 0.5 if 50 <= raw_value <= 974 else 0.2,
-        'is_anomaly': 1 if is_anomaly else 0,
-        'humidity_change': np.random.uniform(0, 5),  # Cambio simulado
-        'raw_change': np.random.uniform(0, 20)       # Cambio simulado
-    }
-
-if __name__ == "__main__":
-    enhanced_file = "data/arduino_data_enhanced_20250710.csv"
-    synthetic_file = "data/synthetic_drywall_data_7days.csv"
-    
-    if Path(enhanced_file).exists():
-        generate_synthetic_data(enhanced_file, synthetic_file, num_days=7)
-    else:
-        print(f"❌ Archivo no encontrado: {enhanced_file}")
-        print("💡 Ejecuta primero: python data_enhancer.py")
\ No newline at end of file
+import os
+import json
+import shutil
+import argparse
+import time
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from output_writers import FORMATS, format_from_path, open_writer, write_frame, concat_outputs
+
+SAMPLES_PER_DAY = 1440  # Una muestra por minuto
+ANOMALY_RATE = 0.02
+DEFAULT_DEVICE_ID = 'arduino_sensor_01'
+
+def generate_synthetic_data(enhanced_csv_path, output_csv_path, num_days=7, seed=None, output_format=None):
+    """
+    Genera datos sintéticos basados en datos reales enriquecidos
+
+    Toda la línea de tiempo se genera como arrays de NumPy: el perfil horario
+    de los datos reales se calcula una sola vez y las columnas derivadas se
+    obtienen con operaciones vectorizadas. output_format ('csv', 'ndjson.gz',
+    'parquet', 'feather') se deduce de la extensión si no se indica.
+    """
+    if num_days < 1:
+        raise ValueError(f"Se necesita al menos 1 día (días={num_days})")
+
+    print(f"📖 Leyendo datos enriquecidos de: {enhanced_csv_path}")
+
+    # Leer datos reales enriquecidos
+    df_real = pd.read_csv(enhanced_csv_path)
+
+    # Analizar estadísticas de tus datos reales
+    humidity_stats = df_real['humidity_pct'].describe()
+    raw_stats = df_real['raw_value'].describe()
+
+    print(f"📊 Estadísticas de datos reales:")
+    print(f"   Registros: {len(df_real)}")
+    print(f"   Humedad: {humidity_stats['mean']:.1f}% (±{humidity_stats['std']:.1f})")
+    print(f"   Raw: {raw_stats['mean']:.0f} (±{raw_stats['std']:.0f})")
+    print(f"   Rango humedad: {humidity_stats['min']:.1f}% - {humidity_stats['max']:.1f}%")
+
+    total_samples = num_days * SAMPLES_PER_DAY
+    print(f"🔄 Generando {total_samples:,} registros sintéticos para {num_days} días...")
+
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    profile = hourly_profile(df_real, humidity_stats['mean'])
+    timestamps = build_timeline(np.datetime64(datetime.now(), 'us'), range(num_days))
+
+    df_synthetic = generate_synthetic_frame(timestamps, profile, humidity_stats, raw_stats, rng)
+    elapsed = time.perf_counter() - start
+
+    # Guardar datos sintéticos
+    write_frame(df_synthetic, output_csv_path, output_format)
+
+    print(f"✅ {len(df_synthetic):,} registros sintéticos generados en {elapsed:.2f}s")
+    print(f"💾 Guardados en: {output_csv_path}")
+
+    # Estadísticas finales
+    print(f"\n📈 Estadísticas de datos sintéticos:")
+    print(f"   Humedad promedio: {df_synthetic['humidity_pct'].mean():.1f}%")
+    print(f"   Anomalías generadas: {df_synthetic['is_anomaly'].sum()} ({df_synthetic['is_anomaly'].mean()*100:.1f}%)")
+
+    return output_csv_path
+
+def hourly_profile(df_real, default_humidity):
+    """Humedad media por hora (0-23) de los datos reales; horas sin datos usan la media global"""
+    hours = df_real['timestamp'].str[11:13].astype(int)
+    hourly_avg = df_real.groupby(hours)['humidity_pct'].mean()
+    return hourly_avg.reindex(range(24)).fillna(default_humidity).to_numpy()
+
+def build_timeline(base_time, days):
+    """Timestamps por minuto: cada día empieza en base_time menos 'day' días"""
+    day_offsets = np.asarray(days, dtype=np.int64) * SAMPLES_PER_DAY
+    minutes = (np.arange(SAMPLES_PER_DAY) - day_offsets[:, None]).ravel()
+    return base_time + minutes.astype('timedelta64[m]')
+
+def generate_realistic_humidity(hours, is_weekend, profile, humidity_stats, rng):
+    """Genera humedad realista con patrones temporales"""
+    n = len(hours)
+    base_humidity = profile[hours]
+
+    # Patrones diarios (más húmedo de noche)
+    night = (hours >= 22) | (hours <= 6)
+    midday = (hours >= 10) & (hours <= 16)
+    base_humidity = base_humidity + np.where(night, rng.normal(5, 2, n), 0.0)
+    base_humidity = base_humidity + np.where(midday, rng.normal(-3, 1, n), 0.0)
+
+    # Variación por día de la semana
+    base_humidity = base_humidity + np.where(is_weekend, rng.normal(2, 1, n), 0.0)
+
+    # Añadir variación natural
+    humidity_pct = rng.normal(base_humidity, humidity_stats['std'] * 0.6)
+
+    return np.clip(humidity_pct, 0, 100)
+
+def generate_correlated_raw(humidity_pct, raw_stats, rng):
+    """Genera raw_value correlacionado con humedad (relación inversa)"""
+    # Basado en la relación observada en tus datos
+    raw_value = 510 - (humidity_pct * 3) + rng.normal(0, raw_stats['std'] * 0.4, len(humidity_pct))
+    return np.clip(np.trunc(raw_value), 0, 1023)
+
+def inject_anomalies(humidity_pct, raw_value, rng):
+    """Genera algunas anomalías (2% de probabilidad): lecturas extremas de humedad o del sensor"""
+    n = len(humidity_pct)
+    is_anomaly = rng.random(n) < ANOMALY_RATE
+    on_humidity = is_anomaly & (rng.random(n) < 0.5)
+    on_raw = is_anomaly & ~on_humidity
+    low_side = rng.random(n) < 0.5
+
+    # Muy seco / muy húmedo
+    extreme_humidity = np.where(low_side, rng.uniform(0, 3, n), rng.uniform(97, 100, n))
+    # Sensor defectuoso / sensor saturado
+    extreme_raw = np.where(low_side, rng.uniform(0, 20, n), rng.uniform(1000, 1023, n))
+
+    humidity_pct = np.where(on_humidity, extreme_humidity, humidity_pct)
+    raw_value = np.where(on_raw, extreme_raw, raw_value)
+    return humidity_pct, raw_value, is_anomaly
+
+def generate_synthetic_frame(timestamps, profile, humidity_stats, raw_stats, rng,
+                             device_id=DEFAULT_DEVICE_ID):
+    """Crea los registros sintéticos completos con todas las características"""
+    n = len(timestamps)
+    hours = (timestamps - timestamps.astype('datetime64[D]')).astype('timedelta64[h]').astype(np.int64)
+    # 1970-01-01 fue jueves (weekday 3)
+    day_of_week = (timestamps.astype('datetime64[D]').astype(np.int64) + 3) % 7
+    is_weekend = day_of_week >= 5
+
+    humidity_pct = generate_realistic_humidity(hours, is_weekend, profile, humidity_stats, rng)
+    raw_value = generate_correlated_raw(humidity_pct, raw_stats, rng)
+    humidity_pct, raw_value, is_anomaly = inject_anomalies(humidity_pct, raw_value, rng)
+
+    return pd.DataFrame({
+        'timestamp': np.datetime_as_string(timestamps, unit='us'),
+        'humidity_pct': np.round(humidity_pct, 1),
+        'raw_value': raw_value.astype(np.int64),
+        'device_id': device_id,
+        'hour': hours,
+        'day_of_week': day_of_week,
+        'is_weekend': is_weekend.astype(np.int64),
+        'is_night': ((hours < 6) | (hours > 22)).astype(np.int64),
+        'humidity_category': np.select([humidity_pct < 40, humidity_pct < 70], [0, 1], 2),
+        'raw_normalized': raw_value / 1024.0,
+        'humidity_risk_level': np.select(
+            [humidity_pct < 30, humidity_pct < 50, humidity_pct < 70, humidity_pct < 85],
+            [0.1, 0.3, 0.6, 0.8], 1.0),
+        'sensor_stability': np.select(
+            [(raw_value >= 100) & (raw_value <= 924), (raw_value >= 50) & (raw_value <= 974)],
+            [1.0, 0.5], 0.2),
+        'is_anomaly': is_anomaly.astype(np.int64),
+        'humidity_change': rng.uniform(0, 5, n),  # Cambio simulado
+        'raw_change': rng.uniform(0, 20, n)       # Cambio simulado
+    })
+
+def device_ids(num_devices):
+    """IDs de dispositivo: arduino_sensor_01, arduino_sensor_02, ..."""
+    return [f"arduino_sensor_{i:02d}" for i in range(1, num_devices + 1)]
+
+def generate_day_partition(task):
+    """
+    Genera y escribe la partición de un día (se ejecuta en un proceso del pool)
+
+    La semilla de cada día y dispositivo deriva de la SeedSequence del día,
+    no del proceso: el resultado no depende del número de workers.
+
+    Returns:
+        dict: Ruta de la partición, registros y anomalías
+    """
+    timestamps = build_timeline(task['base_time'], [task['day']])
+    device_seeds = task['seed_seq'].spawn(len(task['devices']))
+
+    frames = [
+        generate_synthetic_frame(timestamps, task['profile'], task['humidity_stats'],
+                                 task['raw_stats'], np.random.default_rng(device_seed), device_id)
+        for device_id, device_seed in zip(task['devices'], device_seeds)
+    ]
+    df_day = pd.concat(frames, ignore_index=True)
+    with open_writer(task['path'], task['format'], write_schema=False) as writer:
+        writer.write(df_day)
+
+    return {
+        'day': task['day'],
+        'path': str(task['path']),
+        'schema': writer.schema,
+        'records': len(df_day),
+        'anomalies': int(df_day['is_anomaly'].sum()),
+        'humidity_sum': float(df_day['humidity_pct'].sum())
+    }
+
+def generate_synthetic_data_parallel(enhanced_csv_path, output_csv_path, num_days=7, seed=None,
+                                     workers=None, num_devices=1, merge=True, base_time=None,
+                                     output_format=None):
+    """
+    Genera datos sintéticos repartiendo los días entre procesos
+
+    Cada día se escribe como partición en <salida>_parts/day_NNNN.<ext>. Al final
+    las particiones se unen en output_csv_path o, con merge=False, se deja un
+    índice JSON <salida>.index.json con las particiones en orden.
+    Con la misma semilla y base_time la salida es idéntica byte a byte.
+    """
+    if num_days < 1 or num_devices < 1:
+        raise ValueError(f"Se necesita al menos 1 día y 1 dispositivo (días={num_days}, dispositivos={num_devices})")
+
+    print(f"📖 Leyendo datos enriquecidos de: {enhanced_csv_path}")
+
+    df_real = pd.read_csv(enhanced_csv_path)
+    humidity_stats = df_real['humidity_pct'].describe()
+    raw_stats = df_real['raw_value'].describe()
+    profile = hourly_profile(df_real, humidity_stats['mean'])
+
+    # Sin semilla se usa entropía del sistema, pero se muestra para poder repetir la ejecución
+    root_seed = np.random.SeedSequence(seed)
+    day_seeds = root_seed.spawn(num_days)
+    devices = device_ids(num_devices)
+    workers = workers or os.cpu_count()
+
+    output_path = Path(output_csv_path)
+    output_format = output_format or format_from_path(output_path)
+    extension = FORMATS[output_format]
+    base_name = output_path.name[:-len(extension)] if output_path.name.endswith(extension) else output_path.stem
+    parts_dir = output_path.with_name(f"{base_name}_parts")
+    parts_dir.mkdir(parents=True, exist_ok=True)
+
+    base_time = np.datetime64(base_time or datetime.now(), 'us')
+    tasks = [
+        {
+            'day': day,
+            'base_time': base_time,
+            'profile': profile,
+            'humidity_stats': humidity_stats,
+            'raw_stats': raw_stats,
+            'seed_seq': day_seeds[day],
+            'devices': devices,
+            'path': parts_dir / f"day_{day:04d}{extension}",
+            'format': output_format
+        }
+        for day in range(num_days)
+    ]
+
+    total_samples = num_days * SAMPLES_PER_DAY * num_devices
+    print(f"🔄 Generando {total_samples:,} registros sintéticos para {num_days} días "
+          f"y {num_devices} dispositivos con {workers} procesos...")
+    print(f"🎲 Semilla: {root_seed.entropy}")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        partitions = list(executor.map(generate_day_partition, tasks))
+    elapsed = time.perf_counter() - start
+
+    records = sum(p['records'] for p in partitions)
+    anomalies = sum(p['anomalies'] for p in partitions)
+    print(f"✅ {records:,} registros sintéticos generados en {elapsed:.2f}s ({len(partitions)} particiones)")
+
+    if merge:
+        concat_outputs([p['path'] for p in partitions], output_path, output_format,
+                       schema=partitions[0]['schema'], rows=records)
+        shutil.rmtree(parts_dir)
+        print(f"💾 Guardados en: {output_path}")
+        result = str(output_path)
+    else:
+        index_path = output_path.with_name(f"{output_path.name}.index.json")
+        index = {
+            'generated_at': datetime.now().isoformat(),
+            'seed': root_seed.entropy,
+            'base_time': str(base_time),
+            'num_days': num_days,
+            'devices': devices,
+            'format': output_format,
+            'schema': partitions[0]['schema'],
+            'records': records,
+            'partitions': [{key: p[key] for key in ('day', 'path', 'records')} for p in partitions]
+        }
+        with open(index_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2)
+        print(f"💾 Particiones en: {parts_dir}")
+        print(f"📑 Índice: {index_path}")
+        result = str(index_path)
+
+    print(f"\n📈 Estadísticas de datos sintéticos:")
+    print(f"   Humedad promedio: {sum(p['humidity_sum'] for p in partitions) / records:.1f}%")
+    print(f"   Anomalías generadas: {anomalies} ({anomalies / records * 100:.1f}%)")
+
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Generador de datos sintéticos DryWall')
+    parser.add_argument('--input', default="data/arduino_data_enhanced_20250710.csv",
+                        help='CSV enriquecido con data_enhancer.py')
+    parser.add_argument('--output', help='Archivo de salida (default: data/synthetic_drywall_data_<N>days.<formato>)')
+    parser.add_argument('--format', choices=list(FORMATS),
+                        help='Formato de salida (default: según la extensión o csv; parquet/feather requieren pyarrow)')
+    parser.add_argument('--days', type=int, default=7, help='Días a generar (default: 7)')
+    parser.add_argument('--seed', type=int, help='Semilla para resultados reproducibles')
+    parser.add_argument('--workers', type=int,
+                        help='Generar en paralelo con N procesos (particiones por día)')
+    parser.add_argument('--devices', type=int, default=1, help='Dispositivos simulados en modo paralelo')
+    parser.add_argument('--start', type=datetime.fromisoformat,
+                        help='Inicio del día 0 en ISO (default: ahora); con --seed la salida es reproducible')
+    parser.add_argument('--no-merge', action='store_true',
+                        help='Modo paralelo: conservar particiones con un índice en lugar de unirlas')
+
+    args = parser.parse_args()
+    if args.days < 1:
+        parser.error("--days debe ser al menos 1")
+    if args.devices < 1:
+        parser.error("--devices debe ser al menos 1")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers debe ser al menos 1")
+    output_format = args.format or (format_from_path(args.output) if args.output else 'csv')
+    synthetic_file = args.output or f"data/synthetic_drywall_data_{args.days}days{FORMATS[output_format]}"
+
+    if not Path(args.input).exists():
+        print(f"❌ Archivo no encontrado: {args.input}")
+        print("💡 Ejecuta primero: python data_enhancer.py")
+    elif args.workers or args.devices > 1 or args.no_merge:
+        generate_synthetic_data_parallel(args.input, synthetic_file, num_days=args.days, seed=args.seed,
+                                         workers=args.workers, num_devices=args.devices,
+                                         merge=not args.no_merge, base_time=args.start,
+                                         output_format=output_format)
+    else:
+        generate_synthetic_data(args.input, synthetic_file, num_days=args.days, seed=args.seed,
+                                output_format=output_format)
+
+if __name__ == "__main__":
+    main()
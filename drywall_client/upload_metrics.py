@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+DryWall Client - Métricas de subida SFTP
+Histogramas de conexión, autenticación, transferencia y verificación
+exportables como JSON o en formato de texto de Prometheus
+"""
+
+import os
+import json
+import fcntl
+import bisect
+import tempfile
+import argparse
+import threading
+from pathlib import Path
+
+# Límites superiores de los buckets (la cubeta +Inf es implícita)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+MBPS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0)
+
+METRIC_PREFIX = 'drywall_upload'
+
+# nombre -> (descripción, buckets)
+METRIC_DEFINITIONS = {
+    'connect_seconds': ('Tiempo de conexión TCP al servidor SFTP', SECONDS_BUCKETS),
+    'handshake_seconds': ('Tiempo de negociación SSH (kex)', SECONDS_BUCKETS),
+    'auth_seconds': ('Tiempo de autenticación por clave pública', SECONDS_BUCKETS),
+    'transfer_seconds': ('Duración de la transferencia del archivo', SECONDS_BUCKETS),
+    'transfer_mbps': ('Velocidad de transferencia en MB/s', MBPS_BUCKETS),
+    'verify_seconds': ('Tiempo de verificación tras la subida', SECONDS_BUCKETS),
+}
+
+
+class Histogram:
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # última posición: +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def merge(self, data):
+        """Acumula el estado serializado de otro histograma con los mismos buckets"""
+        if tuple(data['buckets']) != self.buckets:
+            raise ValueError(f"Buckets incompatibles para {self.name}")
+        with self.lock:
+            self.counts = [a + b for a, b in zip(self.counts, data['counts'])]
+            self.sum += data['sum']
+            self.count += data['count']
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'description': self.description,
+                'buckets': list(self.buckets),
+                'counts': list(self.counts),
+                'sum': self.sum,
+                'count': self.count
+            }
+
+    def to_prometheus(self, prefix=METRIC_PREFIX):
+        data = self.to_dict()
+        metric = f"{prefix}_{self.name}"
+        lines = [
+            f"# HELP {metric} {self.description}",
+            f"# TYPE {metric} histogram"
+        ]
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], data['counts']):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{metric}_sum {data['sum']}")
+        lines.append(f"{metric}_count {data['count']}")
+        return '\n'.join(lines)
+
+
+class UploadMetrics:
+    def __init__(self):
+        """Registro de histogramas de subida (thread-safe)"""
+        self.histograms = {
+            name: Histogram(name, description, buckets)
+            for name, (description, buckets) in METRIC_DEFINITIONS.items()
+        }
+        self.transfers = 0
+        self.failures = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+
+    def observe(self, name, value):
+        self.histograms[name].observe(value)
+
+    def record_connection(self, connect_seconds, handshake_seconds, auth_seconds):
+        self.observe('connect_seconds', connect_seconds)
+        self.observe('handshake_seconds', handshake_seconds)
+        self.observe('auth_seconds', auth_seconds)
+
+    def record_transfer(self, size_bytes, transfer_seconds, verify_seconds):
+        """Registra una subida completada y devuelve su velocidad en MB/s"""
+        mbps = (size_bytes / (1024 * 1024)) / transfer_seconds if transfer_seconds > 0 else 0.0
+        self.observe('transfer_seconds', transfer_seconds)
+        self.observe('transfer_mbps', mbps)
+        self.observe('verify_seconds', verify_seconds)
+        with self.lock:
+            self.transfers += 1
+            self.bytes_sent += size_bytes
+        return mbps
+
+    def reset(self):
+        """Vacía todos los histogramas y contadores"""
+        with self.lock:
+            self.transfers = 0
+            self.failures = 0
+            self.bytes_sent = 0
+        for histogram in self.histograms.values():
+            with histogram.lock:
+                histogram.counts = [0] * len(histogram.counts)
+                histogram.sum = 0.0
+                histogram.count = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+
+    def to_dict(self):
+        with self.lock:
+            counters = {
+                'transfers_total': self.transfers,
+                'failures_total': self.failures,
+                'bytes_sent_total': self.bytes_sent
+            }
+        return {
+            'counters': counters,
+            'histograms': {name: h.to_dict() for name, h in self.histograms.items()}
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self, prefix=METRIC_PREFIX):
+        data = self.to_dict()
+        lines = []
+        for name, value in data['counters'].items():
+            metric = f"{prefix}_{name}"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        for histogram in self.histograms.values():
+            lines.append(histogram.to_prometheus(prefix))
+        return '\n'.join(lines) + '\n'
+
+    def merge(self, data):
+        """Acumula métricas serializadas con to_dict()"""
+        counters = data.get('counters', {})
+        with self.lock:
+            self.transfers += counters.get('transfers_total', 0)
+            self.failures += counters.get('failures_total', 0)
+            self.bytes_sent += counters.get('bytes_sent_total', 0)
+        for name, histogram in data.get('histograms', {}).items():
+            if name in self.histograms:
+                self.histograms[name].merge(histogram)
+
+    def save(self, path):
+        """
+        Acumula estas métricas en un archivo JSON existente (o lo crea).
+        Permite sumar ejecuciones sucesivas de sftp_upload.py.
+
+        Leer, sumar y reemplazar se hace con un flock sobre <archivo>.lock para
+        que procesos concurrentes no pierdan las métricas del otro.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(path.with_name(path.name + '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+
+            total = UploadMetrics()
+            if path.exists():
+                total.merge(json.loads(path.read_text(encoding='utf-8')))
+            total.merge(self.to_dict())
+
+            # Nombre temporal único: nunca se comparte entre procesos
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=path.parent,
+                                             prefix=path.name + '.', suffix='.tmp', delete=False) as tmp:
+                tmp.write(total.to_json())
+            try:
+                os.replace(tmp.name, path)
+            except OSError:
+                os.unlink(tmp.name)
+                raise
+        return total
+
+    @classmethod
+    def load(cls, path):
+        metrics = cls()
+        metrics.merge(json.loads(Path(path).read_text(encoding='utf-8')))
+        return metrics
+
+
+# Registro compartido por defecto para todos los SFTPClient del proceso
+DEFAULT_METRICS = UploadMetrics()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exporta métricas de subida acumuladas')
+    parser.add_argument('metrics_file', help='Archivo JSON generado con --metrics-file')
+    parser.add_argument('--format', choices=['json', 'prometheus'], default='prometheus',
+                        help='Formato de salida (default: prometheus)')
+
+    args = parser.parse_args()
+
+    metrics = UploadMetrics.load(args.metrics_file)
+    print(metrics.to_json() if args.format == 'json' else metrics.to_prometheus(), end='')
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
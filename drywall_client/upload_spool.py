@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+DryWall Client - Spool persistente de subidas (store-and-forward)
+Guarda localmente los archivos generados y los envía al banco cuando hay conexión
+"""
+
+import os
+import json
+import fcntl
+import shutil
+import logging
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from content_hash import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# Estados de un elemento del spool
+STATUS_PENDING = 'pending'
+STATUS_INFLIGHT = 'inflight'
+STATUS_ACKED = 'acked'
+STATUS_EVICTED = 'evicted'
+
+DEFAULT_SPOOL_DIR = Path(__file__).parent / "spool"
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024  # 200 MB
+LOCK_FILENAME = ".lock"
+
+
+class SpoolLockedError(RuntimeError):
+    """Otro proceso ya está usando el mismo directorio de spool"""
+
+
+class UploadSpool:
+    def __init__(self, spool_dir=DEFAULT_SPOOL_DIR, max_bytes=DEFAULT_MAX_BYTES, max_acked_entries=1000):
+        """
+        Spool durable de archivos pendientes de subir
+
+        Args:
+            spool_dir: Directorio del spool (contiene files/, manifest.json y .lock)
+            max_bytes: Límite de disco para archivos no confirmados
+            max_acked_entries: Entradas confirmadas que se conservan en el manifiesto
+
+        Raises:
+            SpoolLockedError: Si otro proceso tiene abierto el mismo spool
+        """
+        self.spool_dir = Path(spool_dir)
+        self.files_dir = self.spool_dir / "files"
+        self.manifest_path = self.spool_dir / "manifest.json"
+        self.max_bytes = max_bytes
+        self.max_acked_entries = max_acked_entries
+        self.lock = threading.RLock()
+
+        self.files_dir.mkdir(parents=True, exist_ok=True)
+
+        # El manifiesto se reescribe entero: dos procesos sobre el mismo spool
+        # se pisarían los elementos, así que se exige un único dueño
+        self._lock_file = open(self.spool_dir / LOCK_FILENAME, 'a')
+        try:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            self._lock_file = None
+            raise SpoolLockedError(f"El spool {self.spool_dir} está en uso por otro proceso")
+
+        self.next_seq = 1
+        self.items = []
+        self._load_manifest()
+
+    def close(self):
+        """Libera el bloqueo del directorio del spool"""
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _load_manifest(self):
+        """Carga el manifiesto y recupera elementos que quedaron en vuelo"""
+        if not self.manifest_path.exists():
+            return
+
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        self.next_seq = manifest.get('next_seq', 1)
+        self.items = manifest.get('items', [])
+
+        # Un elemento en vuelo tras un reinicio no tiene confirmación: se reintenta
+        recovered = 0
+        for item in self.items:
+            if item['status'] == STATUS_INFLIGHT:
+                item['status'] = STATUS_PENDING
+                recovered += 1
+
+        if recovered:
+            logger.info(f"[SPOOL] {recovered} elementos en vuelo devueltos a pendientes")
+            self._save_manifest()
+
+    def _save_manifest(self):
+        """Escribe el manifiesto de forma atómica (tmp + fsync + replace)"""
+        manifest = {
+            'updated_at': datetime.now().isoformat(),
+            'next_seq': self.next_seq,
+            'items': self.items
+        }
+        tmp_path = self.manifest_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def enqueue(self, local_file):
+        """
+        Copia un archivo al spool y lo registra como pendiente
+
+        Si el mismo contenido ya está pendiente, en vuelo o confirmado no se
+        vuelve a encolar y se devuelve el elemento existente.
+
+        Returns:
+            dict: Elemento del manifiesto creado o existente
+        """
+        local_path = Path(local_file)
+        if not local_path.exists():
+            raise FileNotFoundError(f"Archivo local no encontrado: {local_file}")
+
+        with self.lock:
+            seq = self.next_seq
+            self.next_seq += 1
+
+            # Un subdirectorio por elemento conserva el nombre original del archivo
+            item_dir = self.files_dir / f"{seq:08d}"
+            item_dir.mkdir(exist_ok=True)
+            spooled_path = item_dir / local_path.name
+            shutil.copy2(local_path, spooled_path)
+
+            # Se hashea la copia: el original puede seguir creciendo (CSV diario)
+            content_hash = file_sha256(spooled_path)
+            for item in self.items:
+                if item.get('sha256') == content_hash and item['status'] != STATUS_EVICTED:
+                    logger.info(f"[SPOOL] Contenido duplicado de #{item['seq']} ({item['status']}): {local_path.name}")
+                    self._remove_file({'path': str(spooled_path)})
+                    return dict(item)
+
+            item = {
+                'seq': seq,
+                'name': local_path.name,
+                'source': str(local_path),
+                'path': str(spooled_path),
+                'size': spooled_path.stat().st_size,
+                'sha256': content_hash,
+                'status': STATUS_PENDING,
+                'enqueued_at': datetime.now().isoformat(),
+                'attempts': 0,
+                'last_error': None,
+                'remote_path': None
+            }
+            self.items.append(item)
+            self._enforce_disk_cap()
+            self._save_manifest()
+
+        logger.info(f"[SPOOL] Encolado #{seq}: {local_path.name} ({item['size']} bytes)")
+        return dict(item)
+
+    def next_batch(self, batch_size=10):
+        """Marca como en vuelo y devuelve los pendientes más antiguos"""
+        with self.lock:
+            batch = [item for item in self.items if item['status'] == STATUS_PENDING][:batch_size]
+            if not batch:
+                return []
+
+            for item in batch:
+                item['status'] = STATUS_INFLIGHT
+            self._save_manifest()
+            return [dict(item) for item in batch]
+
+    def _find(self, seq):
+        for item in self.items:
+            if item['seq'] == seq:
+                return item
+        raise KeyError(f"Elemento no encontrado en el spool: {seq}")
+
+    def mark_acked(self, seq, remote_path=None):
+        """Confirma un elemento subido y libera su archivo local"""
+        with self.lock:
+            item = self._find(seq)
+            item['status'] = STATUS_ACKED
+            item['acked_at'] = datetime.now().isoformat()
+            item['remote_path'] = remote_path
+            item['attempts'] += 1
+            item['last_error'] = None
+
+            self._remove_file(item)
+            self._prune_acked()
+            self._save_manifest()
+
+    def mark_failed(self, seq, error):
+        """Devuelve un elemento a pendientes registrando el error"""
+        with self.lock:
+            item = self._find(seq)
+            item['status'] = STATUS_PENDING
+            item['attempts'] += 1
+            item['last_error'] = str(error)
+            self._save_manifest()
+
+    def release(self, seqs):
+        """Devuelve elementos en vuelo a pendientes sin contar intento"""
+        with self.lock:
+            for seq in seqs:
+                item = self._find(seq)
+                if item['status'] == STATUS_INFLIGHT:
+                    item['status'] = STATUS_PENDING
+            self._save_manifest()
+
+    def _remove_file(self, item):
+        """Elimina el archivo de un elemento y su subdirectorio"""
+        spooled_path = Path(item['path'])
+        spooled_path.unlink(missing_ok=True)
+        try:
+            spooled_path.parent.rmdir()
+        except OSError:
+            pass
+
+    def disk_usage(self):
+        """Bytes ocupados por archivos aún no confirmados"""
+        with self.lock:
+            return sum(item['size'] for item in self.items
+                       if item['status'] in (STATUS_PENDING, STATUS_INFLIGHT))
+
+    def _enforce_disk_cap(self):
+        """Descarta los pendientes más antiguos si se supera el límite de disco"""
+        usage = self.disk_usage()
+        for item in self.items:
+            if usage <= self.max_bytes:
+                break
+            if item['status'] != STATUS_PENDING:
+                continue
+
+            self._remove_file(item)
+            item['status'] = STATUS_EVICTED
+            item['evicted_at'] = datetime.now().isoformat()
+            usage -= item['size']
+            logger.warning(f"[SPOOL] Límite de disco superado, descartado #{item['seq']}: {item['name']}")
+
+    def _prune_acked(self):
+        """Limita el historial de elementos confirmados o descartados"""
+        done = [item for item in self.items if item['status'] in (STATUS_ACKED, STATUS_EVICTED)]
+        excess = len(done) - self.max_acked_entries
+        if excess > 0:
+            drop = {item['seq'] for item in done[:excess]}
+            self.items = [item for item in self.items if item['seq'] not in drop]
+
+    def stats(self):
+        """Resumen del estado del spool"""
+        with self.lock:
+            counts = {STATUS_PENDING: 0, STATUS_INFLIGHT: 0, STATUS_ACKED: 0, STATUS_EVICTED: 0}
+            for item in self.items:
+                counts[item['status']] += 1
+            return {
+                'pending': counts[STATUS_PENDING],
+                'inflight': counts[STATUS_INFLIGHT],
+                'acked': counts[STATUS_ACKED],
+                'evicted': counts[STATUS_EVICTED],
+                'disk_usage_bytes': self.disk_usage(),
+                'max_bytes': self.max_bytes
+            }
+
+
+class SpoolFlusher(threading.Thread):
+    def __init__(self, spool, upload_fn, batch_size=10, poll_interval=5,
+                 base_backoff=5, max_backoff=300):
+        """
+        Hilo que vacía el spool por lotes con backoff exponencial
+
+        Args:
+            spool: Instancia de UploadSpool
+            upload_fn: Función que recibe la ruta local y devuelve la ruta remota
+                       (un valor falso o una excepción se consideran fallo)
+            batch_size: Elementos por lote
+            poll_interval: Segundos entre revisiones cuando no hay pendientes
+            base_backoff: Espera inicial tras un fallo
+            max_backoff: Espera máxima tras fallos consecutivos
+        """
+        super().__init__(daemon=True)
+        self.spool = spool
+        self.upload_fn = upload_fn
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.consecutive_failures = 0
+        self._drain_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+
+    def current_backoff(self):
+        """Segundos de espera según los fallos consecutivos"""
+        if self.consecutive_failures == 0:
+            return 0
+        return min(self.max_backoff, self.base_backoff * 2 ** (self.consecutive_failures - 1))
+
+    def flush_once(self):
+        """
+        Envía pendientes en orden hasta vaciar el spool o encontrar un fallo
+
+        Returns:
+            tuple: (enviados, fallidos)
+        """
+        sent = 0
+        with self._drain_lock:
+            while not self._stop_event.is_set():
+                batch = self.spool.next_batch(self.batch_size)
+                if not batch:
+                    return sent, 0
+
+                for index, item in enumerate(batch):
+                    try:
+                        remote_path = self.upload_fn(item['path'])
+                        if not remote_path:
+                            raise Exception("La subida no fue confirmada")
+                    except Exception as e:
+                        logger.error(f"[SPOOL] Fallo enviando #{item['seq']} {item['name']}: {e}")
+                        self.spool.mark_failed(item['seq'], e)
+                        # Conservar el orden: el resto del lote vuelve a la cola
+                        self.spool.release([rest['seq'] for rest in batch[index + 1:]])
+                        self.consecutive_failures += 1
+                        return sent, 1
+
+                    self.spool.mark_acked(item['seq'], remote_path if isinstance(remote_path, str) else None)
+                    self.consecutive_failures = 0
+                    sent += 1
+                    logger.info(f"[SPOOL] Confirmado #{item['seq']}: {item['name']}")
+
+        return sent, 0
+
+    def wake(self):
+        """Despierta al hilo para intentar un envío inmediato"""
+        self._wake.set()
+
+    def run(self):
+        logger.info(f"[SPOOL] Flusher iniciado ({self.spool.spool_dir})")
+        while not self._stop_event.is_set():
+            self.flush_once()
+
+            wait = self.current_backoff() or self.poll_interval
+            if self.consecutive_failures:
+                logger.info(f"[SPOOL] Reintento en {wait} segundos "
+                            f"({self.consecutive_failures} fallos consecutivos)")
+                # Durante el backoff no se atienden wake(): evita martillar al banco
+                self._stop_event.wait(wait)
+            else:
+                self._wake.wait(wait)
+            self._wake.clear()
+
+        logger.info("[SPOOL] Flusher detenido")
+
+    def stop(self, timeout=10):
+        """Detiene el hilo esperando a que termine el lote actual"""
+        self._stop_event.set()
+        self._wake.set()
+        if self.is_alive():
+            self.join(timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Estado del spool de subidas DryWall')
+    parser.add_argument('--spool-dir', default=str(DEFAULT_SPOOL_DIR), help='Directorio del spool')
+    parser.add_argument('--enqueue', help='Archivo local a encolar')
+
+    args = parser.parse_args()
+
+    try:
+        spool = UploadSpool(args.spool_dir)
+    except SpoolLockedError as e:
+        logger.error(f"[SPOOL] {e}")
+        return 1
+
+    with spool:
+        if args.enqueue:
+            spool.enqueue(args.enqueue)
+        print(json.dumps(spool.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    exit(main())
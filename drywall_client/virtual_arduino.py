@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+DryWall Client - Arduino virtual (pseudo-terminal)
+Crea un par pty que emite líneas del sketch o tramas binarias a la frecuencia
+indicada, con ruido, bytes basura y desconexiones, para probar ArduinoReader,
+arduino_daemon y arduino_gateway sin hardware
+"""
+
+import os
+import pty
+import time
+import tty
+import fcntl
+import random
+import logging
+import argparse
+import threading
+
+from arduino_reader import encode_frame, PROTOCOLS, BINARY_BAUD
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LINK = "/tmp/ttyDRYWALL0"
+TICK_SECONDS = 0.005  # a frecuencias altas se escriben varias muestras por tick
+
+
+class VirtualArduino:
+    def __init__(self, rate_hz=2, protocol='text', noise=5.0, garbage_rate=0.0, disconnect_every=None,
+                 link_path=DEFAULT_LINK, seed=None):
+        """
+        Args:
+            rate_hz: Muestras por segundo (el sketch real envía 2)
+            protocol: 'text' ("Raw: X  |  H2O%: Y%") o 'binary' (tramas con CRC8)
+            noise: Desviación del ruido gaussiano sobre el valor raw
+            garbage_rate: Probabilidad por muestra de insertar bytes basura
+            disconnect_every: Segundos entre desconexiones simuladas (None = nunca)
+            link_path: Enlace simbólico estable al puerto (cambia de pty al reconectar)
+            seed: Semilla para reproducir la secuencia
+        """
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Protocolo no soportado: {protocol}")
+        self.rate_hz = rate_hz
+        self.protocol = protocol
+        self.noise = noise
+        self.garbage_rate = garbage_rate
+        self.disconnect_every = disconnect_every
+        self.link_path = link_path
+        self.rng = random.Random(seed)
+
+        self.master_fd = None
+        self.slave_fd = None
+        self.port = None
+        self.humidity = 40.0
+        self.seq = 0
+        self.counters = {'samples': 0, 'bytes': 0, 'garbage': 0, 'overflow': 0, 'disconnects': 0}
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def path(self):
+        """Ruta para abrir el puerto (el enlace si existe, si no el pty)"""
+        return self.link_path or self.port
+
+    def _open_pty(self):
+        self.master_fd, self.slave_fd = pty.openpty()
+        tty.setraw(self.slave_fd)
+        # Sin bloqueo: si nadie lee, el buffer se llena y las muestras se pierden como en un UART
+        flags = fcntl.fcntl(self.master_fd, fcntl.F_GETFL)
+        fcntl.fcntl(self.master_fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        self.port = os.ttyname(self.slave_fd)
+        if self.link_path:
+            tmp_link = self.link_path + '.tmp'
+            if os.path.lexists(tmp_link):
+                os.unlink(tmp_link)
+            os.symlink(self.port, tmp_link)
+            os.replace(tmp_link, self.link_path)
+
+    def _close_pty(self):
+        for fd in (self.master_fd, self.slave_fd):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self.master_fd = self.slave_fd = None
+
+    def next_sample(self):
+        """Siguiente (raw, pct) con la misma escala que el sketch (raw 210 = 100%, 510 = 0%)"""
+        self.humidity = min(100.0, max(0.0, self.humidity + self.rng.gauss(0, 0.3)))
+        raw = int(round(510 - self.humidity * 3 + self.rng.gauss(0, self.noise)))
+        raw = min(1023, max(0, raw))
+        pct = min(100, max(0, round((510 - raw) * 100 / 300)))
+        return raw, pct
+
+    def encode_sample(self, raw, pct):
+        if self.protocol == 'binary':
+            data = encode_frame(self.seq, raw, pct)
+            self.seq = (self.seq + 1) & 0xFF
+        else:
+            data = f"Raw: {raw}  |  H2O%: {pct}%\r\n".encode('ascii')
+        if self.garbage_rate and self.rng.random() < self.garbage_rate:
+            garbage = bytes(self.rng.getrandbits(8) for _ in range(self.rng.randint(1, 8)))
+            self.counters['garbage'] += 1
+            data = garbage + data
+        return data
+
+    def _write(self, data):
+        try:
+            written = os.write(self.master_fd, data)
+        except BlockingIOError:
+            written = 0
+        except OSError:
+            # Sin lector conectado (EIO) la muestra se pierde
+            written = 0
+        self.counters['bytes'] += written
+        if written < len(data):
+            self.counters['overflow'] += 1
+
+    def _run(self):
+        interval = 1.0 / self.rate_hz
+        next_due = time.perf_counter()
+        next_disconnect = time.monotonic() + self.disconnect_every if self.disconnect_every else None
+
+        while not self._stop_event.is_set():
+            now = time.perf_counter()
+            due = 0
+            while next_due <= now:
+                due += 1
+                next_due += interval
+            if due:
+                data = b''.join(self.encode_sample(*self.next_sample()) for _ in range(due))
+                self.counters['samples'] += due
+                self._write(data)
+
+            if next_disconnect and time.monotonic() >= next_disconnect:
+                # Cable desconectado: el lector recibe EIO y debe reabrir el enlace
+                self._close_pty()
+                self.counters['disconnects'] += 1
+                self._stop_event.wait(1.0)
+                self._open_pty()
+                next_disconnect = time.monotonic() + self.disconnect_every
+                next_due = time.perf_counter()
+
+            self._stop_event.wait(max(0.0, min(TICK_SECONDS, next_due - time.perf_counter())))
+
+    def start(self):
+        self._open_pty()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='virtual-arduino', daemon=True)
+        self._thread.start()
+        logger.info(f"🤖 Arduino virtual en {self.port} ({self.rate_hz} Hz, {self.protocol})")
+        return self.path
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(2)
+        self._close_pty()
+        if self.link_path and os.path.lexists(self.link_path):
+            os.unlink(self.link_path)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def benchmark_reader(simulator, duration):
+    """Lee con ArduinoReader (ingesta en segundo plano) y compara con lo enviado"""
+    from arduino_reader import ArduinoReader
+
+    baudrate = BINARY_BAUD if simulator.protocol == 'binary' else 9600
+    reader = ArduinoReader(simulator.path, baudrate, protocol=simulator.protocol)
+    if not reader.connect():
+        return None
+    reader.start_ingestion(queue_size=max(1024, int(simulator.rate_hz * 2)))
+
+    # Descartar lo acumulado en el pty durante la espera de connect()
+    time.sleep(0.5)
+    reader.drain()
+    sent_before = simulator.counters['samples']
+    received_before = reader.ingestion_stats()['readings']
+    cpu_before = time.process_time()
+
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        reader.get_reading(timeout=0.5)
+        reader.drain()
+    sent = simulator.counters['samples'] - sent_before
+    cpu = time.process_time() - cpu_before
+    stats = reader.ingestion_stats()
+    received = stats['readings'] - received_before
+    reader.close()
+
+    return {
+        'sent': sent,
+        'received': received,
+        'rate': received / duration,
+        'loss_pct': max(0.0, 100.0 * (sent - received) / sent) if sent else 0.0,
+        'cpu_pct': 100.0 * cpu / duration,
+        'reader': stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Arduino virtual sobre pseudo-terminal')
+    parser.add_argument('--rate', type=float, default=2, help='Muestras por segundo (default: 2)')
+    parser.add_argument('--protocol', choices=PROTOCOLS, default='text', help='Formato (default: text)')
+    parser.add_argument('--noise', type=float, default=5.0, help='Ruido del valor raw (default: 5)')
+    parser.add_argument('--garbage', type=float, default=0.0, help='Probabilidad de bytes basura por muestra')
+    parser.add_argument('--disconnect-every', type=float, help='Segundos entre desconexiones simuladas')
+    parser.add_argument('--link', default=DEFAULT_LINK, help=f'Enlace estable al puerto (default: {DEFAULT_LINK})')
+    parser.add_argument('--duration', type=float, help='Segundos de ejecución (default: hasta Ctrl+C)')
+    parser.add_argument('--benchmark', action='store_true', help='Medir ArduinoReader contra el simulador')
+    parser.add_argument('--seed', type=int, help='Semilla aleatoria')
+
+    args = parser.parse_args()
+
+    simulator = VirtualArduino(args.rate, args.protocol, args.noise, args.garbage, args.disconnect_every,
+                               args.link, args.seed)
+    path = simulator.start()
+    print(f"🤖 Arduino virtual: {path} -> {simulator.port} ({args.rate:g} Hz, {args.protocol})")
+
+    try:
+        if args.benchmark:
+            result = benchmark_reader(simulator, args.duration or 10)
+            if result is None:
+                print("❌ No se pudo conectar al simulador")
+                return 1
+            print(f"📊 Enviadas: {result['sent']:,} | Recibidas: {result['received']:,} "
+                  f"({result['rate']:.0f}/s) | Pérdida: {result['loss_pct']:.2f}% | CPU: {result['cpu_pct']:.1f}%")
+            print(f"📈 Lector: {result['reader']}")
+        else:
+            print("Presiona Ctrl+C para detener")
+            if args.duration:
+                time.sleep(args.duration)
+            else:
+                while True:
+                    time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n⏹️  Simulador detenido")
+    finally:
+        simulator.stop()
+        print(f"📤 {simulator.counters}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    exit(main())
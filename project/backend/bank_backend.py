@@ -10,6 +10,7 @@ import threading
 import logging
 import json
 import time
+import hashlib
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
@@ -17,6 +18,8 @@ import paramiko
 from paramiko import ServerInterface, SFTPServerInterface, SFTPServer, SFTPHandle, SFTPAttributes
 from paramiko import AUTH_SUCCESSFUL, AUTH_FAILED, OPEN_SUCCEEDED, OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
 from paramiko import SFTP_OK, SFTP_FAILURE
+from paramiko.message import Message
+from paramiko.sftp import CMD_EXTENDED_REPLY
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -42,6 +45,12 @@ HOST_KEY = paramiko.RSAKey.generate(2048)
 UPLOAD_ROOT = Path("upload")
 UPLOAD_ROOT.mkdir(exist_ok=True)
 AUTHORIZED_KEYS_PATH = Path("authorized_keys/client.pub")
+HASH_INDEX_PATH = Path("upload_hashes.json")  # Fuera de UPLOAD_ROOT para no listarlo
+# Señal comprimida del cliente (drywall_client/stream_compression.py): puntos, no lecturas
+COMPRESSED_MARKER = "arduino_compressed_"
+INGEST_INTERVAL = 5         # segundos entre revisiones de archivos copiados directamente
+INGEST_SETTLE_SECONDS = 2   # no indexar archivos que aún se están escribiendo
+COMPRESSED_VALUE_COLUMNS = ['humidity_pct', 'raw_value']
 
 # FastAPI app
 app = FastAPI(
@@ -71,7 +80,147 @@ async def cors_debug_middleware(request: Request, call_next):
     
     return response
 
+class UploadHashIndex:
+    """
+    Índice SHA-256 de archivos recibidos: detecta contenidos duplicados
+    
+    Copia de la clase de bank_simulator/sftp_server.py (más canonical_for): los dos
+    servidores se despliegan por separado (bank_simulator tiene su propia imagen
+    Docker), así que un cambio en el formato del índice debe hacerse en ambos.
+    """
+
+    def __init__(self, index_path, root):
+        self.index_path = Path(index_path)
+        self.root = Path(root)
+        self.lock = threading.Lock()
+        self.hashes = {}   # sha256 -> nombre canónico
+        self.files = {}    # nombre -> {'sha256', 'size', 'mtime'}
+        self.aliases = {}  # nombre duplicado -> nombre canónico
+
+        if self.index_path.exists():
+            data = json.loads(self.index_path.read_text(encoding='utf-8'))
+            self.hashes = data.get('hashes', {})
+            self.files = data.get('files', {})
+            self.aliases = data.get('aliases', {})
+
+    @staticmethod
+    def hash_file(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _save(self):
+        tmp_path = self.index_path.with_suffix('.json.tmp')
+        tmp_path.write_text(json.dumps({
+            'hashes': self.hashes,
+            'files': self.files,
+            'aliases': self.aliases
+        }, indent=2), encoding='utf-8')
+        os.replace(tmp_path, self.index_path)
+
+    def resolve(self, name):
+        """Nombre canónico de un archivo (los duplicados apuntan al original)"""
+        with self.lock:
+            return self.aliases.get(name, name)
+
+    def lookup(self, sha256):
+        with self.lock:
+            return self.hashes.get(sha256)
+
+    def sha256_for(self, name):
+        """SHA-256 registrado de un archivo si sigue vigente (mismo tamaño y mtime)"""
+        name = self.resolve(name)
+        try:
+            st = (self.root / name).stat()
+        except OSError:
+            return None
+        with self.lock:
+            known = self.files.get(name)
+            if known and known['size'] == st.st_size and known['mtime'] == st.st_mtime:
+                return known['sha256']
+        return None
+
+    def canonical_for(self, path):
+        """
+        Nombre canónico de un archivo según el índice, sin hashear ni modificar nada
+        
+        Para los endpoints de lectura: devuelve None si el archivo aún no está
+        indexado (o cambió desde entonces); queda pendiente hasta que
+        ingest_uploads() lo registre y descarte sus duplicados.
+        """
+        path = Path(path)
+        st = path.stat()
+        with self.lock:
+            known = self.files.get(path.name)
+            if known and known['size'] == st.st_size and known['mtime'] == st.st_mtime:
+                return self.hashes.get(known['sha256'], path.name)
+        return None
+
+    def register(self, path, sha256=None):
+        """
+        Registra un archivo recibido y devuelve su nombre canónico.
+        Si su contenido ya existe en otro archivo, el nuevo se elimina y queda como alias.
+        """
+        path = Path(path)
+        st = path.stat()
+        with self.lock:
+            known = self.files.get(path.name)
+            if known:
+                if sha256 is None and known['size'] == st.st_size and known['mtime'] == st.st_mtime:
+                    return self.hashes.get(known['sha256'], path.name)
+                # El archivo cambió: su hash anterior deja de apuntar a él
+                if self.hashes.get(known['sha256']) == path.name:
+                    del self.hashes[known['sha256']]
+
+            if sha256 is None:
+                sha256 = self.hash_file(path)
+
+            canonical = self.hashes.get(sha256)
+            if canonical and canonical != path.name and (self.root / canonical).exists():
+                path.unlink()
+                self.files.pop(path.name, None)
+                self.aliases[path.name] = canonical
+                self._save()
+                logger.info(f"[DEDUP] Duplicate of {canonical} discarded: {path.name}")
+                return canonical
+
+            self.hashes[sha256] = path.name
+            self.aliases.pop(path.name, None)
+            self.files[path.name] = {'sha256': sha256, 'size': st.st_size, 'mtime': st.st_mtime}
+            self._save()
+            return path.name
+
+HASH_INDEX = UploadHashIndex(HASH_INDEX_PATH, UPLOAD_ROOT)
+
 class BankSFTPHandle(SFTPHandle):
+    def __init__(self, flags=0):
+        super().__init__(flags)
+        # Hash calculado en streaming mientras se escribe la subida
+        self.digest = hashlib.sha256()
+        self.hashed_bytes = 0
+        self.hash_valid = True
+
+    def write(self, offset, data):
+        # Solo escrituras secuenciales permiten hashear sin releer el archivo
+        if self.hash_valid and offset == self.hashed_bytes:
+            self.digest.update(data)
+            self.hashed_bytes += len(data)
+        else:
+            self.hash_valid = False
+        return super().write(offset, data)
+
+    def close(self):
+        super().close()
+        # Al cerrar una subida se indexa su contenido (los duplicados quedan como alias)
+        if getattr(self, 'is_upload', False):
+            sha256 = self.digest.hexdigest() if self.hash_valid else None
+            try:
+                HASH_INDEX.register(self.filename, sha256=sha256)
+            except OSError as e:
+                logger.error(f"[DEDUP] Error indexing {self.filename}: {e}")
+
     def stat(self):
         try:
             return SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
@@ -81,11 +230,41 @@ class BankSFTPHandle(SFTPHandle):
     def chattr(self, attr):
         return SFTP_OK
 
+class BankSFTPSubsystem(SFTPServer):
+    """Subsistema SFTP que responde check-file sha256 con el hash calculado al subir"""
+
+    def _check_file(self, request_number, msg):
+        start_pos = msg.packet.tell()
+        handle = msg.get_binary()
+        alg_list = msg.get_list()
+        start = msg.get_int64()
+        length = msg.get_int64()
+        block_size = msg.get_int()
+
+        f = self.file_table.get(handle)
+        if isinstance(f, BankSFTPHandle) and 'sha256' in alg_list and start == 0 and block_size == 0:
+            sha256 = HASH_INDEX.sha256_for(f.filename.name)
+            if sha256 and (length == 0 or length == f.filename.stat().st_size):
+                reply = Message()
+                reply.add_int(request_number)
+                reply.add_string('check-file')
+                reply.add_string('sha256')
+                reply.add_bytes(bytes.fromhex(sha256))
+                self._send_packet(CMD_EXTENDED_REPLY, reply)
+                return
+
+        # Otros algoritmos o rangos parciales: implementación estándar (relee el archivo)
+        msg.packet.seek(start_pos)
+        super()._check_file(request_number, msg)
+
 class BankSFTPServer(SFTPServerInterface):
     ROOT = UPLOAD_ROOT
 
-    def _realpath(self, path):
-        return self.ROOT / os.path.basename(path)
+    def _realpath(self, path, follow_alias=True):
+        name = os.path.basename(path)
+        if follow_alias and not (self.ROOT / name).exists():
+            name = HASH_INDEX.resolve(name)
+        return self.ROOT / name
 
     def list_folder(self, path):
         path = self._realpath(path)
@@ -115,7 +294,9 @@ class BankSFTPServer(SFTPServerInterface):
             return SFTP_FAILURE
 
     def open(self, path, flags, attr):
-        path = self._realpath(path)
+        # Una escritura crea un archivo nuevo aunque el nombre sea un alias
+        is_upload = bool(flags & (os.O_WRONLY | os.O_RDWR))
+        path = self._realpath(path, follow_alias=not is_upload)
         try:
             binary_flag = getattr(os, 'O_BINARY', 0)
             flags |= binary_flag
@@ -154,12 +335,13 @@ class BankSFTPServer(SFTPServerInterface):
         fobj.filename = path
         fobj.readfile = f
         fobj.writefile = f
+        fobj.is_upload = is_upload
         
         logger.info(f"[BANK] File received from DryWall Client: {path.name}")
         return fobj
 
     def remove(self, path):
-        path = self._realpath(path)
+        path = self._realpath(path, follow_alias=False)
         try:
             path.unlink()
             logger.info(f"[BANK] File deleted: {path.name}")
@@ -168,8 +350,8 @@ class BankSFTPServer(SFTPServerInterface):
         return SFTP_OK
 
     def rename(self, oldpath, newpath):
-        oldpath = self._realpath(oldpath)
-        newpath = self._realpath(newpath)
+        oldpath = self._realpath(oldpath, follow_alias=False)
+        newpath = self._realpath(newpath, follow_alias=False)
         try:
             oldpath.rename(newpath)
         except OSError:
@@ -231,7 +413,7 @@ def handle_sftp_client(client_socket, address):
         
         transport = paramiko.Transport(client_socket)
         transport.add_server_key(HOST_KEY)
-        transport.set_subsystem_handler('sftp', SFTPServer)
+        transport.set_subsystem_handler('sftp', BankSFTPSubsystem, sftp_si=BankSFTPServer)
         
         server = BankSSHServer()
         transport.start_server(server=server)
@@ -242,9 +424,6 @@ def handle_sftp_client(client_socket, address):
             logger.error("[SFTP] No channel established")
             return
         
-        # Crear servidor SFTP
-        sftp_server = SFTPServer(channel, 'sftp', server=server, sftp_si=BankSFTPServer)
-        
         # Mantener conexión activa
         while transport.is_active():
             time.sleep(1)
@@ -258,6 +437,50 @@ def handle_sftp_client(client_socket, address):
             pass
         logger.info(f"[SFTP] Client {address} disconnected")
 
+def ingest_uploads():
+    """
+    Indexa los archivos que llegaron sin pasar por SFTP (p. ej. copias de simple_auto)
+    
+    Las subidas SFTP se indexan al cerrarse (BankSFTPHandle.close); aquí se dan
+    de alta las demás y se descartan sus duplicados. Es el único camino, junto
+    con SFTP, que modifica el directorio de subida.
+    
+    Returns:
+        int: Archivos nuevos indexados
+    """
+    indexed = 0
+    now = time.time()
+    for file_path in UPLOAD_ROOT.glob('*'):
+        try:
+            st = file_path.stat()
+            if not file_path.is_file() or now - st.st_mtime < INGEST_SETTLE_SECONDS:
+                continue
+            with HASH_INDEX.lock:
+                known = HASH_INDEX.files.get(file_path.name)
+            if known and known['size'] == st.st_size and known['mtime'] == st.st_mtime:
+                continue
+            HASH_INDEX.register(file_path)
+            indexed += 1
+        except OSError as e:
+            logger.error(f"[INGEST] Error indexing {file_path.name}: {e}")
+    return indexed
+
+def start_upload_ingest(interval=INGEST_INTERVAL):
+    """Revisar el directorio de subida en thread separado"""
+    def ingest_thread():
+        while True:
+            try:
+                indexed = ingest_uploads()
+                if indexed:
+                    logger.info(f"[INGEST] {indexed} new files indexed")
+            except Exception as e:
+                logger.error(f"[INGEST] Error: {e}")
+            time.sleep(interval)
+    
+    ingest_thread_obj = threading.Thread(target=ingest_thread, daemon=True)
+    ingest_thread_obj.start()
+    return ingest_thread_obj
+
 def start_sftp_server(host='0.0.0.0', port=22):
     """Iniciar servidor SFTP en thread separado"""
     def sftp_thread():
@@ -366,19 +589,141 @@ async def list_drywall_files():
         logger.error(f"Error listing DryWall files: {e}")
         raise HTTPException(status_code=500, detail=f"Error listing files: {str(e)}")
 
+@app.get("/api/drywall/files/{filename}/checksum")
+async def get_drywall_file_checksum(filename: str):
+    """SHA-256 calculado al recibir el archivo (sin volver a leerlo)"""
+    sha256 = HASH_INDEX.sha256_for(filename)
+    if not sha256:
+        raise HTTPException(status_code=404, detail=f"Checksum not available: {filename}")
+    
+    return {
+        'filename': filename,
+        'canonical_filename': HASH_INDEX.resolve(filename),
+        'sha256': sha256
+    }
+
+@app.get("/api/drywall/hashes/{sha256}")
+async def lookup_drywall_hash(sha256: str):
+    """Indica si un contenido (SHA-256) ya fue recibido del cliente DryWall"""
+    canonical = HASH_INDEX.lookup(sha256.lower())
+    if not canonical or not (UPLOAD_ROOT / canonical).exists():
+        raise HTTPException(status_code=404, detail=f"Hash not found: {sha256}")
+    
+    return {
+        'sha256': sha256.lower(),
+        'filename': canonical,
+        'size': (UPLOAD_ROOT / canonical).stat().st_size
+    }
+
+def is_compressed_upload(file_path, columns=()):
+    """Archivo de señal comprimida (columna compression o prefijo arduino_compressed_)"""
+    return 'compression' in columns or COMPRESSED_MARKER in Path(file_path).name
+
+def reconstruct_compressed(df, step_seconds=60):
+    """
+    Reconstruye la señal comprimida por dispositivo a intervalos regulares
+    
+    Interpolación lineal entre puntos (swinging_door) o último valor (deadband),
+    igual que stream_compression.reconstruct_frame en el cliente.
+    
+    Returns:
+        dict: device_id -> lista de {'timestamp', 'humidity_pct', 'raw_value'}
+    """
+    import numpy as np
+    
+    df = df.copy()
+    # isoformat() omite .ffffff cuando el microsegundo es 0: no inferir el formato de la primera fila
+    df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601')
+    step = np.int64(step_seconds * 1_000_000)
+    series = {}
+    for device_id, group in df.groupby('device_id'):
+        group = group.sort_values('timestamp', kind='stable')
+        mode = group['compression'].iloc[0] if 'compression' in group else 'swinging_door'
+        source_t = group['timestamp'].to_numpy().astype('datetime64[us]').astype(np.int64)
+        target_t = np.arange(source_t[0], source_t[-1] + 1, step)
+        
+        values = {}
+        for column in COMPRESSED_VALUE_COLUMNS:
+            source = group[column].to_numpy(dtype=float)
+            if mode == 'deadband':
+                values[column] = source[np.searchsorted(source_t, target_t, side='right') - 1]
+            else:
+                values[column] = np.interp(target_t, source_t, source)
+        
+        timestamps = target_t.astype('datetime64[us]').astype(str)
+        series[str(device_id)] = [
+            {'timestamp': timestamps[i],
+             **{column: round(float(values[column][i]), 2) for column in COMPRESSED_VALUE_COLUMNS}}
+            for i in range(len(target_t))
+        ]
+    return series
+
+@app.get("/api/drywall/compressed/{filename}")
+async def get_compressed_series(filename: str, step_seconds: int = 60):
+    """Señal reconstruida de un archivo comprimido del cliente DryWall"""
+    file_path = UPLOAD_ROOT / HASH_INDEX.resolve(Path(filename).name)
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail=f"File not found: {filename}")
+    if step_seconds < 1:
+        raise HTTPException(status_code=400, detail="step_seconds must be >= 1")
+    
+    df = pd.read_csv(file_path)
+    if not is_compressed_upload(file_path, df.columns):
+        raise HTTPException(status_code=400, detail=f"Not a compressed upload: {filename}")
+    
+    try:
+        devices = reconstruct_compressed(df, step_seconds) if len(df) else {}
+    except (KeyError, ValueError) as e:
+        logger.error(f"Error reconstructing {file_path.name}: {e}")
+        raise HTTPException(status_code=422, detail=f"Invalid compressed data in {file_path.name}: {str(e)}")
+    
+    return {
+        'filename': file_path.name,
+        'compressed_points': len(df),
+        'step_seconds': step_seconds,
+        'devices': devices
+    }
+
 @app.get("/api/drywall/sensor-data")
-async def get_sensor_data():
-    """Procesar archivos CSV y extraer datos de sensores para el dashboard"""
+async def get_sensor_data(per_file: bool = False):
+    """
+    Procesar archivos CSV y extraer datos de sensores para el dashboard
+    
+    Con per_file=true incluye file_readings (lecturas contadas de cada archivo),
+    para saber qué subidas concretas ya son visibles (load_generator.py).
+    """
     try:
         files = list(UPLOAD_ROOT.glob('*.csv'))
         
         all_sensor_data = []
+        compressed_files = []
+        pending_files = []
+        file_readings = {}
         
         for file_path in files:
             try:
+                # Solo se consulta el índice: los archivos sin indexar (p. ej. copias
+                # directas de simple_auto) esperan a ingest_uploads(), que los hashea
+                # y descarta los duplicados
+                canonical = HASH_INDEX.canonical_for(file_path)
+                if canonical is None:
+                    pending_files.append(file_path.name)
+                    continue
+                if canonical != file_path.name:
+                    continue
+                
                 # Leer CSV con pandas
                 df = pd.read_csv(file_path)
                 
+                # Los puntos comprimidos no son lecturas: contarlos sesgaría totales y medias
+                if is_compressed_upload(file_path, df.columns):
+                    compressed_files.append({
+                        'filename': file_path.name,
+                        'compressed_points': len(df),
+                        'series_url': f"/api/drywall/compressed/{file_path.name}"
+                    })
+                    continue
+                
                 # Convertir a formato JSON para la API
                 for _, row in df.iterrows():
                     sensor_reading = {
@@ -394,6 +739,7 @@ async def get_sensor_data():
                         'file_source': file_path.name
                     }
                     all_sensor_data.append(sensor_reading)
+                file_readings[file_path.name] = len(df)
                     
             except Exception as e:
                 logger.error(f"Error processing file {file_path}: {e}")
@@ -417,7 +763,7 @@ async def get_sensor_data():
             unique_sensors = []
             unique_locations = []
         
-        return {
+        response = {
             'timestamp': datetime.now().isoformat(),
             'total_readings': len(all_sensor_data),
             'sensor_data': all_sensor_data[:50],  # Últimas 50 lecturas
@@ -430,8 +776,13 @@ async def get_sensor_data():
                 'active_sensors': unique_sensors,
                 'monitored_locations': unique_locations
             },
-            'alerts': high_alerts[:10]  # Últimas 10 alertas críticas
+            'alerts': high_alerts[:10],  # Últimas 10 alertas críticas
+            'compressed_files': compressed_files,  # Excluidos de las lecturas; ver series_url
+            'pending_files': pending_files  # Aún sin indexar; visibles tras ingest_uploads()
         }
+        if per_file:
+            response['file_readings'] = file_readings
+        return response
         
     except Exception as e:
         logger.error(f"Error getting sensor data: {e}")
@@ -511,6 +862,7 @@ if __name__ == "__main__":
     
     # Iniciar servidor SFTP - COMENTADO PARA APAGAR SFTP
     start_sftp_server(port=2222)
+    start_upload_ingest()
     logger.info("[BANK] SFTP Server DISABLED - Running API only")
     
     # Iniciar API REST